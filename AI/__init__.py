@@ -1,6 +1,10 @@
 from .ai_reasoning_engine import AIReasoningEngine, HealthInsightGenerator, HealthRecommendationEngine, ContextualReasoning
 from .llm_insight_generator import LLMInsightGenerator, EnhancedAIReasoningEngine
 from .pattern_analyzer import AdvancedPatternAnalyzer
+from .batch_engine import BatchReasoningEngine
+from .llm_cache import LLMResponseCache
+from .llm_client import AsyncLLMClient, LLMClientError
+from .guideline_index import GuidelineIndex
 
 __all__ = [
     'AIReasoningEngine',
@@ -9,5 +13,10 @@ __all__ = [
     'ContextualReasoning',
     'LLMInsightGenerator',
     'EnhancedAIReasoningEngine',
-    'AdvancedPatternAnalyzer'
+    'AdvancedPatternAnalyzer',
+    'BatchReasoningEngine',
+    'LLMResponseCache',
+    'AsyncLLMClient',
+    'LLMClientError',
+    'GuidelineIndex'
 ]
\ No newline at end of file
@@ -1,10 +1,19 @@
 import pandas as pd
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, TypedDict
+from datetime import datetime
+from typing import Dict, List, Any, Optional, TypedDict
 import numpy as np
+import weakref
 
-from pattern_analyzer import AdvancedPatternAnalyzer
+from pattern_analyzer import AdvancedPatternAnalyzer, load_pattern_thresholds
+from series_stats import SeriesStats
 
+# Insight severity for the heart rate risk levels of AdvancedPatternAnalyzer
+RISK_SEVERITY = {
+    'high': 'warning',
+    'moderate': 'caution',
+    'low': 'info',
+    'unknown': 'info',
+}
 
 class Insight(TypedDict, total=False):
     """
@@ -23,11 +32,12 @@ class Insight(TypedDict, total=False):
     metadata: Dict[str, Any]
 
 class HealthInsightGenerator:
-    def __init__(self):
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None):
+        self.thresholds = thresholds if thresholds is not None else load_pattern_thresholds()
         self.insight_templates = {
             'sleep': {
                 'irregular': "Your sleep is irregular this week.",
-                'insufficient': "You're getting less than 7 hours of sleep on average.",
+                'insufficient': "You're getting less than {hours:g} hours of sleep on average.",
                 'good': "Your sleep pattern looks healthy this week."
             },
             'heart_rate': {
@@ -45,8 +55,8 @@ class HealthInsightGenerator:
             }
         }
     
-    def analyze_sleep_patterns(self, sleep_data: pd.DataFrame) -> Insight:
-        """Analyze sleep duration and regularity"""
+    def analyze_sleep_patterns(self, sleep_data: pd.DataFrame, stats: Optional[SeriesStats] = None) -> Insight:
+        """Analyze sleep duration and regularity; `stats` are those of duration_hours when already computed"""
         if sleep_data.empty:
             return {
                 'id': 'sleep:no_data',
@@ -58,23 +68,24 @@ class HealthInsightGenerator:
                 'metadata': {},
             }
         
-        avg_sleep = sleep_data['duration_hours'].mean()
-        sleep_variance = sleep_data['duration_hours'].var()
+        stats = stats or SeriesStats(sleep_data['duration_hours'].to_numpy())
+        avg_sleep = stats.mean
+        sleep_variance = stats.var
         
-        if avg_sleep < 7:
+        if avg_sleep < self.thresholds['sleep_min_hours']:
             return {
                 'id': 'sleep:insufficient',
                 'type': 'sleep',
                 'severity': 'warning',
                 'title': 'Sleep is below recommended levels',
-                'message': self.insight_templates['sleep']['insufficient'],
+                'message': self.insight_templates['sleep']['insufficient'].format(hours=self.thresholds['sleep_min_hours']),
                 'suggested_actions': [],
                 'metadata': {
                     'avg_hours': float(avg_sleep),
                     'variance': float(sleep_variance),
                 },
             }
-        elif sleep_variance > 2:
+        elif sleep_variance > self.thresholds['sleep_variance']:
             return {
                 'id': 'sleep:irregular',
                 'type': 'sleep',
@@ -101,8 +112,8 @@ class HealthInsightGenerator:
                 },
             }
     
-    def analyze_heart_rate(self, hr_data: pd.DataFrame) -> Insight:
-        """Detect heart rate anomalies"""
+    def analyze_heart_rate(self, hr_data: pd.DataFrame, stats: Optional[SeriesStats] = None) -> Insight:
+        """Detect heart rate anomalies; `stats` are those of heart_rate when already computed"""
         if hr_data.empty:
             return {
                 'id': 'heart_rate:no_data',
@@ -114,11 +125,12 @@ class HealthInsightGenerator:
                 'metadata': {},
             }
         
-        baseline = hr_data['heart_rate'].quantile(0.5)
-        spikes = hr_data[hr_data['heart_rate'] > baseline * 1.3]
+        stats = stats or SeriesStats(hr_data['heart_rate'].to_numpy())
+        baseline = stats.median
+        spikes = np.flatnonzero(hr_data['heart_rate'].to_numpy() > baseline * self.thresholds['hr_spike_threshold'])
         
-        if not spikes.empty:
-            spike_time = spikes.iloc[0]['timestamp'].strftime('%I%p')
+        if len(spikes):
+            spike_time = hr_data['timestamp'].iloc[spikes[0]].strftime('%I%p')
             message = self.insight_templates['heart_rate']['spike'].format(time=spike_time)
             return {
                 'id': 'heart_rate:spike',
@@ -159,10 +171,10 @@ class HealthInsightGenerator:
                 'metadata': {},
             }
         
-        recommended_daily = 2000  # ml
+        recommended_daily = self.thresholds['hydration_daily_ml']
         low_days = (hydration_data['water_ml'] < recommended_daily).sum()
         
-        if low_days >= 4:
+        if low_days >= self.thresholds['hydration_low_days']:
             message = self.insight_templates['hydration']['low'].format(days=low_days)
             return {
                 'id': 'hydration:low',
@@ -221,28 +233,138 @@ class HealthRecommendationEngine:
             return self.recommendations.get(insight_type, [])
         return []
 
+class ContextWindow:
+    """
+    A frame prepared for windowing: the date column is parsed once and the
+    row order by date is computed once, so the rows from any start date on
+    are a searchsorted slice instead of a filtered copy. Windows keep the
+    input row order, like the filter they replace.
+
+    The frame is copied on wrap, so windows never change with later edits
+    of the caller's frame; `signature` tells when a frame no longer has the
+    shape it was wrapped with. Threads may share a ContextWindow: the window
+    cache is only read and written with single dict operations, and a race
+    at worst computes a window twice.
+    """
+
+    MAX_CACHED_WINDOWS = 16
+
+    def __init__(self, data: pd.DataFrame, date_col: str = 'date'):
+        self.signature = self.signature_of(data)
+        # Same column resolution as before: date, else timestamp, else no windowing
+        if date_col not in data.columns:
+            date_col = 'timestamp' if 'timestamp' in data.columns else None
+        self.date_col = date_col
+        self.dates = None
+        self._order = None
+        self._windows: Dict[Any, pd.DataFrame] = {}
+        if date_col is None or data.empty:
+            self.data = data
+            return
+
+        dates = data[date_col]
+        if not pd.api.types.is_datetime64_any_dtype(dates):
+            dates = pd.to_datetime(dates)
+        # A copy with the parsed dates
+        self.data = data.assign(**{date_col: dates})
+        dates = dates.to_numpy()
+        if not self.data[date_col].is_monotonic_increasing:
+            # NaT sorts last and is never inside a window
+            self._order = np.argsort(dates, kind='stable')
+            dates = dates[self._order]
+        self.dates = dates
+        self._end = len(self.dates) - int(pd.isna(self.dates).sum())
+
+    @staticmethod
+    def signature_of(data: pd.DataFrame) -> tuple:
+        return (len(data), tuple(data.columns))
+
+    def window(self, days: int, reference_date=None) -> pd.DataFrame:
+        """Rows dated at or after reference_date - days (reference_date defaults to now), in input order."""
+        if self.dates is None:
+            return self.data
+        if reference_date is None:
+            reference_date = datetime.now()
+        start = pd.Timestamp(reference_date) - pd.Timedelta(days=days)
+        key = (days, start)
+        window = self._windows.get(key)
+        if window is None:
+            lo = int(np.searchsorted(self.dates, start.to_datetime64(), side='left'))
+            if self._order is None:
+                window = self.data.iloc[lo:self._end]
+            else:
+                window = self.data.iloc[np.sort(self._order[lo:self._end])]
+            if len(self._windows) >= self.MAX_CACHED_WINDOWS:
+                self._windows.clear()
+            self._windows[key] = window
+        return window
+
+
+class AnalysisContext:
+    """
+    The weekly windows of one analysis, with the SeriesStats of each
+    (data type, column) computed on first use and then shared by every
+    generator that reads them.
+    """
+
+    def __init__(self, weekly_data: Dict[str, pd.DataFrame]):
+        self.weekly_data = weekly_data
+        self._stats: Dict[Any, SeriesStats] = {}
+
+    def __contains__(self, data_type: str) -> bool:
+        return data_type in self.weekly_data
+
+    def __getitem__(self, data_type: str) -> pd.DataFrame:
+        return self.weekly_data[data_type]
+
+    def stats(self, data_type: str, column: str) -> SeriesStats:
+        key = (data_type, column)
+        if key not in self._stats:
+            frame = self.weekly_data[data_type]
+            self._stats[key] = SeriesStats(frame[column].to_numpy() if not frame.empty else [])
+        return self._stats[key]
+
+
 class ContextualReasoning:
     def __init__(self):
         self.context_window = 7  # days
-    
-    def get_weekly_context(self, data: pd.DataFrame, date_col: str = 'date') -> pd.DataFrame:
-        """Filter data to last 7 days for contextual analysis"""
+        # id(frame) -> (weak reference to the frame, its ContextWindow)
+        self._contexts: Dict[Any, Any] = {}
+
+    def context_for(self, data: pd.DataFrame, date_col: str = 'date') -> ContextWindow:
+        """
+        The ContextWindow of a frame, built once per frame object and again
+        when rows or columns were added or removed since. Values edited in
+        place are not detected (that would cost a scan of the frame); pass
+        a new frame after such edits. Safe to call from several threads: a
+        cached entry is used only while its weak reference is to `data`
+        itself, and concurrent misses each build an equal ContextWindow.
+        """
+        key = (id(data), date_col)
+        cached = self._contexts.get(key)
+        if cached is not None and cached[0]() is data and cached[1].signature == ContextWindow.signature_of(data):
+            return cached[1]
+        context = ContextWindow(data, date_col)
+        self._contexts[key] = (weakref.ref(data, lambda _, key=key: self._contexts.pop(key, None)), context)
+        return context
+
+    def get_weekly_context(self, data: pd.DataFrame, date_col: str = 'date', reference_date=None) -> pd.DataFrame:
+        """
+        Rows of the last 7 days before reference_date (now by default), in
+        input order. Pass an explicit reference_date to get results that
+        can be cached.
+        """
         if data.empty:
             return data
-        
-        # Check if date column exists, if not use timestamp or return all data
-        if date_col not in data.columns:
-            if 'timestamp' in data.columns:
-                date_col = 'timestamp'
-            else:
-                return data  # Return all data if no date column found
-        
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=self.context_window)
-        
-        data_copy = data.copy()
-        data_copy[date_col] = pd.to_datetime(data_copy[date_col])
-        return data_copy[data_copy[date_col] >= start_date]
+        return self.context_for(data, date_col).window(self.context_window, reference_date)
+    
+    def analysis_context(self, health_data: Dict[str, pd.DataFrame], reference_date=None) -> AnalysisContext:
+        """Weekly context of every data type, ending at the same reference_date (now by default)"""
+        reference_date = reference_date if reference_date is not None else datetime.now()
+        return AnalysisContext({
+            data_type: self.get_weekly_context(df, reference_date=reference_date)
+            for data_type, df in health_data.items()
+        })
     
     def compare_with_baseline(self, current_data: pd.DataFrame, historical_data: pd.DataFrame, metric: str) -> Dict[str, float]:
         """Compare current week with historical baseline"""
@@ -258,34 +380,37 @@ class ContextualReasoning:
         return {'change_percent': change_percent, 'trend': trend}
 
 class AIReasoningEngine:
-    def __init__(self):
-        self.insight_generator = HealthInsightGenerator()
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None):
+        # One set of rule thresholds for the core insights and the pattern analyzer
+        thresholds = thresholds if thresholds is not None else load_pattern_thresholds()
+        self.insight_generator = HealthInsightGenerator(thresholds)
         self.recommendation_engine = HealthRecommendationEngine()
         self.contextual_reasoning = ContextualReasoning()
         # Advanced anomaly and pattern detection module
-        self.pattern_analyzer = AdvancedPatternAnalyzer()
+        self.pattern_analyzer = AdvancedPatternAnalyzer(thresholds)
     
-    def analyze_health_data(self, health_data: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
-        """Main analysis function that processes all health data"""
+    def analyze_health_data(self, health_data: Dict[str, pd.DataFrame], reference_date=None) -> Dict[str, Any]:
+        """
+        Main analysis function that processes all health data. The weekly
+        context ends at reference_date, now by default.
+        """
         insights: List[Insight] = []
         recommendations: List[str] = []
         
-        # Get weekly context for all data
-        weekly_data = {}
-        for data_type, df in health_data.items():
-            weekly_data[data_type] = self.contextual_reasoning.get_weekly_context(df)
+        # Weekly context for all data; statistics over it are computed once and shared
+        weekly_data = self.contextual_reasoning.analysis_context(health_data, reference_date)
         
         # Generate core insights for each data type
         if 'sleep' in weekly_data:
             sleep_insight = self.insight_generator.analyze_sleep_patterns(
-                weekly_data['sleep']
+                weekly_data['sleep'], weekly_data.stats('sleep', 'duration_hours')
             )
             insights.append(sleep_insight)
             recommendations.extend(self.recommendation_engine.get_recommendations('sleep', sleep_insight['severity']))
         
         if 'heart_rate' in weekly_data:
             hr_insight = self.insight_generator.analyze_heart_rate(
-                weekly_data['heart_rate']
+                weekly_data['heart_rate'], weekly_data.stats('heart_rate', 'heart_rate')
             )
             insights.append(hr_insight)
             recommendations.extend(self.recommendation_engine.get_recommendations('heart_rate', hr_insight['severity']))
@@ -299,7 +424,7 @@ class AIReasoningEngine:
         # These provide richer, more detailed anomalies that the UI can surface separately.
         if 'sleep' in weekly_data and not weekly_data['sleep'].empty:
             sleep_patterns = self.pattern_analyzer.detect_sleep_patterns(
-                weekly_data['sleep']
+                weekly_data['sleep'], weekly_data.stats('sleep', 'duration_hours')
             )
             if sleep_patterns.get('patterns'):
                 insights.append(
@@ -321,16 +446,10 @@ class AIReasoningEngine:
         
         if 'heart_rate' in weekly_data and not weekly_data['heart_rate'].empty:
             hr_anomalies = self.pattern_analyzer.detect_heart_rate_anomalies(
-                weekly_data['heart_rate']
+                weekly_data['heart_rate'], weekly_data.stats('heart_rate', 'heart_rate')
             )
             if hr_anomalies.get('anomalies'):
-                severity_map = {
-                    'high': 'warning',
-                    'moderate': 'caution',
-                    'low': 'info',
-                    'unknown': 'info',
-                }
-                severity = severity_map.get(hr_anomalies.get('risk_level', 'low'), 'info')
+                severity = RISK_SEVERITY.get(hr_anomalies.get('risk_level', 'low'), 'info')
                 insights.append(
                     Insight(
                         id='heart_rate:advanced_anomalies',
@@ -1,10 +1,34 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from ai_reasoning_engine import AIReasoningEngine
+from batch_engine import BatchReasoningEngine
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from itertools import chain
+import json
+import os
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+# Users analyzed together by one worker task of /analyze/batch
+BATCH_CHUNK_USERS = int(os.environ.get('AI_BATCH_CHUNK_USERS', 500))
+BATCH_WORKERS = int(os.environ.get('AI_BATCH_WORKERS', min(4, os.cpu_count() or 1)))
+# 'thread' shares the process; 'process' copies each chunk's frames to a worker process
+BATCH_EXECUTOR = os.environ.get('AI_BATCH_EXECUTOR', 'thread')
+
+NDJSON_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl', 'application/jsonlines')
+
 app = Flask(__name__)
+# Shared by the request threads and the /analyze/batch workers; the engines'
+# only state is the ContextualReasoning window cache, which is thread-safe
 ai_engine = AIReasoningEngine()
+batch_engine = BatchReasoningEngine(ai_engine)
+
+_pool = None
+
+
+class BatchPayloadError(ValueError):
+    """The /analyze/batch body could not be read as NDJSON or columnar JSON."""
+
 
 @app.route('/analyze', methods=['POST'])
 def analyze_health_data():
@@ -32,6 +56,162 @@ def analyze_health_data():
             'message': str(e)
         }), 400
 
+
+def frames_from_ndjson(body: bytes) -> tuple:
+    """
+    (user ids, {data_type: long-format frame}) from one JSON object per
+    line, each a /analyze payload with its "user_id". Every data type is
+    built with one DataFrame constructor over all users' records.
+    """
+    user_ids, records, owners = [], {}, {}
+    for number, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            payload = json.loads(line)
+        except ValueError as e:
+            raise BatchPayloadError(f"Line {number} is not valid JSON: {e}")
+        if not isinstance(payload, dict) or 'user_id' not in payload:
+            raise BatchPayloadError(f"Line {number} has no user_id")
+        user_id = payload['user_id']
+        if isinstance(user_id, (dict, list)):
+            raise BatchPayloadError(f"Line {number}: user_id must be a string or number")
+        user_ids.append(user_id)
+        for data_type, rows in payload.items():
+            if data_type == 'user_id' or not rows:
+                continue
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise BatchPayloadError(f"Line {number}: '{data_type}' must be a list of objects")
+            records.setdefault(data_type, []).append(rows)
+            owners.setdefault(data_type, []).append((user_id, len(rows)))
+
+    health_data = {}
+    for data_type, lists in records.items():
+        frame = pd.DataFrame.from_records(list(chain.from_iterable(lists)))
+        ids, counts = zip(*owners[data_type])
+        frame.insert(0, 'user_id', np.repeat(np.array(ids, dtype=object), counts))
+        health_data[data_type] = frame
+    return list(dict.fromkeys(user_ids)), health_data
+
+
+def frames_from_columns(payload: dict) -> tuple:
+    """
+    (user ids, {data_type: long-format frame}) from columnar JSON:
+    {"sleep": {"user_id": [...], "date": [...], "duration_hours": [...]}, ...}
+    """
+    if not isinstance(payload, dict):
+        raise BatchPayloadError("Expected an object of columns per data type")
+    health_data = {}
+    for data_type, columns in payload.items():
+        if not isinstance(columns, dict) or 'user_id' not in columns:
+            raise BatchPayloadError(f"'{data_type}' needs a user_id column")
+        if not isinstance(columns['user_id'], list) or any(isinstance(u, (dict, list)) for u in columns['user_id']):
+            raise BatchPayloadError(f"'{data_type}': user_id must be a list of strings or numbers")
+        try:
+            frame = pd.DataFrame(columns)
+        except ValueError as e:
+            raise BatchPayloadError(f"'{data_type}': {e}")
+        if not frame.empty:
+            health_data[data_type] = frame
+    users = pd.unique(pd.concat([df['user_id'] for df in health_data.values()], ignore_index=True)) if health_data else []
+    return list(users), health_data
+
+
+def split_users(user_ids: list, health_data: dict, chunk_users: int) -> list:
+    """[(user ids, frames of those users)] in chunks of chunk_users, rows kept in order."""
+    index = pd.Index(user_ids)
+    n_chunks = max(-(-len(user_ids) // chunk_users), 1)
+    chunks = [(user_ids[i * chunk_users:(i + 1) * chunk_users], {}) for i in range(n_chunks)]
+    for data_type, frame in health_data.items():
+        chunk_of_row = index.get_indexer(frame['user_id']) // chunk_users
+        order = np.argsort(chunk_of_row, kind='stable')
+        bounds = np.searchsorted(chunk_of_row[order], np.arange(n_chunks + 1))
+        for i, (_, frames) in enumerate(chunks):
+            if bounds[i + 1] > bounds[i]:
+                frames[data_type] = frame.iloc[order[bounds[i]:bounds[i + 1]]]
+    return chunks
+
+
+def analyze_chunk(user_ids: list, health_data: dict, reference_date) -> dict:
+    """analyze_health_data output for each of user_ids; runs in a pool worker."""
+    results = batch_engine.analyze_by_user(health_data, reference_date) if health_data else {}
+    for user_id in user_ids:
+        if user_id not in results:
+            # No rows of any type for this user
+            results[user_id] = ai_engine.analyze_health_data({}, reference_date)
+    return {user_id: results[user_id] for user_id in user_ids}
+
+
+def _worker_pool():
+    global _pool
+    if _pool is None:
+        if BATCH_EXECUTOR == 'process':
+            _pool = ProcessPoolExecutor(max_workers=BATCH_WORKERS)
+        else:
+            _pool = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='ai-batch')
+    return _pool
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (datetime, pd.Timestamp)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_line(value: dict) -> str:
+    return json.dumps(value, default=_json_default) + '\n'
+
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze many users in one request. The body is NDJSON (one /analyze
+    payload with a "user_id" per line; Content-Type application/x-ndjson
+    or ?format=ndjson) or columnar JSON (per data type, an object of
+    equal-length columns including user_id). Users are analyzed in chunks
+    on a worker pool and each user's result is streamed back as one NDJSON
+    line as soon as its chunk completes, so lines are not in input order.
+    """
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'ndjson' if request.mimetype in NDJSON_TYPES else 'columnar'
+    try:
+        if fmt == 'ndjson':
+            user_ids, health_data = frames_from_ndjson(request.get_data())
+        elif fmt == 'columnar':
+            user_ids, health_data = frames_from_columns(json.loads(request.get_data() or b'null'))
+        else:
+            raise BatchPayloadError(f"Unknown format '{fmt}', expected 'ndjson' or 'columnar'")
+        reference_date = request.args.get('reference_date')
+        reference_date = pd.Timestamp(reference_date).to_pydatetime() if reference_date else datetime.now()
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    pool = _worker_pool()
+    futures = {
+        pool.submit(analyze_chunk, chunk_ids, frames, reference_date): chunk_ids
+        for chunk_ids, frames in split_users(user_ids, health_data, BATCH_CHUNK_USERS)
+        if chunk_ids
+    }
+
+    def stream():
+        for future in as_completed(futures):
+            try:
+                results = future.result()
+            except Exception as e:
+                for user_id in futures[future]:
+                    yield _ndjson_line({'user_id': user_id, 'status': 'error', 'message': str(e)})
+                continue
+            yield ''.join(
+                _ndjson_line({'user_id': user_id, 'status': 'success', 'data': result})
+                for user_id, result in results.items()
+            )
+
+    return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -42,4 +222,5 @@ def health_check():
     })
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    # Development server; see serve.py for production
+    app.run(debug=True, port=5000)
@@ -0,0 +1,327 @@
+import pandas as pd
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+
+from ai_reasoning_engine import AIReasoningEngine, Insight, RISK_SEVERITY
+from pattern_analyzer import NIGHT_HOUR_MASK, _numpy_stat, day_of_week, hour_of_day
+from series_stats import SeriesStats
+
+INSIGHT_COLUMNS = ['user_id', 'id', 'type', 'severity', 'title', 'message', 'suggested_actions', 'metadata']
+
+
+class UserGroups:
+    """
+    Rows of one long-format frame grouped by user code. Masked counts, sums
+    and means are one grouped NumPy operation over all users; the statistics
+    the insight rules read come from `series_stats`, the same SeriesStats
+    kernel the single-user path uses. Missing values are skipped like pandas
+    does, except in the head/tail means, which follow np.mean; users without
+    values get NaN (or a count of 0).
+    """
+
+    def __init__(self, codes: np.ndarray, n_users: int):
+        self.codes = codes
+        self.n_users = n_users
+        self.counts = np.bincount(codes, minlength=n_users)
+        # Position of each row within its user's rows, in frame order
+        self.order = np.argsort(codes, kind='stable')
+        starts = np.cumsum(self.counts) - self.counts
+        self.rank = np.empty(len(codes), dtype=np.int64)
+        self.rank[self.order] = np.arange(len(codes)) - starts[codes[self.order]]
+
+    def count(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        if mask is None:
+            return self.counts
+        return np.bincount(self.codes[mask], minlength=self.n_users)
+
+    def _valid(self, values: np.ndarray, mask: Optional[np.ndarray]) -> np.ndarray:
+        valid = ~np.isnan(values)
+        return valid if mask is None else valid & mask
+
+    def sum(self, values: np.ndarray, mask: Optional[np.ndarray] = None, skipna: bool = True) -> np.ndarray:
+        if skipna:
+            mask = self._valid(values, mask)
+        if mask is None:
+            return np.bincount(self.codes, weights=values, minlength=self.n_users)
+        return np.bincount(self.codes[mask], weights=values[mask], minlength=self.n_users)
+
+    def mean(self, values: np.ndarray, mask: Optional[np.ndarray] = None, skipna: bool = True) -> np.ndarray:
+        counted = self._valid(values, mask) if skipna else mask
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.sum(values, mask, skipna) / self.count(counted)
+
+    def max(self, values: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        mask = self._valid(values, mask)
+        result = np.full(self.n_users, -np.inf)
+        np.maximum.at(result, self.codes[mask], values[mask])
+        return np.where(np.isinf(result), np.nan, result)
+
+    def series_stats(self, values: np.ndarray) -> List[SeriesStats]:
+        """SeriesStats of each user's values, in frame order."""
+        return [SeriesStats(part) for part in np.split(values[self.order], np.cumsum(self.counts)[:-1])]
+
+    def first(self, mask: np.ndarray) -> np.ndarray:
+        """Row index of each user's first row matching mask, -1 when none."""
+        rows = np.flatnonzero(mask)
+        users, at = np.unique(self.codes[rows], return_index=True)
+        first = np.full(self.n_users, -1, dtype=np.int64)
+        first[users] = rows[at]
+        return first
+
+    def head_mean(self, values: np.ndarray, n: int) -> np.ndarray:
+        return self.mean(values, self.rank < n, skipna=False)
+
+    def tail_mean(self, values: np.ndarray, n: int) -> np.ndarray:
+        return self.mean(values, self.rank >= self.counts[self.codes] - n, skipna=False)
+
+
+class BatchReasoningEngine:
+    """
+    Runs AIReasoningEngine.analyze_health_data for many users at once.
+
+    Takes the same per-type frames in long format, with a `user_id` column,
+    and computes every user's sleep, heart rate and hydration insights with
+    grouped aggregations instead of one analysis per user. Insights,
+    recommendations and metadata match the single-user output up to
+    floating-point summation order.
+    """
+
+    def __init__(self, engine: Optional[AIReasoningEngine] = None):
+        self.engine = engine or AIReasoningEngine()
+
+    def _insight(self, id, type, severity, title, message, metadata) -> Insight:
+        return {
+            'id': id,
+            'type': type,
+            'severity': severity,
+            'title': title,
+            'message': message,
+            'suggested_actions': [],
+            'metadata': metadata,
+        }
+
+    def _sleep(self, df: pd.DataFrame, groups: UserGroups) -> Tuple[List[Insight], List[Optional[Insight]]]:
+        templates = self.engine.insight_generator.insight_templates['sleep']
+        rules = self.engine.insight_generator.thresholds
+        thresholds = self.engine.pattern_analyzer.pattern_thresholds
+        durations = df['duration_hours'].to_numpy(dtype=float)
+        stats = groups.series_stats(durations)
+        avg = np.array([user_stats.mean for user_stats in stats])
+        variance = np.array([user_stats.var for user_stats in stats])
+
+        insights = []
+        for user in range(groups.n_users):
+            if groups.counts[user] == 0:
+                insights.append(self._insight(
+                    'sleep:no_data', 'sleep', 'info', 'No sleep data',
+                    'No sleep data available for the selected period.', {},
+                ))
+                continue
+            metadata = {'avg_hours': float(avg[user]), 'variance': float(variance[user])}
+            if avg[user] < rules['sleep_min_hours']:
+                insights.append(self._insight(
+                    'sleep:insufficient', 'sleep', 'warning', 'Sleep is below recommended levels',
+                    templates['insufficient'].format(hours=rules['sleep_min_hours']), metadata,
+                ))
+            elif variance[user] > rules['sleep_variance']:
+                insights.append(self._insight(
+                    'sleep:irregular', 'sleep', 'caution', 'Sleep pattern is irregular',
+                    templates['irregular'], metadata,
+                ))
+            else:
+                insights.append(self._insight(
+                    'sleep:good', 'sleep', 'good', 'Sleep looks healthy', templates['good'], metadata,
+                ))
+
+        # AdvancedPatternAnalyzer.detect_sleep_patterns, for users with 3+ nights
+        patterns = [[] for _ in range(groups.n_users)]
+        if 'date' in df.columns:
+            weekday = day_of_week(df['date'])
+            weekday_sleep = groups.mean(durations, (weekday >= 0) & (weekday < 5))
+            weekend_sleep = groups.mean(durations, weekday >= 5)
+            difference = np.abs(weekend_sleep - weekday_sleep)
+            for user in np.flatnonzero(difference > thresholds['weekend_sleep_difference']):
+                patterns[user].append(f"Weekend sleep differs by {difference[user]:.1f} hours from weekdays")
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = (groups.tail_mean(durations, 3) - groups.head_mean(durations, 3)) / groups.head_mean(durations, 3)
+        significance = thresholds['trend_significance']
+        trending = groups.counts >= 5
+        # np.var / np.mean in the pattern analyzer: NaN for users with a missing night
+        population_var = np.array([_numpy_stat(user_stats, user_stats.var_population) for user_stats in stats])
+        pattern_avg = np.array([_numpy_stat(user_stats, user_stats.mean) for user_stats in stats])
+        for user in range(groups.n_users):
+            if not trending[user]:
+                continue
+            if change[user] < -significance:
+                patterns[user].append(f"Sleep duration declining by {abs(change[user])*100:.0f}% over the period")
+            elif change[user] > significance:
+                patterns[user].append(f"Sleep duration improving by {change[user]*100:.0f}% over the period")
+        for user in np.flatnonzero(population_var > thresholds['sleep_irregularity']):
+            patterns[user].append("Highly irregular sleep schedule detected")
+
+        advanced = [None] * groups.n_users
+        for user in np.flatnonzero(groups.counts >= 3):
+            if patterns[user]:
+                advanced[user] = self._insight(
+                    'sleep:advanced_patterns', 'sleep', 'caution', 'Detailed sleep patterns detected',
+                    '; '.join(patterns[user]),
+                    {
+                        'avg_duration': float(pattern_avg[user]),
+                        'consistency_score': float(max(0, 100 - (population_var[user] * 20))),
+                    },
+                )
+        return insights, advanced
+
+    def _heart_rate(self, df: pd.DataFrame, groups: UserGroups) -> Tuple[List[Insight], List[Optional[Insight]]]:
+        templates = self.engine.insight_generator.insight_templates['heart_rate']
+        rules = self.engine.insight_generator.thresholds
+        thresholds = self.engine.pattern_analyzer.pattern_thresholds
+        column = df['heart_rate'].to_numpy()
+        rates = column.astype(float)
+        stats = groups.series_stats(column)
+        baseline = np.array([user_stats.median for user_stats in stats], dtype=float)
+        spike = rates > baseline[groups.codes] * rules['hr_spike_threshold']
+        spike_count = groups.count(spike)
+        first_spike = groups.first(spike)
+        timestamps = pd.to_datetime(df['timestamp']) if 'timestamp' in df.columns else None
+
+        insights = []
+        for user in range(groups.n_users):
+            if groups.counts[user] == 0:
+                insights.append(self._insight(
+                    'heart_rate:no_data', 'heart_rate', 'info', 'No heart rate data',
+                    'No heart rate data available for the selected period.', {},
+                ))
+                continue
+            metadata = {'baseline': float(baseline[user]), 'spike_count': int(spike_count[user])}
+            if spike_count[user]:
+                spike_time = timestamps.iloc[first_spike[user]].strftime('%I%p')
+                insights.append(self._insight(
+                    'heart_rate:spike', 'heart_rate', 'warning', 'Heart rate spike detected',
+                    templates['spike'].format(time=spike_time), metadata,
+                ))
+            else:
+                insights.append(self._insight(
+                    'heart_rate:normal', 'heart_rate', 'good', 'Heart rate looks normal',
+                    templates['normal'], metadata,
+                ))
+
+        # AdvancedPatternAnalyzer.detect_heart_rate_anomalies; its NumPy
+        # statistics are NaN for users with a missing reading
+        anomalies = [[] for _ in range(groups.n_users)]
+        q25 = np.array([_numpy_stat(user_stats, user_stats.percentile(25)) for user_stats in stats], dtype=float)
+        q75 = np.array([_numpy_stat(user_stats, user_stats.percentile(75)) for user_stats in stats], dtype=float)
+        upper_bound = q75 + thresholds['hr_outlier_iqr'] * (q75 - q25)
+        outlier = rates > upper_bound[groups.codes]
+        max_spike = groups.max(rates, outlier)
+        for user in np.flatnonzero(groups.count(outlier)):
+            # Formatted in the column's dtype, as the single-user path does
+            anomalies[user].append(f"Heart rate spike detected: {column.dtype.type(max_spike[user])} bpm")
+
+        if timestamps is not None:
+            night = NIGHT_HOUR_MASK[hour_of_day(timestamps)]
+            night_avg = groups.mean(rates, night)
+            day_avg = groups.mean(rates, ~night)
+            for user in np.flatnonzero(groups.count(night) > 0):
+                if night_avg[user] > day_avg[user] * thresholds['night_hr_ratio']:
+                    anomalies[user].append("Elevated nighttime heart rate detected - possible sleep issues")
+
+        avg_hr = np.array([_numpy_stat(user_stats, user_stats.mean) for user_stats in stats], dtype=float)
+        max_hr = np.array([_numpy_stat(user_stats, user_stats.max) for user_stats in stats], dtype=float)
+        risk = np.where(
+            (avg_hr > thresholds['hr_high_avg']) | (max_hr > thresholds['hr_high_max']), 'high',
+            np.where(
+                (avg_hr > thresholds['hr_moderate_avg']) | (max_hr > thresholds['hr_moderate_max']),
+                'moderate', 'low',
+            ),
+        )
+        advanced = [None] * groups.n_users
+        for user in range(groups.n_users):
+            if anomalies[user]:
+                advanced[user] = self._insight(
+                    'heart_rate:advanced_anomalies', 'heart_rate', RISK_SEVERITY.get(str(risk[user]), 'info'),
+                    'Detailed heart rate anomalies detected', '; '.join(anomalies[user]),
+                    {'risk_level': str(risk[user]), 'avg_heart_rate': float(avg_hr[user]), 'max_heart_rate': float(max_hr[user])},
+                )
+        return insights, advanced
+
+    def _hydration(self, df: pd.DataFrame, groups: UserGroups) -> Tuple[List[Insight], List[Optional[Insight]]]:
+        templates = self.engine.insight_generator.insight_templates['hydration']
+        rules = self.engine.insight_generator.thresholds
+        recommended_daily = rules['hydration_daily_ml']
+        low_days = groups.count(df['water_ml'].to_numpy(dtype=float) < recommended_daily)
+
+        insights = []
+        for user in range(groups.n_users):
+            if groups.counts[user] == 0:
+                insights.append(self._insight(
+                    'hydration:no_data', 'hydration', 'info', 'No hydration data',
+                    'No hydration data available for the selected period.', {},
+                ))
+                continue
+            metadata = {'low_days': int(low_days[user]), 'recommended_daily_ml': int(recommended_daily)}
+            if low_days[user] >= rules['hydration_low_days']:
+                insights.append(self._insight(
+                    'hydration:low', 'hydration', 'warning', 'Hydration below recommended levels',
+                    templates['low'].format(days=int(low_days[user])), metadata,
+                ))
+            else:
+                insights.append(self._insight(
+                    'hydration:good', 'hydration', 'good', 'Hydration looks good', templates['good'], metadata,
+                ))
+        return insights, [None] * groups.n_users
+
+    def analyze_by_user(self, health_data: Dict[str, pd.DataFrame], reference_date=None) -> Dict[Any, Dict[str, Any]]:
+        """
+        analyze_health_data output per user_id, for long-format frames of
+        many users, with the weekly context ending at reference_date (now
+        by default). Every user in any frame gets a result; a data type
+        without rows for a user gives its 'no_data' insight.
+        """
+        reference_date = reference_date if reference_date is not None else datetime.now()
+        users = pd.unique(pd.concat([df['user_id'] for df in health_data.values()], ignore_index=True))
+        index = pd.Index(users)
+
+        analyzers = {'sleep': self._sleep, 'heart_rate': self._heart_rate, 'hydration': self._hydration}
+        core, advanced = {}, {}
+        for data_type, analyze in analyzers.items():
+            if data_type not in health_data:
+                continue
+            df = health_data[data_type]
+            # In input order, like each user's own weekly context
+            weekly = self.engine.contextual_reasoning.get_weekly_context(df, reference_date=reference_date)
+            groups = UserGroups(index.get_indexer(weekly['user_id']), len(users))
+            core[data_type], advanced[data_type] = analyze(weekly, groups)
+
+        context_period = f"Last {self.engine.contextual_reasoning.context_window} days"
+        analysis_date = datetime.now().isoformat()
+        get_recommendations = self.engine.recommendation_engine.get_recommendations
+        results = {}
+        for user, user_id in enumerate(users.tolist()):
+            insights: List[Insight] = []
+            recommendations: List[str] = []
+            for data_type in core:
+                insight = core[data_type][user]
+                insights.append(insight)
+                recommendations.extend(get_recommendations(data_type, insight['severity']))
+            for data_type in ('sleep', 'heart_rate'):
+                if data_type in advanced and advanced[data_type][user] is not None:
+                    insights.append(advanced[data_type][user])
+            results[user_id] = {
+                'insights': insights,
+                'recommendations': list(set(recommendations)),  # Remove duplicates
+                'analysis_date': analysis_date,
+                'context_period': context_period,
+            }
+        return results
+
+    def analyze(self, health_data: Dict[str, pd.DataFrame], reference_date=None) -> pd.DataFrame:
+        """Insight table: one row per (user_id, insight), in analyze_health_data order."""
+        rows = [
+            {'user_id': user_id, **insight}
+            for user_id, result in self.analyze_by_user(health_data, reference_date).items()
+            for insight in result['insights']
+        ]
+        return pd.DataFrame(rows, columns=INSIGHT_COLUMNS)
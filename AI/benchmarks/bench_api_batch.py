@@ -0,0 +1,116 @@
+"""
+Throughput of POST /analyze/batch (NDJSON and columnar bodies) against
+one POST /analyze per user, over HTTP to a local server: users per second
+and the time to the first streamed result line.
+
+The server is werkzeug's threaded WSGI server, started in-process with
+request logging off; per-user calls reuse one keep-alive connection.
+
+Usage (from the AI directory):
+    python benchmarks/bench_api_batch.py
+    python benchmarks/bench_api_batch.py --users 1000 10000 --per-user 300
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from werkzeug.serving import make_server
+
+from api_integration import app
+
+
+def make_payloads(n_users: int) -> list:
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    days = [(now - timedelta(days=d)).isoformat() for d in range(14, 0, -1)]
+    readings = [(now - timedelta(hours=h)).isoformat() for h in range(0, 14 * 24, 4)]
+    payloads = []
+    for i in range(n_users):
+        sleep = rng.normal(rng.normal(7, 0.6), 1.0, len(days)).round(1)
+        hr = rng.normal(rng.normal(75, 6), 12, len(readings)).round().astype(int)
+        water = rng.normal(2000, 350, len(days)).round()
+        payloads.append({
+            'user_id': f"u{i:05d}",
+            'sleep': [{'date': d, 'duration_hours': float(v)} for d, v in zip(days, sleep)],
+            'heart_rate': [{'timestamp': t, 'heart_rate': int(v)} for t, v in zip(readings, hr)],
+            'hydration': [{'date': d, 'water_ml': float(v)} for d, v in zip(days, water)],
+        })
+    return payloads
+
+
+def columnar(payloads: list) -> dict:
+    body = {}
+    for data_type in ('sleep', 'heart_rate', 'hydration'):
+        rows = [dict(row, user_id=p['user_id']) for p in payloads for row in p[data_type]]
+        body[data_type] = {column: [row[column] for row in rows] for column in rows[0]}
+    return body
+
+
+def post_batch(port: int, body: bytes, content_type: str) -> tuple:
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    conn.request('POST', '/analyze/batch', body=body, headers={'Content-Type': content_type})
+    response = conn.getresponse()
+    first_line = response.readline()
+    first = time.perf_counter() - start
+    lines = 1 + sum(1 for _ in iter(response.readline, b''))
+    seconds = time.perf_counter() - start
+    conn.close()
+    assert json.loads(first_line)['status'] == 'success'
+    return seconds, first, lines
+
+
+def post_each(port: int, payloads: list) -> float:
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    for payload in payloads:
+        body = json.dumps({k: v for k, v in payload.items() if k != 'user_id'}).encode()
+        conn.request('POST', '/analyze', body=body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200
+    seconds = time.perf_counter() - start
+    conn.close()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--per-user', type=int, default=200, help="users sent one /analyze request each")
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    print(f"{'users':>7} {'endpoint':>16} {'body MB':>8} {'seconds':>8} {'users/s':>9} {'first line s':>13}")
+    payloads = make_payloads(args.per_user)
+    seconds = post_each(port, payloads)
+    print(f"{args.per_user:7,d} {'/analyze each':>16} {'':>8} {seconds:8.2f} {args.per_user / seconds:9,.0f} {'':>13}")
+    for n_users in args.users:
+        payloads = make_payloads(n_users)
+        bodies = [
+            ('batch ndjson', '\n'.join(json.dumps(p) for p in payloads).encode(), 'application/x-ndjson'),
+            ('batch columnar', json.dumps(columnar(payloads)).encode(), 'application/json'),
+        ]
+        for label, body, content_type in bodies:
+            seconds, first, lines = post_batch(port, body, content_type)
+            assert lines == n_users
+            print(f"{n_users:7,d} {label:>16} {len(body) / 1e6:8.1f} {seconds:8.2f} {n_users / seconds:9,.0f} {first:13.2f}")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
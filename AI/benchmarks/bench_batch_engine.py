@@ -0,0 +1,116 @@
+"""
+Benchmark BatchReasoningEngine against one AIReasoningEngine.analyze_health_data
+call per user, and check that both give the same insights.
+
+Usage (from the AI directory):
+    python benchmarks/bench_batch_engine.py
+    python benchmarks/bench_batch_engine.py --users 10000 --loop-users 1000 --days 10
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ai_reasoning_engine import AIReasoningEngine
+from batch_engine import BatchReasoningEngine
+
+
+def make_population(n_users: int, n_days: int, readings_per_day: int = 3) -> dict:
+    rng = np.random.default_rng(0)
+    now = datetime.now().replace(minute=0, second=0, microsecond=0)
+    dates = np.array([now - timedelta(days=i) for i in range(n_days, 0, -1)], dtype='datetime64[ns]')
+    users = np.array([f"u{i:05d}" for i in range(n_users)])
+    hours = np.array([9, 15, 23][:readings_per_day], dtype='timedelta64[h]')
+
+    n = n_users * n_days
+    sleep_mean = rng.normal(7, 0.8, n_users).repeat(n_days)
+    return {
+        'sleep': pd.DataFrame({
+            'user_id': users.repeat(n_days),
+            'date': np.tile(dates, n_users),
+            'duration_hours': (sleep_mean + rng.normal(0, 1.2, n)).round(1),
+        }),
+        'heart_rate': pd.DataFrame({
+            'user_id': users.repeat(n_days * readings_per_day),
+            'timestamp': np.tile((dates[:, None] + hours).ravel(), n_users),
+            'heart_rate': rng.normal(76, 12, n * readings_per_day).round().astype(int),
+        }),
+        'hydration': pd.DataFrame({
+            'user_id': users.repeat(n_days),
+            'date': np.tile(dates, n_users),
+            'water_ml': rng.normal(2000, 350, n).round(),
+        }),
+    }
+
+
+def same_value(a, b) -> bool:
+    if isinstance(a, float) and isinstance(b, float):
+        return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9)
+    return a == b
+
+
+def same_result(single: dict, batch: dict) -> bool:
+    if set(single['recommendations']) != set(batch['recommendations']):
+        return False
+    if len(single['insights']) != len(batch['insights']):
+        return False
+    for a, b in zip(single['insights'], batch['insights']):
+        if any(a[key] != b[key] for key in ('id', 'type', 'severity', 'title', 'message', 'suggested_actions')):
+            return False
+        if a['metadata'].keys() != b['metadata'].keys():
+            return False
+        if not all(same_value(value, b['metadata'][key]) for key, value in a['metadata'].items()):
+            return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--loop-users', type=int, default=1_000, help='users analyzed one call at a time')
+    parser.add_argument('--days', type=int, default=10)
+    args = parser.parse_args()
+
+    population = make_population(args.users, args.days)
+    print(f"{args.users:,} users, {args.days} days, {sum(len(df) for df in population.values()):,} rows")
+
+    engine = BatchReasoningEngine()
+    reference_date = datetime.now()
+    start = time.perf_counter()
+    batch = engine.analyze_by_user(population, reference_date)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = engine.analyze(population, reference_date)
+    table_seconds = time.perf_counter() - start
+
+    # One analysis per user over that user's frames, as the loop it replaces does
+    loop_users = set(list(batch)[:args.loop_users])
+    per_user = {}
+    for data_type, df in population.items():
+        subset = df[df['user_id'].isin(loop_users)]
+        for user_id, frame in subset.groupby('user_id', sort=False):
+            per_user.setdefault(user_id, {})[data_type] = frame.reset_index(drop=True)
+    single_engine = AIReasoningEngine()
+    start = time.perf_counter()
+    single = {user_id: single_engine.analyze_health_data(frames, reference_date) for user_id, frames in per_user.items()}
+    loop_seconds = (time.perf_counter() - start) * args.users / len(single)
+
+    mismatches = sum(not same_result(single[user_id], batch[user_id]) for user_id in single)
+    print(f"{'path':>22} {'seconds':>9} {'users/s':>10}")
+    print(f"{'per-user loop (est.)':>22} {loop_seconds:9.2f} {args.users / loop_seconds:10,.0f}")
+    print(f"{'batch analyze_by_user':>22} {batch_seconds:9.2f} {args.users / batch_seconds:10,.0f}")
+    print(f"{'batch analyze (table)':>22} {table_seconds:9.2f} {args.users / table_seconds:10,.0f}")
+    print(f"speedup {loop_seconds / batch_seconds:.0f}x; {len(table):,} insight rows; "
+          f"{mismatches} of {len(single):,} checked users differ from the single-user output")
+
+
+if __name__ == '__main__':
+    main()
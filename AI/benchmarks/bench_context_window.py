@@ -0,0 +1,75 @@
+"""
+Benchmark ContextualReasoning.get_weekly_context against the previous
+copy-and-reparse implementation, on the first call for a frame and on
+repeated calls (another data type, another engine, another reference date).
+
+Usage (from the AI directory):
+    python benchmarks/bench_context_window.py
+    python benchmarks/bench_context_window.py --rows 10000 100000 1000000 --repeat 20
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ai_reasoning_engine import ContextualReasoning
+
+
+def legacy_weekly_context(data: pd.DataFrame, date_col: str = 'timestamp', days: int = 7) -> pd.DataFrame:
+    start_date = datetime.now() - timedelta(days=days)
+    data_copy = data.copy()
+    data_copy[date_col] = pd.to_datetime(data_copy[date_col])
+    return data_copy[data_copy[date_col] >= start_date]
+
+
+def make_readings(n_rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    # One reading every few minutes over the past months, as ISO strings like the API receives
+    timestamps = pd.date_range(end=datetime.now(), periods=n_rows, freq='5min')
+    return pd.DataFrame({
+        'timestamp': timestamps.strftime('%Y-%m-%dT%H:%M:%S'),
+        'heart_rate': rng.normal(75, 10, n_rows).round().astype(int),
+    })
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy ms':>10} {'first ms':>9} {'repeat ms':>10} {'speedup':>8}")
+    for n_rows in args.rows:
+        df = make_readings(n_rows)
+        reference = datetime.now()
+        expected = legacy_weekly_context(df)
+
+        legacy_ms = timed(lambda: legacy_weekly_context(df), args.repeat)
+        start = time.perf_counter()
+        context = ContextualReasoning()
+        window = context.get_weekly_context(df, reference_date=reference)
+        first_ms = (time.perf_counter() - start) * 1000
+        assert window['heart_rate'].tolist() == expected['heart_rate'].tolist()
+
+        # Each repeat slides the reference date, so nothing is served from the window memo
+        references = [reference - timedelta(minutes=i) for i in range(args.repeat)]
+        it = iter(references)
+        repeat_ms = timed(lambda: context.get_weekly_context(df, reference_date=next(it)), args.repeat)
+        print(f"{n_rows:10,d} {legacy_ms:10.2f} {first_ms:9.2f} {repeat_ms:10.3f} {legacy_ms / repeat_ms:7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
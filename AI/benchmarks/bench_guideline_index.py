@@ -0,0 +1,100 @@
+"""
+Benchmark GuidelineIndex on a synthetic corpus of a few thousand passages
+(the bundled passages recombined): build time, the time to open the saved
+index in a new process, and search latency with and without the query
+cache.
+
+Usage (from the AI directory):
+    python benchmarks/bench_guideline_index.py
+    python benchmarks/bench_guideline_index.py --passages 2000 5000 20000 --queries 2000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from guideline_index import GuidelineIndex, load_passages
+
+INSIGHTS = [
+    "You're averaging only 6.2 hours of sleep - significantly below the recommended 7-9 hours.",
+    "Your sleep schedule varies widely (5.5-8.5 hours) - consistency helps sleep quality.",
+    "Heart rate spiked to 130 bpm with 5 elevated readings - monitor stress levels.",
+    "Your average heart rate of 84 bpm is elevated - consider relaxation techniques.",
+    "Your hydration is below the recommended 2L daily.",
+    "Great job maintaining 7.5 hours of sleep consistently!",
+]
+
+
+def make_corpus(n_passages: int, path: str):
+    rng = np.random.default_rng(0)
+    bundled = load_passages()
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(n_passages):
+            parts = [bundled[j] for j in rng.choice(len(bundled), size=rng.integers(1, 4), replace=False)]
+            passage = {'id': f"synthetic-{i:05d}", 'topic': parts[0]['topic'],
+                       'text': ' '.join(part['text'] for part in parts), 'source': parts[0]['source']}
+            f.write(json.dumps(passage) + '\n')
+
+
+def make_queries(n_queries: int) -> list:
+    rng = np.random.default_rng(1)
+    # Combined insight text of a user, as the lifestyle prompt searches with
+    return [' '.join(rng.choice(INSIGHTS, size=rng.integers(1, 4), replace=False)) for _ in range(n_queries)]
+
+
+def latencies(index: GuidelineIndex, queries: list) -> np.ndarray:
+    times = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        index.search(query, k=3)
+        times[i] = time.perf_counter() - start
+    return times * 1e6
+
+
+def open_in_new_process(corpus: str, directory: str) -> float:
+    code = (
+        "import sys, time; sys.path.insert(0, sys.argv[1]); from guideline_index import GuidelineIndex; "
+        "start = time.perf_counter(); GuidelineIndex.open(sys.argv[2], sys.argv[3]); "
+        "print((time.perf_counter() - start) * 1000)"
+    )
+    ai_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+    return float(subprocess.check_output([sys.executable, '-c', code, ai_dir, corpus, directory]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--passages', type=int, nargs='+', default=[2000, 5000, 20000])
+    parser.add_argument('--queries', type=int, default=2000)
+    args = parser.parse_args()
+    queries = make_queries(args.queries)
+
+    print(f"{'passages':>9} {'build ms':>9} {'open ms':>8} {'p50 us':>7} {'p99 us':>7} {'cached p50 us':>14}")
+    for n_passages in args.passages:
+        with tempfile.TemporaryDirectory() as directory:
+            corpus = os.path.join(directory, 'guidelines.jsonl')
+            make_corpus(n_passages, corpus)
+            start = time.perf_counter()
+            GuidelineIndex.open(corpus, os.path.join(directory, 'index'))
+            build_ms = (time.perf_counter() - start) * 1000
+            open_ms = open_in_new_process(corpus, os.path.join(directory, 'index'))
+
+            index = GuidelineIndex.open(corpus, os.path.join(directory, 'index'))
+            # The query cache is bypassed for the uncached latencies
+            uncached = GuidelineIndex(index.passages, index.vocabulary, index.indptr, index.doc_ids, index.weights,
+                                      index.topic_codes, index.topics, index.version, cache_size=0)
+            cold = latencies(uncached, queries)
+            latencies(index, queries)
+            warm = latencies(index, queries)
+            print(f"{n_passages:9,d} {build_ms:9.1f} {open_ms:8.1f} {np.percentile(cold, 50):7.1f} "
+                  f"{np.percentile(cold, 99):7.1f} {np.percentile(warm, 50):14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark the LLM response cache on a synthetic population: how many model
+calls the sleep and heart-rate insights of N users need with statistics
+bucketed and cached, the hit rate, and the hit rate after a restart with
+the on-disk tier.
+
+Model calls are counted, not made; `--latency-ms` converts them into the
+model time they would cost.
+
+Usage (from the AI directory):
+    python benchmarks/bench_llm_cache.py
+    python benchmarks/bench_llm_cache.py --users 1000 10000 --latency-ms 1500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from llm_cache import LLMResponseCache
+from llm_insight_generator import LLMInsightGenerator
+
+
+def make_users(n_users: int, seed: int = 0) -> list:
+    """A week of nightly sleep and hourly heart rate per user, spread like a real population."""
+    rng = np.random.default_rng(seed)
+    users = []
+    for _ in range(n_users):
+        sleep = rng.normal(rng.normal(7, 0.6), rng.uniform(0.3, 1.5), 7).round(1).clip(3, 11)
+        hr = rng.normal(rng.normal(72, 6), rng.uniform(5, 12), 7 * 24).round().clip(40, 180).astype(int)
+        users.append((pd.DataFrame({'duration_hours': sleep}), pd.DataFrame({'heart_rate': hr})))
+    return users
+
+
+class CountingGenerator(LLMInsightGenerator):
+    def __init__(self, cache):
+        super().__init__(cache)
+        self.model_calls = 0
+
+    def _simulate_llm_response(self, prompt, data_type, stats):
+        self.model_calls += 1
+        return super()._simulate_llm_response(prompt, data_type, stats)
+
+
+def run(generator: CountingGenerator, users: list) -> float:
+    start = time.perf_counter()
+    for sleep, hr in users:
+        generator.generate_sleep_insight(sleep)
+        generator.generate_heart_rate_insight(hr)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--latency-ms', type=float, default=1000, help="assumed latency of one model call")
+    args = parser.parse_args()
+
+    print(f"{'users':>7} {'run':>9} {'insights':>9} {'model calls':>12} {'hit rate':>9} {'model s':>9} {'us/insight':>11}")
+    for n_users in args.users:
+        users = make_users(n_users)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'llm_cache.db')
+            # A restart sees new users of the same population, served from disk
+            for label, population in [('first', users), ('restarted', make_users(n_users, seed=1))]:
+                generator = CountingGenerator(LLMResponseCache(path=path))
+                seconds = run(generator, population)
+                metrics = generator.cache.metrics()
+                insights = 2 * len(population)
+                print(
+                    f"{n_users:7,d} {label:>9} {insights:9,d} {generator.model_calls:12,d} {metrics['hit_rate']:9.1%} "
+                    f"{generator.model_calls * args.latency_ms / 1000:9,.0f} {seconds / insights * 1e6:11.0f}"
+                )
+        print(f"{'':7} {'uncached':>9} {insights:9,d} {insights:12,d} {0:9.1%} {insights * args.latency_ms / 1000:9,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark EnhancedAIReasoningEngine against the bundled stub LLM server:
+every prompt awaited one after another (as blocking calls would be), each
+user's prompts concurrently, and all users at once with prompts batched
+across users. A last run sets the call timeout below the server latency
+to show the fallback to the simulated responses.
+
+The response cache is disabled so every prompt reaches the server; httpx
+is required.
+
+Usage (from the AI directory):
+    python benchmarks/bench_llm_client.py
+    python benchmarks/bench_llm_client.py --users 500 --latency-ms 300 --per-prompt-ms 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from llm_cache import LLMResponseCache
+from llm_client import AsyncLLMClient
+from llm_insight_generator import EnhancedAIReasoningEngine
+from llm_stub_server import StubLLMServer
+
+
+def make_users(n_users: int) -> dict:
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    dates = [now - timedelta(days=i) for i in range(7, 0, -1)]
+    users = {}
+    for i in range(n_users):
+        users[f"u{i:05d}"] = {
+            'sleep': pd.DataFrame({'date': dates, 'duration_hours': rng.normal(6.8, 1.2, 7).round(1)}),
+            'heart_rate': pd.DataFrame({
+                'timestamp': [d + timedelta(hours=h) for d in dates for h in (9, 15, 21)],
+                'heart_rate': rng.normal(78, 12, 21).round().astype(int),
+            }),
+            'hydration': pd.DataFrame({'date': dates, 'water_ml': rng.normal(2000, 300, 7).round()}),
+        }
+    return users
+
+
+async def run(server: StubLLMServer, users: dict, mode: str, timeout: float) -> tuple:
+    # No response cache: every prompt is a model call
+    engine = EnhancedAIReasoningEngine(LLMResponseCache(max_entries=0))
+    serial = mode == 'serial'
+    client = AsyncLLMClient(
+        server.url, timeout=timeout,
+        max_concurrency=1 if serial else 8, batch_size=1 if mode != 'batched' else 16,
+    )
+    start = time.perf_counter()
+    async with client:
+        if mode == 'batched':
+            await engine.analyze_users_with_llm(users, client)
+        else:
+            for health_data in users.values():
+                await engine.analyze_with_llm_async(health_data, client)
+    return time.perf_counter() - start, client.metrics()
+
+
+async def bench(args):
+    users = make_users(args.users)
+    async with StubLLMServer(latency_ms=args.latency_ms, per_prompt_ms=args.per_prompt_ms) as server:
+        print(f"{args.users} users, stub latency {args.latency_ms:g} ms + {args.per_prompt_ms:g} ms/prompt")
+        print(f"{'mode':>16} {'seconds':>8} {'users/s':>8} {'requests':>9} {'prompts/req':>12} {'timeouts':>9}")
+        runs = [
+            ('serial', 'serial', 30.0),
+            ('per user', 'per_user', 30.0),
+            ('all users', 'batched', 30.0),
+            ('timeout fallback', 'batched', args.latency_ms / 2000),
+        ]
+        for label, mode, timeout in runs:
+            seconds, metrics = await run(server, users, mode, timeout)
+            print(
+                f"{label:>16} {seconds:8.2f} {len(users) / seconds:8.1f} {metrics['requests']:9,d} "
+                f"{metrics['prompts_per_request']:12.1f} {metrics['timeouts']:9,d}"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--per-prompt-ms', type=float, default=1.0)
+    args = parser.parse_args()
+    asyncio.run(bench(args))
+
+
+if __name__ == '__main__':
+    main()
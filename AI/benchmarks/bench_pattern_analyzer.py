@@ -0,0 +1,140 @@
+"""
+Microbenchmark AdvancedPatternAnalyzer.detect_sleep_patterns and
+detect_heart_rate_anomalies against their previous DataFrame
+implementations, checking that results are identical and that the input
+frames are left unchanged.
+
+Usage (from the AI directory):
+    python benchmarks/bench_pattern_analyzer.py
+    python benchmarks/bench_pattern_analyzer.py --rows 7 30 365 10000 --repeat 200
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from pattern_analyzer import NIGHT_HOURS, AdvancedPatternAnalyzer, day_of_week, hour_of_day
+
+
+def legacy_sleep_patterns(thresholds: dict, sleep_data: pd.DataFrame) -> dict:
+    if sleep_data.empty or len(sleep_data) < 3:
+        return {'patterns': [], 'trends': 'insufficient_data'}
+    patterns = []
+    durations = sleep_data['duration_hours'].values
+    if 'date' in sleep_data.columns:
+        sleep_data['weekday'] = pd.to_datetime(sleep_data['date']).dt.dayofweek
+        weekday_sleep = sleep_data[sleep_data['weekday'] < 5]['duration_hours'].mean()
+        weekend_sleep = sleep_data[sleep_data['weekday'] >= 5]['duration_hours'].mean()
+        if abs(weekend_sleep - weekday_sleep) > 1:
+            patterns.append(f"Weekend sleep differs by {abs(weekend_sleep - weekday_sleep):.1f} hours from weekdays")
+    if len(durations) >= 5:
+        recent_avg = np.mean(durations[-3:])
+        earlier_avg = np.mean(durations[:3])
+        change = (recent_avg - earlier_avg) / earlier_avg
+        if change < -thresholds['trend_significance']:
+            patterns.append(f"Sleep duration declining by {abs(change)*100:.0f}% over the period")
+        elif change > thresholds['trend_significance']:
+            patterns.append(f"Sleep duration improving by {change*100:.0f}% over the period")
+    variance = np.var(durations)
+    if variance > thresholds['sleep_irregularity']:
+        patterns.append("Highly irregular sleep schedule detected")
+    return {'patterns': patterns, 'avg_duration': np.mean(durations), 'consistency_score': max(0, 100 - (variance * 20))}
+
+
+def legacy_heart_rate_anomalies(hr_data: pd.DataFrame) -> dict:
+    if hr_data.empty:
+        return {'anomalies': [], 'risk_level': 'unknown'}
+    anomalies = []
+    hr_values = hr_data['heart_rate'].values
+    q75, q25 = np.percentile(hr_values, [75, 25])
+    upper_bound = q75 + (1.5 * (q75 - q25))
+    outliers = hr_data[hr_data['heart_rate'] > upper_bound]
+    if not outliers.empty:
+        anomalies.append(f"Heart rate spike detected: {outliers['heart_rate'].max()} bpm")
+    if 'timestamp' in hr_data.columns:
+        hr_data['hour'] = pd.to_datetime(hr_data['timestamp']).dt.hour
+        night_hours = hr_data[hr_data['hour'].isin(NIGHT_HOURS)]
+        if not night_hours.empty:
+            night_avg = night_hours['heart_rate'].mean()
+            day_avg = hr_data[~hr_data['hour'].isin(NIGHT_HOURS)]['heart_rate'].mean()
+            if night_avg > day_avg * 1.1:
+                anomalies.append("Elevated nighttime heart rate detected - possible sleep issues")
+    avg_hr = np.mean(hr_values)
+    max_hr = np.max(hr_values)
+    if avg_hr > 100 or max_hr > 150:
+        risk_level = 'high'
+    elif avg_hr > 85 or max_hr > 120:
+        risk_level = 'moderate'
+    else:
+        risk_level = 'low'
+    return {'anomalies': anomalies, 'risk_level': risk_level, 'avg_heart_rate': avg_hr, 'max_heart_rate': max_hr}
+
+
+def make_frames(n_rows: int, seed: int) -> tuple:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2024-01-01', periods=n_rows, freq='D')
+    sleep = pd.DataFrame({'date': dates, 'duration_hours': rng.normal(7, 1.5, n_rows).round(1)})
+    timestamps = pd.date_range('2024-01-01', periods=n_rows, freq='37min')
+    hours = timestamps.hour.to_numpy()
+    night = np.isin(hours, NIGHT_HOURS)
+    rates = rng.normal(72, 9, n_rows) + night * rng.choice([0, 15], n_rows)
+    heart_rate = pd.DataFrame({'timestamp': timestamps, 'heart_rate': rates.round().astype(int)})
+    return sleep, heart_rate
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[7, 30, 365, 10_000])
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seeds', type=int, default=200, help='random frames checked for identical results')
+    args = parser.parse_args()
+
+    analyzer = AdvancedPatternAnalyzer()
+    thresholds = analyzer.pattern_thresholds
+    for seed in range(args.seeds):
+        sleep, heart_rate = make_frames(3 + seed % 40, seed)
+        before = (sleep.copy(), heart_rate.copy())
+        assert analyzer.detect_sleep_patterns(sleep) == legacy_sleep_patterns(thresholds, sleep.copy())
+        assert analyzer.detect_heart_rate_anomalies(heart_rate) == legacy_heart_rate_anomalies(heart_rate.copy())
+        assert sleep.equals(before[0]) and heart_rate.equals(before[1])
+    print(f"identical results on {args.seeds} random frames, inputs unchanged")
+
+    print(f"{'method':>16} {'rows':>7} {'legacy us':>10} {'frame us':>9} {'arrays us':>10} {'speedup':>8}")
+    for n_rows in args.rows:
+        sleep, heart_rate = make_frames(n_rows, 0)
+        weekdays = day_of_week(sleep['date'])
+        hours = hour_of_day(heart_rate['timestamp'])
+        durations = sleep['duration_hours'].to_numpy()
+        rates = heart_rate['heart_rate'].to_numpy()
+        cases = [
+            ('sleep_patterns',
+             lambda: legacy_sleep_patterns(thresholds, sleep.copy()),
+             lambda: analyzer.detect_sleep_patterns(sleep),
+             lambda: analyzer.sleep_patterns_from_arrays(durations, weekdays)),
+            ('heart_rate',
+             lambda: legacy_heart_rate_anomalies(heart_rate.copy()),
+             lambda: analyzer.detect_heart_rate_anomalies(heart_rate),
+             lambda: analyzer.heart_rate_anomalies_from_arrays(rates, hours)),
+        ]
+        for name, legacy, frame, arrays in cases:
+            # The legacy path writes into its input, so it gets a copy; the copy is timed too
+            legacy_us = timed(legacy, args.repeat)
+            frame_us = timed(frame, args.repeat)
+            arrays_us = timed(arrays, args.repeat)
+            print(f"{name:>16} {n_rows:7,d} {legacy_us:10.1f} {frame_us:9.1f} {arrays_us:10.1f} {legacy_us / frame_us:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Profile the statistics work in AIReasoningEngine.analyze_health_data and
+EnhancedAIReasoningEngine.analyze_with_llm: with the SeriesStats shared
+through the AnalysisContext, and with sharing switched off so every
+generator computes its own statistics of the same window, as each did
+before. The statistics the generators used to compute with pandas on the
+same windows are timed for reference.
+
+Usage (from the AI directory):
+    python benchmarks/profile_series_stats.py
+    python benchmarks/profile_series_stats.py --runs 1000 --days 30 --readings 24
+"""
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ai_reasoning_engine import AIReasoningEngine, AnalysisContext
+from llm_insight_generator import EnhancedAIReasoningEngine
+
+STATS_FUNCTIONS = ('__init__', 'percentile', '_interpolate')
+
+
+def make_data(n_days: int, readings_per_day: int) -> dict:
+    rng = np.random.default_rng(0)
+    now = datetime.now()
+    dates = [now - timedelta(days=i) for i in range(n_days, 0, -1)]
+    return {
+        'sleep': pd.DataFrame({'date': dates, 'duration_hours': rng.normal(6.8, 1.2, n_days).round(1)}),
+        'heart_rate': pd.DataFrame({
+            'timestamp': [d + timedelta(hours=h) for d in dates for h in range(0, 24, 24 // readings_per_day)],
+            'heart_rate': rng.normal(78, 12, n_days * readings_per_day).round().astype(int),
+        }),
+        'hydration': pd.DataFrame({'date': dates, 'water_ml': rng.normal(2000, 300, n_days).round()}),
+    }
+
+
+def analyze(engine: AIReasoningEngine, enhanced: EnhancedAIReasoningEngine, health_data: dict, reference_date):
+    engine.analyze_health_data(health_data, reference_date)
+    enhanced.analyze_with_llm(health_data, reference_date)
+
+
+def pandas_statistics(weekly) -> int:
+    """The statistics calls the three generators made on their own before; returns the call count."""
+    sleep, hr = weekly['sleep']['duration_hours'], weekly['heart_rate']['heart_rate']
+    # HealthInsightGenerator
+    sleep.mean(), sleep.var(), hr.quantile(0.5)
+    # AdvancedPatternAnalyzer
+    np.var(sleep.values), np.mean(sleep.values)
+    np.percentile(hr.values, [75, 25]), np.mean(hr.values), np.max(hr.values)
+    # LLMInsightGenerator
+    sleep.mean(), sleep.min(), sleep.max(), sleep.var()
+    hr.mean(), hr.max(), hr.min(), hr.quantile(0.8)
+    return 16
+
+
+def timed(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1e6
+
+
+def profile(fn, runs: int) -> tuple:
+    """Microseconds per run without the profiler, then SeriesStats calls and time under it."""
+    elapsed = timed(fn, runs)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    for _ in range(runs):
+        fn()
+    profiler.disable()
+
+    calls = dict.fromkeys(STATS_FUNCTIONS, 0)
+    seconds = 0.0
+    for (filename, _, name), (_, ncalls, _, cumulative, _) in pstats.Stats(profiler).stats.items():
+        if filename.endswith('series_stats.py') and name in calls:
+            calls[name] += ncalls
+            if name in ('__init__', 'percentile'):
+                seconds += cumulative
+    return elapsed, {name: count / runs for name, count in calls.items()}, seconds / runs * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=500)
+    parser.add_argument('--days', type=int, default=10)
+    parser.add_argument('--readings', type=int, default=3, help='heart rate readings per day')
+    args = parser.parse_args()
+
+    health_data = make_data(args.days, args.readings)
+    reference_date = datetime.now()
+    engine, enhanced = AIReasoningEngine(), EnhancedAIReasoningEngine()
+
+    run = lambda: analyze(engine, enhanced, health_data, reference_date)
+    shared_stats = AnalysisContext.stats
+
+    weekly = engine.contextual_reasoning.analysis_context(health_data, reference_date)
+    pandas_us = timed(lambda: pandas_statistics(weekly), args.runs)
+    print(f"before, pandas: {pandas_statistics(weekly)} statistics calls, {pandas_us:.0f} us per pair of analyses")
+    print()
+    print(f"{'statistics':>14} {'us/run':>7} {'SeriesStats':>12} {'percentiles':>12} {'stats us*':>10}")
+    for label in ('per generator', 'shared'):
+        # Without the context's statistics every generator falls back to its own
+        AnalysisContext.stats = shared_stats if label == 'shared' else (lambda self, data_type, column: None)
+        try:
+            elapsed, calls, stats_us = profile(run, args.runs)
+        finally:
+            AnalysisContext.stats = shared_stats
+        print(f"{label:>14} {elapsed:7.0f} {calls['__init__']:12.0f} {calls['_interpolate']:12.0f} {stats_us:10.0f}")
+    print("* under the profiler, which inflates it")
+
+
+if __name__ == '__main__':
+    main()
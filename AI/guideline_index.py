@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+# Bundled guideline passages, one JSON object per line: {"id", "topic", "text", "source"}
+GUIDELINES_PATH = os.path.join(DATA_DIR, 'guidelines.jsonl')
+
+# Where the built index is kept between runs
+INDEX_DIR = os.environ.get('GUIDELINE_INDEX_DIR', os.path.join(DATA_DIR, 'guideline_index'))
+
+INDEX_FORMAT = 1
+
+STOPWORDS = frozenset(
+    "a about an and are as at be been but by can for from has have how i in is it its may more most "
+    "of on or our so such than that the their them there these they this to was were what when which "
+    "while who will with you your".split()
+)
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased words without stopwords, with a plain plural 's' dropped (spikes -> spike)."""
+    tokens = []
+    for word in TOKEN.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def load_passages(path: str = GUIDELINES_PATH) -> List[Dict[str, str]]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _file_hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class GuidelineIndex:
+    """
+    BM25 index of guideline passages.
+
+    The BM25 weight of every (term, passage) pair is precomputed and kept as
+    term-major postings: `indptr[t]:indptr[t + 1]` delimits the passages of
+    term t in `doc_ids` and their weights in `weights`. A query's scores are
+    one np.bincount over the postings of its terms, and the top k one
+    argpartition. Saved indexes are opened with the arrays memory-mapped, so
+    a process start reads only the pages it touches and rebuilds nothing.
+    """
+
+    def __init__(self, passages: List[Dict[str, str]], vocabulary: Dict[str, int], indptr: np.ndarray,
+                 doc_ids: np.ndarray, weights: np.ndarray, topic_codes: np.ndarray, topics: List[str],
+                 version: str = '', cache_size: int = 1024):
+        self.passages = passages
+        self.vocabulary = vocabulary
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.topic_codes = topic_codes
+        self.topics = topics
+        self.version = version
+        self._top = lru_cache(maxsize=cache_size)(self._top_uncached)
+
+    @classmethod
+    def build(cls, passages: List[Dict[str, str]], k1: float = 1.5, b: float = 0.75, version: str = '') -> 'GuidelineIndex':
+        vocabulary: Dict[str, int] = {}
+        term_ids, passage_ids = [], []
+        lengths = np.zeros(len(passages))
+        for i, passage in enumerate(passages):
+            tokens = tokenize(passage['text'])
+            lengths[i] = len(tokens)
+            for token in tokens:
+                term_ids.append(vocabulary.setdefault(token, len(vocabulary)))
+                passage_ids.append(i)
+
+        # Term frequency of every (term, passage) pair, ordered by term then passage
+        pairs = np.asarray(term_ids, dtype=np.int64) * max(len(passages), 1) + np.asarray(passage_ids, dtype=np.int64)
+        pairs, tf = np.unique(pairs, return_counts=True)
+        terms, doc_ids = np.divmod(pairs, max(len(passages), 1))
+        df = np.bincount(terms, minlength=len(vocabulary))
+        indptr = np.concatenate([[0], np.cumsum(df)]).astype(np.int64)
+
+        n = len(passages)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        avgdl = lengths.mean() if n else 0.0
+        norm = k1 * (1 - b + b * lengths[doc_ids] / avgdl) if n else np.zeros(0)
+        weights = idf[terms] * tf * (k1 + 1) / (tf + norm)
+
+        topics = sorted({passage.get('topic', '') for passage in passages})
+        topic_codes = np.array([topics.index(passage.get('topic', '')) for passage in passages], dtype=np.int16)
+        return cls(passages, vocabulary, indptr, doc_ids.astype(np.int32), weights.astype(np.float32),
+                   topic_codes, topics, version)
+
+    def save(self, directory: str):
+        """
+        Writes the index to a new directory next to `directory` and swaps it
+        into place, so processes that have the old arrays mapped keep
+        reading intact files.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.guideline_index-', dir=parent)
+        try:
+            for name in ('indptr', 'doc_ids', 'weights', 'topic_codes'):
+                np.save(os.path.join(staging, f"{name}.npy"), getattr(self, name))
+            with open(os.path.join(staging, 'passages.json'), 'w', encoding='utf-8') as f:
+                json.dump({'passages': self.passages, 'vocabulary': self.vocabulary, 'topics': self.topics}, f)
+            # An index without it, or with another version, is rebuilt
+            with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump({'format': INDEX_FORMAT, 'version': self.version}, f)
+            os.chmod(staging, 0o755)
+            try:
+                os.replace(staging, directory)
+            except OSError:
+                # A directory replaces only an empty one: move the old index aside first
+                old = tempfile.mkdtemp(prefix='.guideline_index-old-', dir=parent)
+                os.replace(directory, old)
+                os.replace(staging, directory)
+                shutil.rmtree(old, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+    @classmethod
+    def load(cls, directory: str) -> 'GuidelineIndex':
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, 'passages.json'), encoding='utf-8') as f:
+            data = json.load(f)
+        arrays = {
+            # Plain ndarray views of the mapping: slicing np.memmap objects is several times slower
+            name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r'))
+            for name in ('indptr', 'doc_ids', 'weights', 'topic_codes')
+        }
+        return cls(data['passages'], data['vocabulary'], topics=data['topics'], version=meta['version'], **arrays)
+
+    @classmethod
+    def open(cls, passages_path: str = GUIDELINES_PATH, directory: str = INDEX_DIR,
+             k1: float = 1.5, b: float = 0.75) -> 'GuidelineIndex':
+        """The saved index of `passages_path`, built and saved first if missing or out of date."""
+        version = f"{_file_hash(passages_path)[:16]}-k1={k1}-b={b}"
+        try:
+            with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('format') == INDEX_FORMAT and meta.get('version') == version:
+                return cls.load(directory)
+        except (OSError, ValueError):
+            pass
+        index = cls.build(load_passages(passages_path), k1, b, version)
+        try:
+            index.save(directory)
+        except OSError:
+            pass  # read-only install: the index is kept in memory for this process
+        return index
+
+    def __len__(self):
+        return len(self.passages)
+
+    def search(self, query: str, k: int = 3, topic: Optional[str] = None) -> List[Dict]:
+        """The k best passages for `query` (optionally of one topic), each with its BM25 `score`."""
+        terms = tuple(sorted({self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}))
+        return [dict(self.passages[i], score=score) for i, score in self._top(terms, k, topic)]
+
+    def _top_uncached(self, terms: Tuple[int, ...], k: int, topic: Optional[str]) -> Tuple[Tuple[int, float], ...]:
+        if not terms or k <= 0:
+            return ()
+        if len(terms) == 1:
+            start, end = self.indptr[terms[0]], self.indptr[terms[0] + 1]
+            doc_ids, weights = self.doc_ids[start:end], self.weights[start:end]
+        else:
+            doc_ids = np.concatenate([self.doc_ids[self.indptr[t]:self.indptr[t + 1]] for t in terms])
+            weights = np.concatenate([self.weights[self.indptr[t]:self.indptr[t + 1]] for t in terms])
+        scores = np.bincount(doc_ids, weights, minlength=len(self.passages))
+
+        candidates = np.flatnonzero(scores)
+        if topic is not None:
+            if topic not in self.topics:
+                return ()
+            candidates = candidates[self.topic_codes[candidates] == self.topics.index(topic)]
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        # Best first; ties in passage order
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return tuple((int(i), float(scores[i])) for i in candidates)
+
+    def cache_info(self):
+        return self._top.cache_info()
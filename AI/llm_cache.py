@@ -0,0 +1,177 @@
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Bucket (width, rounding) per prompt statistic, used for the cache key
+# only: the prompt and the response are built from the exact statistics.
+# A cached response must read the same for every user in its bucket, so
+# statistics quoted in the response are bucketed at the precision they are
+# shown with, and a statistic that is only compared with a threshold is
+# rounded towards the side that keeps the comparison (down for "< 6.5",
+# up for "> 2"), with every threshold on a bucket edge. Statistics without
+# a bucket are keyed exactly.
+STAT_BUCKETS: Dict[str, Dict[str, Tuple[float, str]]] = {
+    'sleep': {
+        'avg_hours': (0.1, 'down'),      # shown; avg < 6.5 and < 7
+        'min_hours': (0.1, 'nearest'),   # shown
+        'max_hours': (0.1, 'nearest'),   # shown
+        'variance': (0.25, 'up'),        # variance > 2
+    },
+    'heart_rate': {
+        'avg_hr': (0.1, 'up'),           # shown; avg > 80
+    },
+}
+
+ROUNDING = {'down': math.floor, 'up': math.ceil, 'nearest': round}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def quantize_stats(topic: str, stats: Dict[str, Any], buckets: Optional[Dict[str, Dict[str, Tuple[float, str]]]] = None) -> Dict[str, Any]:
+    """Each statistic rounded to a multiple of its bucket width in its bucket's direction; others are kept as they are."""
+    widths = (STAT_BUCKETS if buckets is None else buckets).get(topic, {})
+    quantized = {}
+    for name, value in stats.items():
+        if name not in widths:
+            quantized[name] = value
+            continue
+        width, rounding = widths[name]
+        steps = value / width
+        # Values already on an edge must stay there despite float error (6.4 / 0.1 = 63.99...)
+        if rounding == 'down':
+            steps += 1e-9
+        elif rounding == 'up':
+            steps -= 1e-9
+        quantized[name] = round(ROUNDING[rounding](steps) * width, 6)
+    return quantized
+
+
+def fingerprint(*parts: str) -> str:
+    return hashlib.sha256('\x00'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def cache_key(topic: str, stats: Dict[str, Any], guideline_version: str, template_hash: str) -> str:
+    return f"{topic}:{template_hash}:{guideline_version}:{json.dumps(stats, sort_keys=True)}"
+
+
+class LLMResponseCache:
+    """
+    Bounded cache of model responses with a time-to-live.
+
+    The in-memory tier is an LRU of at most `max_entries` responses. With a
+    `path`, responses are also written to a SQLite file that survives
+    restarts; a memory miss falls through to it and promotes the entry.
+    Expired entries count as misses and are dropped when found.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 24 * 3600, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(('memory_hits', 'disk_hits', 'misses', 'evictions', 'expirations'), 0)
+        self._conn = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._counts['memory_hits'] += 1
+                    return response
+                del self._entries[key]
+                self._counts['expirations'] += 1
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT response, expires_at FROM llm_responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    response, expires_at = row
+                    if expires_at > now:
+                        self._remember(key, response, expires_at)
+                        self._counts['disk_hits'] += 1
+                        return response
+                    with self._conn:
+                        self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                    self._counts['expirations'] += 1
+
+            self._counts['misses'] += 1
+            return None
+
+    def put(self, key: str, response: str):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, response, expires_at)
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO llm_responses (key, response, expires_at) VALUES (?, ?, ?)",
+                        (key, response, expires_at),
+                    )
+
+    def _remember(self, key: str, response: str, expires_at: float):
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counts['evictions'] += 1
+
+    def clear(self):
+        """Drop every response, on disk too; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM llm_responses")
+
+    def purge_expired(self) -> int:
+        """Remove expired responses from both tiers; returns how many were removed."""
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._entries.items() if expires_at <= now]
+            for key in expired:
+                del self._entries[key]
+            removed = len(expired)
+            if self._conn is not None:
+                # Every remembered entry is on disk as well
+                with self._conn:
+                    removed = self._conn.execute("DELETE FROM llm_responses WHERE expires_at <= ?", (now,)).rowcount
+            self._counts['expirations'] += removed
+            return removed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Hit/miss counters and the hit rate since the cache was created."""
+        with self._lock:
+            counts = dict(self._counts)
+        hits = counts['memory_hits'] + counts['disk_hits']
+        lookups = hits + counts['misses']
+        counts.update(
+            hits=hits,
+            lookups=lookups,
+            hit_rate=hits / lookups if lookups else 0.0,
+            size=len(self._entries),
+        )
+        return counts
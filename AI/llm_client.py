@@ -0,0 +1,130 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+try:
+    import httpx
+except ImportError:  # optional dependency, insights fall back to the simulated responses without it
+    httpx = None
+
+
+def client_available() -> bool:
+    return httpx is not None
+
+
+class LLMClientError(RuntimeError):
+    """A completion failed (timeout, transport error, HTTP error status or malformed reply)."""
+
+
+class AsyncLLMClient:
+    """
+    asyncio client of a completion endpoint, over one pooled HTTP session.
+
+    Prompts submitted with `complete` within `batch_wait` seconds of each
+    other (or until `batch_size` are pending) go out as one request:
+
+        POST <base_url>/v1/completions  {"prompts": [...]}  ->  {"completions": [...]}
+
+    so concurrent analyses of many users share requests. At most
+    `max_concurrency` requests are in flight, and each `complete` call gives
+    up after `timeout` seconds with LLMClientError. Use it inside one
+    event loop, as `async with AsyncLLMClient(...) as client`.
+    """
+
+    def __init__(self, base_url: str, max_concurrency: int = 8, timeout: float = 10.0,
+                 batch_size: int = 16, batch_wait: float = 0.005, headers: Optional[Dict[str, str]] = None):
+        if httpx is None:
+            raise RuntimeError("AsyncLLMClient requires httpx (pip install httpx)")
+        self.url = base_url.rstrip('/') + '/v1/completions'
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.headers = headers or {}
+        self.counts = dict.fromkeys(('prompts', 'sent', 'requests', 'timeouts', 'errors'), 0)
+        self._session = None
+        self._semaphore = None
+        self._pending: List[tuple] = []
+        self._flush_timer = None
+        self._requests = set()
+
+    async def __aenter__(self) -> 'AsyncLLMClient':
+        self._open()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _open(self):
+        if self._session is None:
+            limits = httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            # Deadlines are enforced per call in complete(); the session timeout only bounds a stuck connection
+            self._session = httpx.AsyncClient(limits=limits, timeout=max(self.timeout, 1.0) * 2, headers=self.headers)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self):
+        self._flush()
+        if self._requests:
+            await asyncio.gather(*self._requests, return_exceptions=True)
+        if self._session is not None:
+            await self._session.aclose()
+            self._session = None
+
+    async def complete(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """The completion of `prompt`; raises LLMClientError on a timeout or failed request."""
+        self._open()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((prompt, future))
+        self.counts['prompts'] += 1
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._flush_timer is None:
+            self._flush_timer = loop.call_later(self.batch_wait, self._flush)
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.counts['timeouts'] += 1
+            raise LLMClientError(f"No completion within {timeout:g} s") from None
+
+    def _flush(self):
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+            self._flush_timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.get_running_loop().create_task(self._send(batch))
+        self._requests.add(task)
+        task.add_done_callback(self._requests.discard)
+
+    async def _send(self, batch: List[tuple]):
+        async with self._semaphore:
+            # Prompts whose caller timed out while the batch waited are not sent
+            batch = [(prompt, future) for prompt, future in batch if not future.done()]
+            if not batch:
+                return
+            try:
+                self.counts['requests'] += 1
+                self.counts['sent'] += len(batch)
+                response = await self._session.post(self.url, json={'prompts': [prompt for prompt, _ in batch]})
+                response.raise_for_status()
+                completions = response.json()['completions']
+                if len(completions) != len(batch):
+                    raise LLMClientError(f"Expected {len(batch)} completions, got {len(completions)}")
+            except (httpx.HTTPError, KeyError, ValueError, LLMClientError) as e:
+                self.counts['errors'] += 1
+                error = e if isinstance(e, LLMClientError) else LLMClientError(str(e) or type(e).__name__)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+        for (_, future), completion in zip(batch, completions):
+            if not future.done():
+                future.set_result(completion)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Prompts submitted and sent, requests made, timed-out calls and failed requests."""
+        counts = dict(self.counts)
+        counts['prompts_per_request'] = counts['sent'] / counts['requests'] if counts['requests'] else 0.0
+        return counts
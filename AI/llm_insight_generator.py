@@ -1,17 +1,63 @@
+import asyncio
 import json
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Optional, Tuple
 import pandas as pd
 
+from guideline_index import GuidelineIndex
+from llm_cache import LLMResponseCache, cache_key, fingerprint, quantize_stats
+from llm_client import AsyncLLMClient, LLMClientError
+from series_stats import SeriesStats
+
+SLEEP_PROMPT = """System: {system_prompt}
+
+User:
+Here are 7-day sleep statistics for a user: {stats}.
+
+Public health guideline (retrieved via RAG):
+\"\"\"{guideline}\"\"\"
+
+Task:
+- In 1–2 clear sentences, explain the user's sleep pattern in plain language.
+- Reference the guideline only conceptually (do not sound overly clinical).
+- Avoid medical diagnosis; gently suggest speaking to a professional if they are worried."""
+
+HEART_RATE_PROMPT = """System: {system_prompt}
+
+User:
+Here are heart rate statistics for a user: {stats}.
+
+Public health guideline (retrieved via RAG):
+\"\"\"{guideline}\"\"\"
+
+Task:
+- In 1–2 friendly sentences, describe any notable patterns (spikes, elevated average).
+- Relate the pattern to the typical healthy range in simple language.
+- Avoid diagnosis; instead, suggest general healthy habits and note that persistent issues
+  should be discussed with a healthcare professional."""
+
+LIFESTYLE_PROMPT = """Based on these health insights: {insights}
+
+Relevant public health guidelines (retrieved via RAG):
+{guidelines}
+        
+Generate 3-5 specific, actionable lifestyle recommendations that address the identified issues.
+Focus on practical daily habits and behavioral changes.
+
+Response format: List of bullet points."""
+
 
 class PublicHealthGuidelineRetriever:
     """
     Very lightweight RAG-style retriever for public health guidelines.
 
-    In a real deployment this would query a vector store over guideline texts.
-    Here we simulate it with an in-memory knowledge base to demonstrate the pattern.
+    `retrieve_guideline` returns the summary of a topic from a small in-memory
+    knowledge base; `retrieve` searches the BM25 index of the bundled
+    guideline passages (guideline_index.py) by free text, such as the
+    combined insight text. The index is opened on first use.
     """
 
-    def __init__(self) -> None:
+    def __init__(self, index: Optional[GuidelineIndex] = None) -> None:
+        self._index = index
         self.knowledge_base: Dict[str, Dict[str, str]] = {
             'sleep': {
                 'summary': (
@@ -37,14 +83,37 @@ class PublicHealthGuidelineRetriever:
             },
         }
 
+    @property
+    def version(self) -> str:
+        """Changes whenever the knowledge base does, so cached responses built on older guidelines are not reused."""
+        return fingerprint(json.dumps(self.knowledge_base, sort_keys=True))
+
     def retrieve_guideline(self, topic: str) -> Tuple[str, str]:
         """Return a (summary, source_note) tuple for a given health topic."""
         data = self.knowledge_base.get(topic, {})
         return data.get('summary', ''), data.get('source', '')
 
+    @property
+    def index(self) -> GuidelineIndex:
+        if self._index is None:
+            self._index = GuidelineIndex.open()
+        return self._index
+
+    def retrieve(self, query: str, k: int = 3, topic: Optional[str] = None) -> List[Dict]:
+        """The k guideline passages most relevant to `query`, best first, each with its `score`."""
+        return self.index.search(query, k, topic)
+
 
 class LLMInsightGenerator:
-    def __init__(self):
+    """
+    Responses are cached by (topic, statistics rounded to the buckets of
+    llm_cache.STAT_BUCKETS, guideline version, prompt template), so users
+    whose statistics fall in the same buckets share one model call. Prompts
+    and responses are built from the exact statistics. Pass an
+    LLMResponseCache to bound, persist or share the cache.
+    """
+
+    def __init__(self, cache: Optional[LLMResponseCache] = None):
         self.system_prompt = """You are a health data analyst AI. Analyze the provided health metrics and generate:
 1. Clear, human-friendly explanations of patterns
 2. Health warnings when needed
@@ -55,81 +124,110 @@ Important constraints:
 - Encourage users to consult a healthcare professional for serious concerns.
 - Keep responses concise, empathetic, and actionable, using casual, friendly language."""
         self.guideline_retriever = PublicHealthGuidelineRetriever()
+        self.cache = cache if cache is not None else LLMResponseCache()
 
-    def generate_sleep_insight(self, sleep_data: pd.DataFrame) -> str:
+    def generate_sleep_insight(self, sleep_data: pd.DataFrame, series: Optional[SeriesStats] = None) -> str:
         """Generate LLM-powered sleep insights with guideline context (RAG-style)."""
         if sleep_data.empty:
             return "No sleep data available for analysis."
-        
-        stats = {
-            'avg_hours': round(float(sleep_data['duration_hours'].mean()), 1),
-            'min_hours': float(sleep_data['duration_hours'].min()),
-            'max_hours': float(sleep_data['duration_hours'].max()),
-            'variance': round(float(sleep_data['duration_hours'].var()), 2),
-            'days_analyzed': len(sleep_data)
-        }
-        
-        guideline_text, _ = self.guideline_retriever.retrieve_guideline('sleep')
-
-        prompt = f"""System: {self.system_prompt}
-
-User:
-Here are 7-day sleep statistics for a user: {json.dumps(stats)}.
-
-Public health guideline (retrieved via RAG):
-\"\"\"{guideline_text}\"\"\"
-
-Task:
-- In 1–2 clear sentences, explain the user's sleep pattern in plain language.
-- Reference the guideline only conceptually (do not sound overly clinical).
-- Avoid medical diagnosis; gently suggest speaking to a professional if they are worried."""
-        
-        # Simulate LLM response (replace with actual LLM API call)
-        return self._simulate_llm_response(prompt, 'sleep', stats)
+        return self._complete('sleep', SLEEP_PROMPT, self._sleep_stats(sleep_data, series))
     
-    def generate_heart_rate_insight(self, hr_data: pd.DataFrame) -> str:
+    def generate_heart_rate_insight(self, hr_data: pd.DataFrame, series: Optional[SeriesStats] = None) -> str:
         """Generate LLM-powered heart rate insights with guideline context (RAG-style)."""
         if hr_data.empty:
             return "No heart rate data available for analysis."
-        
-        stats = {
-            'avg_hr': round(float(hr_data['heart_rate'].mean()), 1),
-            'max_hr': int(hr_data['heart_rate'].max()),
-            'min_hr': int(hr_data['heart_rate'].min()),
-            'spikes': len(hr_data[hr_data['heart_rate'] > hr_data['heart_rate'].quantile(0.8)]),
+        return self._complete('heart_rate', HEART_RATE_PROMPT, self._heart_rate_stats(hr_data, series))
+
+    async def generate_sleep_insight_async(self, sleep_data: pd.DataFrame, client: Optional[AsyncLLMClient],
+                                           series: Optional[SeriesStats] = None) -> str:
+        """generate_sleep_insight answered by `client`, falling back to the simulated response on a timeout or error."""
+        if sleep_data.empty:
+            return "No sleep data available for analysis."
+        return await self._complete_async('sleep', SLEEP_PROMPT, self._sleep_stats(sleep_data, series), client)
+
+    async def generate_heart_rate_insight_async(self, hr_data: pd.DataFrame, client: Optional[AsyncLLMClient],
+                                                series: Optional[SeriesStats] = None) -> str:
+        """generate_heart_rate_insight answered by `client`, falling back to the simulated response on a timeout or error."""
+        if hr_data.empty:
+            return "No heart rate data available for analysis."
+        return await self._complete_async('heart_rate', HEART_RATE_PROMPT, self._heart_rate_stats(hr_data, series), client)
+
+    def _sleep_stats(self, sleep_data: pd.DataFrame, series: Optional[SeriesStats]) -> Dict:
+        series = series or SeriesStats(sleep_data['duration_hours'].to_numpy())
+        return {
+            'avg_hours': round(float(series.mean), 1),
+            'min_hours': float(series.min),
+            'max_hours': float(series.max),
+            'variance': round(float(series.var), 2),
+            'days_analyzed': len(sleep_data)
+        }
+
+    def _heart_rate_stats(self, hr_data: pd.DataFrame, series: Optional[SeriesStats]) -> Dict:
+        series = series or SeriesStats(hr_data['heart_rate'].to_numpy())
+        return {
+            'avg_hr': round(float(series.mean), 1),
+            'max_hr': int(series.max),
+            'min_hr': int(series.min),
+            'spikes': series.count_above(series.quantile(0.8)),
             'readings': len(hr_data)
         }
-        
-        guideline_text, _ = self.guideline_retriever.retrieve_guideline('heart_rate')
 
-        prompt = f"""System: {self.system_prompt}
+    def _lookup(self, topic: str, template: str, stats: Dict) -> Tuple[str, Optional[str]]:
+        """(cache key, cached response or None) of the prompt for `stats`; the key uses the bucketed stats."""
+        key = cache_key(topic, quantize_stats(topic, stats), self.guideline_retriever.version,
+                        fingerprint(self.system_prompt, template))
+        return key, self.cache.get(key)
 
-User:
-Here are heart rate statistics for a user: {json.dumps(stats)}.
+    def _prompt(self, topic: str, template: str, stats: Dict) -> str:
+        guideline_text, _ = self.guideline_retriever.retrieve_guideline(topic)
+        return template.format(system_prompt=self.system_prompt, stats=json.dumps(stats), guideline=guideline_text)
 
-Public health guideline (retrieved via RAG):
-\"\"\"{guideline_text}\"\"\"
+    def _complete(self, topic: str, template: str, stats: Dict) -> str:
+        """Model response for the prompt of `stats`, from the cache when an equivalent prompt was answered."""
+        key, response = self._lookup(topic, template, stats)
+        if response is None:
+            # Simulate LLM response (replace with actual LLM API call)
+            response = self._simulate_llm_response(self._prompt(topic, template, stats), topic, stats)
+            self.cache.put(key, response)
+        return response
 
-Task:
-- In 1–2 friendly sentences, describe any notable patterns (spikes, elevated average).
-- Relate the pattern to the typical healthy range in simple language.
-- Avoid diagnosis; instead, suggest general healthy habits and note that persistent issues
-  should be discussed with a healthcare professional."""
-        
-        return self._simulate_llm_response(prompt, 'heart_rate', stats)
+    async def _complete_async(self, topic: str, template: str, stats: Dict, client: Optional[AsyncLLMClient]) -> str:
+        if client is None:
+            return self._complete(topic, template, stats)
+        key, response = self._lookup(topic, template, stats)
+        if response is None:
+            prompt = self._prompt(topic, template, stats)
+            try:
+                response = await client.complete(prompt)
+            except LLMClientError:
+                # Not cached, so the model is asked again next time
+                return self._simulate_llm_response(prompt, topic, stats)
+            self.cache.put(key, response)
+        return response
     
     def generate_lifestyle_recommendations(self, all_insights: List[str]) -> List[str]:
         """Generate comprehensive lifestyle recommendations"""
-        prompt = f"""Based on these health insights: {all_insights}
-        
-Generate 3-5 specific, actionable lifestyle recommendations that address the identified issues.
-Focus on practical daily habits and behavioral changes.
-
-Response format: List of bullet points."""
-        
         # Simulate LLM response
         return self._simulate_lifestyle_recommendations(all_insights)
+
+    async def generate_lifestyle_recommendations_async(self, all_insights: List[str],
+                                                       client: Optional[AsyncLLMClient]) -> List[str]:
+        """generate_lifestyle_recommendations answered by `client`, falling back to the simulated ones on a timeout or error."""
+        if client is None:
+            return self.generate_lifestyle_recommendations(all_insights)
+        try:
+            response = await client.complete(self._lifestyle_prompt(all_insights))
+        except LLMClientError:
+            return self._simulate_lifestyle_recommendations(all_insights)
+        lines = [line.strip() for line in response.splitlines()]
+        recommendations = [line.lstrip('-•* ') for line in lines if line[:1] in ('-', '•', '*')]
+        return recommendations[:5] or self._simulate_lifestyle_recommendations(all_insights)
     
+    def _lifestyle_prompt(self, all_insights: List[str]) -> str:
+        passages = self.guideline_retriever.retrieve(' '.join(all_insights), k=3)
+        guidelines = '\n'.join(f"- {passage['text']}" for passage in passages)
+        return LIFESTYLE_PROMPT.format(insights=all_insights, guidelines=guidelines)
+
     def _simulate_llm_response(self, prompt: str, data_type: str, stats: Dict) -> str:
         """Simulate LLM response with intelligent logic"""
         if data_type == 'sleep':
@@ -191,28 +289,30 @@ Response format: List of bullet points."""
         return recommendations[:5]  # Return max 5 recommendations
 
 class EnhancedAIReasoningEngine:
-    def __init__(self):
+    def __init__(self, llm_cache: Optional[LLMResponseCache] = None):
         from ai_reasoning_engine import HealthInsightGenerator, ContextualReasoning
         self.traditional_generator = HealthInsightGenerator()
-        self.llm_generator = LLMInsightGenerator()
+        self.llm_generator = LLMInsightGenerator(llm_cache)
         self.contextual_reasoning = ContextualReasoning()
     
-    def analyze_with_llm(self, health_data: Dict[str, pd.DataFrame]) -> Dict[str, Any]:
-        """Enhanced analysis using LLM-powered insights"""
+    def analyze_with_llm(self, health_data: Dict[str, pd.DataFrame], reference_date=None) -> Dict[str, Any]:
+        """Enhanced analysis using LLM-powered insights, over the week before reference_date (now by default)"""
         insights = []
         
-        # Get weekly context
-        weekly_data = {}
-        for data_type, df in health_data.items():
-            weekly_data[data_type] = self.contextual_reasoning.get_weekly_context(df)
+        # Weekly context; statistics over it are computed once and shared
+        weekly_data = self.contextual_reasoning.analysis_context(health_data, reference_date)
         
         # Generate LLM-powered insights
         if 'sleep' in weekly_data and not weekly_data['sleep'].empty:
-            sleep_insight = self.llm_generator.generate_sleep_insight(weekly_data['sleep'])
+            sleep_insight = self.llm_generator.generate_sleep_insight(
+                weekly_data['sleep'], weekly_data.stats('sleep', 'duration_hours')
+            )
             insights.append(sleep_insight)
         
         if 'heart_rate' in weekly_data and not weekly_data['heart_rate'].empty:
-            hr_insight = self.llm_generator.generate_heart_rate_insight(weekly_data['heart_rate'])
+            hr_insight = self.llm_generator.generate_heart_rate_insight(
+                weekly_data['heart_rate'], weekly_data.stats('heart_rate', 'heart_rate')
+            )
             insights.append(hr_insight)
         
         if 'hydration' in weekly_data and not weekly_data['hydration'].empty:
@@ -228,4 +328,46 @@ class EnhancedAIReasoningEngine:
             'recommendations': recommendations,
             'analysis_type': 'LLM-Enhanced',
             'context_period': "Last 7 days"
-        }
\ No newline at end of file
+        }
+    async def analyze_with_llm_async(self, health_data: Dict[str, pd.DataFrame], client: Optional[AsyncLLMClient],
+                                     reference_date=None) -> Dict[str, Any]:
+        """
+        analyze_with_llm with the prompts answered by `client`: the sleep and
+        heart rate prompts run concurrently, then the lifestyle prompt, which
+        is built from their answers. Prompts that time out or fail get the
+        simulated response.
+        """
+        weekly_data = self.contextual_reasoning.analysis_context(health_data, reference_date)
+
+        pending = []
+        if 'sleep' in weekly_data and not weekly_data['sleep'].empty:
+            pending.append(self.llm_generator.generate_sleep_insight_async(
+                weekly_data['sleep'], client, weekly_data.stats('sleep', 'duration_hours')
+            ))
+        if 'heart_rate' in weekly_data and not weekly_data['heart_rate'].empty:
+            pending.append(self.llm_generator.generate_heart_rate_insight_async(
+                weekly_data['heart_rate'], client, weekly_data.stats('heart_rate', 'heart_rate')
+            ))
+        insights = list(await asyncio.gather(*pending))
+
+        if 'hydration' in weekly_data and not weekly_data['hydration'].empty:
+            hydration_result = self.traditional_generator.analyze_hydration(weekly_data['hydration'])
+            insights.append(hydration_result['message'])
+
+        recommendations = await self.llm_generator.generate_lifestyle_recommendations_async(insights, client)
+
+        return {
+            'insights': insights,
+            'recommendations': recommendations,
+            'analysis_type': 'LLM-Enhanced',
+            'context_period': "Last 7 days"
+        }
+
+    async def analyze_users_with_llm(self, health_data_by_user: Dict[str, Dict[str, pd.DataFrame]],
+                                     client: Optional[AsyncLLMClient], reference_date=None) -> Dict[str, Dict[str, Any]]:
+        """analyze_with_llm_async for every user at once, so the client batches prompts across users."""
+        results = await asyncio.gather(*(
+            self.analyze_with_llm_async(health_data, client, reference_date)
+            for health_data in health_data_by_user.values()
+        ))
+        return dict(zip(health_data_by_user, results))
@@ -0,0 +1,138 @@
+"""
+Local stand-in for the completion endpoint of AsyncLLMClient, for load
+tests: answers POST /v1/completions {"prompts": [...]} after a configurable
+latency, with keep-alive connections and only the standard library.
+
+Usage (from the AI directory):
+    python llm_stub_server.py --port 8765 --latency-ms 300 --per-prompt-ms 5
+"""
+import argparse
+import asyncio
+import json
+import random
+from typing import Optional
+
+
+def stub_completion(prompt: str) -> str:
+    if 'bullet points' in prompt:
+        return (
+            "- Keep a regular sleep and wake time\n"
+            "- Take a short walk after meals\n"
+            "- Drink a glass of water with every meal"
+        )
+    return f"Stub insight for a {len(prompt)}-character prompt."
+
+
+class StubLLMServer:
+    """
+    Each request waits `latency_ms` plus `per_prompt_ms` per prompt, with up
+    to `jitter_ms` of uniform noise, then returns one stub completion per
+    prompt. `requests` and `prompts` count what was served, and
+    `max_in_flight` the most requests answered at once.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency_ms: float = 200.0,
+                 per_prompt_ms: float = 0.0, jitter_ms: float = 0.0, seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.per_prompt_ms = per_prompt_ms
+        self.jitter_ms = jitter_ms
+        self.requests = 0
+        self.prompts = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._random = random.Random(seed)
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> 'StubLLMServer':
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        # Port 0 picks a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def __aenter__(self) -> 'StubLLMServer':
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                if method != 'POST' or path != '/v1/completions':
+                    status, payload = '404 Not Found', {'detail': 'Not found'}
+                else:
+                    prompts = json.loads(body)['prompts']
+                    self.requests += 1
+                    self.prompts += len(prompts)
+                    self.in_flight += 1
+                    self.max_in_flight = max(self.max_in_flight, self.in_flight)
+                    try:
+                        await asyncio.sleep(self._delay(len(prompts)))
+                    finally:
+                        self.in_flight -= 1
+                    status, payload = '200 OK', {'completions': [stub_completion(p) for p in prompts]}
+
+                data = json.dumps(payload).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _delay(self, n_prompts: int) -> float:
+        jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(self.latency_ms + self.per_prompt_ms * n_prompts + jitter, 0.0) / 1000
+
+
+async def serve(server: StubLLMServer):
+    await server.start()
+    print(f"Stub LLM server on {server.url} ({server.latency_ms:g} ms + {server.per_prompt_ms:g} ms/prompt)")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=200.0)
+    parser.add_argument('--per-prompt-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    server = StubLLMServer(args.host, args.port, args.latency_ms, args.per_prompt_ms, args.jitter_ms)
+    try:
+        asyncio.run(serve(server))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,30 +1,127 @@
+import json
+import os
+from functools import lru_cache
+
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+
+from series_stats import SeriesStats
+
+# Thresholds of the insight rules, editable without code changes. Shared by
+# HealthInsightGenerator, AdvancedPatternAnalyzer and the batch engine:
+#   sleep_min_hours           average nightly hours below which sleep is insufficient
+#   sleep_variance            sample variance above which sleep is irregular
+#   sleep_irregularity        population variance above which the schedule is irregular
+#   weekend_sleep_difference  hours between weekend and weekday averages
+#   trend_significance        fractional change, 0.15 = 15%
+#   hr_spike_threshold        multiplier of the median heart rate
+#   hr_outlier_iqr            IQR multiplier above the 75th percentile
+#   night_hr_ratio            night average as a multiple of the day average
+#   hr_high_avg/hr_high_max   average/maximum bpm above which risk is high
+#   hr_moderate_avg/hr_moderate_max   the same for moderate risk
+#   hydration_daily_ml        recommended daily intake
+#   hydration_low_days        days below it that make hydration low
+PATTERN_THRESHOLDS_PATH = os.environ.get(
+    'AI_PATTERN_THRESHOLDS_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'pattern_thresholds.json'),
+)
+PATTERN_THRESHOLD_KEYS = (
+    'sleep_min_hours', 'sleep_variance', 'sleep_irregularity', 'weekend_sleep_difference',
+    'trend_significance', 'hr_spike_threshold', 'hr_outlier_iqr', 'night_hr_ratio',
+    'hr_high_avg', 'hr_high_max', 'hr_moderate_avg', 'hr_moderate_max',
+    'hydration_daily_ml', 'hydration_low_days',
+)
+
+
+@lru_cache(maxsize=None)
+def _load_thresholds(path: str) -> Tuple[Tuple[str, float], ...]:
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    missing = [key for key in PATTERN_THRESHOLD_KEYS if key not in data]
+    if missing:
+        raise ValueError(f"{path} is missing thresholds: {missing}")
+    return tuple((key, float(value)) for key, value in data.items())
+
+
+def load_pattern_thresholds(path: str = PATTERN_THRESHOLDS_PATH) -> Dict[str, float]:
+    """The thresholds in `path`, read once per path."""
+    return dict(_load_thresholds(path))
+
+# 10 PM - 6 AM
+NIGHT_HOURS = [22, 23, 0, 1, 2, 3, 4, 5, 6]
+
+# Indexed by hour of day; the extra last entry is for unknown hours (-1)
+NIGHT_HOUR_MASK = np.zeros(25, dtype=bool)
+NIGHT_HOUR_MASK[NIGHT_HOURS] = True
+
+
+def _as_datetimes(values: pd.Series) -> pd.Series:
+    """Parsed only when the column is not datetime64 already; aware values keep their local time."""
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        values = pd.to_datetime(values)
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        values = values.dt.tz_localize(None)
+    return values
+
+
+def day_of_week(dates: pd.Series) -> np.ndarray:
+    """Monday=0 ... Sunday=6 from the datetime64 values, -1 for missing dates."""
+    days = _as_datetimes(dates).to_numpy().astype('datetime64[D]')
+    # 1970-01-01 was a Thursday
+    weekdays = (days.astype(np.int64) + 3) % 7
+    return np.where(np.isnat(days), -1, weekdays)
+
+
+def hour_of_day(timestamps: pd.Series) -> np.ndarray:
+    """Hour 0-23 from the datetime64 values, -1 for missing timestamps."""
+    hours = _as_datetimes(timestamps).to_numpy().astype('datetime64[h]')
+    return np.where(np.isnat(hours), -1, hours.astype(np.int64) % 24)
+
+
+def _mean_skipna(values: np.ndarray) -> float:
+    """Mean ignoring NaN, like pandas' Series.mean."""
+    values = np.asarray(values, dtype=float)
+    if np.isnan(values).any():
+        values = values[~np.isnan(values)]
+    return values.sum() / len(values) if len(values) else np.nan
+
+
+def _numpy_stat(stats: SeriesStats, value: float) -> float:
+    """`value` as the NumPy statistic (np.var, np.percentile, ...) gives it: NaN when values are missing."""
+    return np.nan if stats.missing else value
 
 class AdvancedPatternAnalyzer:
-    def __init__(self):
-        self.pattern_thresholds = {
-            'sleep_irregularity': 1.5,  # hours variance
-            'hr_spike_threshold': 1.3,  # multiplier of baseline
-            'trend_significance': 0.15  # 15% change
-        }
+    def __init__(self, thresholds: Optional[Dict[str, float]] = None):
+        self.pattern_thresholds = thresholds if thresholds is not None else load_pattern_thresholds()
     
-    def detect_sleep_patterns(self, sleep_data: pd.DataFrame) -> Dict[str, any]:
-        """Advanced sleep pattern detection"""
+    def detect_sleep_patterns(self, sleep_data: pd.DataFrame, stats: Optional[SeriesStats] = None) -> Dict[str, any]:
+        """Advanced sleep pattern detection; `stats` are those of duration_hours when already computed"""
         if sleep_data.empty or len(sleep_data) < 3:
             return {'patterns': [], 'trends': 'insufficient_data'}
         
+        weekdays = day_of_week(sleep_data['date']) if 'date' in sleep_data.columns else None
+        return self.sleep_patterns_from_arrays(sleep_data['duration_hours'].to_numpy(), weekdays, stats)
+    
+    def sleep_patterns_from_arrays(self, durations: np.ndarray, weekdays: Optional[np.ndarray] = None,
+                                   stats: Optional[SeriesStats] = None) -> Dict[str, any]:
+        """
+        detect_sleep_patterns on arrays: nightly durations and, optionally,
+        their day of week (Monday=0). The inputs are only read.
+        """
+        if len(durations) < 3:
+            return {'patterns': [], 'trends': 'insufficient_data'}
+        
         patterns = []
-        durations = sleep_data['duration_hours'].values
+        durations = np.asarray(durations, dtype=float)
         
         # Detect weekend vs weekday patterns
-        if 'date' in sleep_data.columns:
-            sleep_data['weekday'] = pd.to_datetime(sleep_data['date']).dt.dayofweek
-            weekday_sleep = sleep_data[sleep_data['weekday'] < 5]['duration_hours'].mean()
-            weekend_sleep = sleep_data[sleep_data['weekday'] >= 5]['duration_hours'].mean()
+        if weekdays is not None:
+            weekend = weekdays >= 5
+            weekday_sleep = _mean_skipna(durations[(weekdays >= 0) & ~weekend])
+            weekend_sleep = _mean_skipna(durations[weekend])
             
-            if abs(weekend_sleep - weekday_sleep) > 1:
+            if abs(weekend_sleep - weekday_sleep) > self.pattern_thresholds['weekend_sleep_difference']:
                 patterns.append(f"Weekend sleep differs by {abs(weekend_sleep - weekday_sleep):.1f} hours from weekdays")
         
         # Detect declining trend
@@ -39,54 +136,66 @@ class AdvancedPatternAnalyzer:
                 patterns.append(f"Sleep duration improving by {change*100:.0f}% over the period")
         
         # Detect consistency issues
-        variance = np.var(durations)
+        stats = stats or SeriesStats(durations)
+        variance = _numpy_stat(stats, stats.var_population)
         if variance > self.pattern_thresholds['sleep_irregularity']:
             patterns.append("Highly irregular sleep schedule detected")
         
         return {
             'patterns': patterns,
-            'avg_duration': np.mean(durations),
+            'avg_duration': _numpy_stat(stats, stats.mean),
             'consistency_score': max(0, 100 - (variance * 20))  # 0-100 scale
         }
     
-    def detect_heart_rate_anomalies(self, hr_data: pd.DataFrame) -> Dict[str, any]:
-        """Advanced heart rate anomaly detection"""
+    def detect_heart_rate_anomalies(self, hr_data: pd.DataFrame, stats: Optional[SeriesStats] = None) -> Dict[str, any]:
+        """Advanced heart rate anomaly detection; `stats` are those of heart_rate when already computed"""
         if hr_data.empty:
             return {'anomalies': [], 'risk_level': 'unknown'}
         
+        hours = hour_of_day(hr_data['timestamp']) if 'timestamp' in hr_data.columns else None
+        return self.heart_rate_anomalies_from_arrays(hr_data['heart_rate'].to_numpy(), hours, stats)
+    
+    def heart_rate_anomalies_from_arrays(self, hr_values: np.ndarray, hours: Optional[np.ndarray] = None,
+                                         stats: Optional[SeriesStats] = None) -> Dict[str, any]:
+        """
+        detect_heart_rate_anomalies on arrays: readings and, optionally,
+        their hour of day (-1 when unknown). The inputs are only read.
+        """
+        if len(hr_values) == 0:
+            return {'anomalies': [], 'risk_level': 'unknown'}
+        
         anomalies = []
-        hr_values = hr_data['heart_rate'].values
+        stats = stats or SeriesStats(hr_values)
         
         # Statistical anomaly detection
-        q75, q25 = np.percentile(hr_values, [75, 25])
+        q75, q25 = _numpy_stat(stats, stats.percentile(75)), _numpy_stat(stats, stats.percentile(25))
         iqr = q75 - q25
-        upper_bound = q75 + (1.5 * iqr)
+        upper_bound = q75 + (self.pattern_thresholds['hr_outlier_iqr'] * iqr)
         
-        outliers = hr_data[hr_data['heart_rate'] > upper_bound]
-        if not outliers.empty:
-            max_spike = outliers['heart_rate'].max()
+        outliers = hr_values[hr_values > upper_bound]
+        if len(outliers):
+            max_spike = outliers.max()
             anomalies.append(f"Heart rate spike detected: {max_spike} bpm")
         
         # Time-based pattern detection
-        if 'timestamp' in hr_data.columns:
-            hr_data['hour'] = pd.to_datetime(hr_data['timestamp']).dt.hour
-            
+        if hours is not None:
             # Check for unusual nighttime spikes (10 PM - 6 AM)
-            night_hours = hr_data[hr_data['hour'].isin([22, 23, 0, 1, 2, 3, 4, 5, 6])]
-            if not night_hours.empty:
-                night_avg = night_hours['heart_rate'].mean()
-                day_avg = hr_data[~hr_data['hour'].isin([22, 23, 0, 1, 2, 3, 4, 5, 6])]['heart_rate'].mean()
+            night = NIGHT_HOUR_MASK[hours]
+            if night.any():
+                night_avg = _mean_skipna(hr_values[night])
+                day_avg = _mean_skipna(hr_values[~night])
                 
-                if night_avg > day_avg * 1.1:
+                if night_avg > day_avg * self.pattern_thresholds['night_hr_ratio']:
                     anomalies.append("Elevated nighttime heart rate detected - possible sleep issues")
         
         # Risk assessment
-        avg_hr = np.mean(hr_values)
-        max_hr = np.max(hr_values)
+        avg_hr = _numpy_stat(stats, stats.mean)
+        max_hr = _numpy_stat(stats, stats.max)
         
-        if avg_hr > 100 or max_hr > 150:
+        thresholds = self.pattern_thresholds
+        if avg_hr > thresholds['hr_high_avg'] or max_hr > thresholds['hr_high_max']:
             risk_level = 'high'
-        elif avg_hr > 85 or max_hr > 120:
+        elif avg_hr > thresholds['hr_moderate_avg'] or max_hr > thresholds['hr_moderate_max']:
             risk_level = 'moderate'
         else:
             risk_level = 'low'
@@ -112,7 +221,7 @@ class AdvancedPatternAnalyzer:
                 avg_sleep = sleep_df['duration_hours'].mean()
                 avg_hr = hr_df['heart_rate'].mean()
                 
-                if avg_sleep < 7 and avg_hr > 80:
+                if avg_sleep < self.pattern_thresholds['sleep_min_hours'] and avg_hr > 80:
                     correlations.append("Poor sleep may be contributing to elevated heart rate")
         
         return correlations
\ No newline at end of file
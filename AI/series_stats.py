@@ -0,0 +1,73 @@
+import numpy as np
+from typing import Dict
+
+
+class SeriesStats:
+    """
+    Statistics of one series (a column of one window), computed together
+    once and shared by every insight generator: count, mean, sample and
+    population variance, min, max and percentiles.
+
+    Missing values are dropped first, as the pandas statistics do, and
+    counted in `missing`. The mean and variance use the same two-pass
+    formulas as pandas and NumPy, and percentiles come from one sort, so
+    values match Series.mean/var/quantile exactly, and np.mean/var/percentile
+    when nothing is missing (NumPy returns NaN otherwise).
+    """
+
+    def __init__(self, values):
+        values = np.asarray(values)
+        self.missing = 0
+        if values.dtype.kind == 'f':
+            missing = np.isnan(values)
+            self.missing = int(missing.sum())
+            if self.missing:
+                values = values[~missing]
+        # In window order and in the column's dtype, for order-based checks and formatting
+        self.values = values
+        self.count = len(values)
+        self._percentiles: Dict[float, float] = {}
+
+        if self.count == 0:
+            self.mean = self.var = self.var_population = np.nan
+            self.min = self.max = np.nan
+            self._sorted = values.astype(float)
+            return
+
+        x = values.astype(float, copy=False)
+        self.mean = x.sum() / self.count
+        deviations = x - self.mean
+        sum_squares = (deviations * deviations).sum()
+        self.var_population = sum_squares / self.count
+        self.var = sum_squares / (self.count - 1) if self.count > 1 else np.nan
+        self._sorted = np.sort(x)
+        self.min = values.dtype.type(self._sorted[0])
+        self.max = values.dtype.type(self._sorted[-1])
+
+    def percentile(self, p: float) -> float:
+        """np.percentile(values, p) read off the sorted values, memoized per p."""
+        if p not in self._percentiles:
+            self._percentiles[p] = self._interpolate(p / 100) if self.count else np.nan
+        return self._percentiles[p]
+
+    def _interpolate(self, q: float) -> float:
+        # NumPy's 'linear' method, including its rounding: index (n - 1) * q,
+        # lerp from whichever neighbour is closer
+        index = (self.count - 1) * q
+        below = int(np.floor(index))
+        t = index - below
+        a = self._sorted[below]
+        b = self._sorted[min(below + 1, self.count - 1)]
+        diff = b - a
+        return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+    def quantile(self, q: float) -> float:
+        """Series.quantile(q)"""
+        return self.percentile(q * 100)
+
+    @property
+    def median(self) -> float:
+        return self.quantile(0.5)
+
+    def count_above(self, threshold: float) -> int:
+        return int((self.values > threshold).sum())
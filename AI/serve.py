@@ -0,0 +1,66 @@
+"""
+Production server for the Flask API in api_integration.py, instead of
+app.run()'s development server. Uses gunicorn (threaded workers) when it
+is installed, otherwise waitress.
+
+Usage (from the AI directory):
+    python serve.py --port 5000 --workers 2 --threads 8
+
+or directly with gunicorn:
+    gunicorn --workers 2 --threads 8 --bind 0.0.0.0:5000 api_integration:app
+
+Each worker process has its own /analyze/batch pool of AI_BATCH_WORKERS
+workers (see api_integration.py).
+"""
+import argparse
+import os
+
+try:
+    from gunicorn.app.base import BaseApplication
+except ImportError:  # optional dependency, waitress is used without it
+    BaseApplication = None
+
+try:
+    import waitress
+except ImportError:  # optional dependency
+    waitress = None
+
+
+def serve_gunicorn(app, host: str, port: int, workers: int, threads: int, timeout: int):
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{host}:{port}")
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            # Batch responses stream for as long as the analysis runs
+            self.cfg.set('timeout', timeout)
+
+        def load(self):
+            return app
+
+    Application().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.environ.get('AI_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('AI_PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('AI_SERVER_WORKERS', 2)),
+                        help="gunicorn worker processes (waitress runs one process)")
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('AI_SERVER_THREADS', 8)))
+    parser.add_argument('--timeout', type=int, default=300)
+    args = parser.parse_args()
+
+    from api_integration import app
+
+    if BaseApplication is not None:
+        serve_gunicorn(app, args.host, args.port, args.workers, args.threads, args.timeout)
+    elif waitress is not None:
+        waitress.serve(app, host=args.host, port=args.port, threads=args.threads, channel_timeout=args.timeout)
+    else:
+        raise SystemExit("serve.py needs gunicorn or waitress: pip install gunicorn (or waitress)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+import json
+
+import pandas as pd
+import pytest
+
+REFERENCE_DATE = '2024-03-15'
+
+
+def make_payloads(n_users):
+    days = pd.date_range('2024-03-01', periods=14).strftime('%Y-%m-%d')
+    payloads = []
+    for i in range(n_users):
+        payloads.append({
+            'user_id': f"u{i}",
+            'sleep': [{'date': d, 'duration_hours': 6 + (i + j) % 3} for j, d in enumerate(days)],
+            'heart_rate': [{'timestamp': f"{d}T08:00:00", 'heart_rate': 70 + 10 * ((i + j) % 4)} for j, d in enumerate(days)],
+        })
+    # A user with sleep data only
+    payloads[-1].pop('heart_rate')
+    return payloads
+
+
+def columnar(payloads):
+    body = {}
+    for data_type in ('sleep', 'heart_rate'):
+        rows = [dict(row, user_id=p['user_id']) for p in payloads for row in p.get(data_type, [])]
+        body[data_type] = {column: [row[column] for row in rows] for column in rows[0]}
+    return body
+
+
+def post(client, body, content_type, **params):
+    response = client.post('/analyze/batch', data=body, content_type=content_type,
+                           query_string=dict(params, reference_date=REFERENCE_DATE))
+    lines = [json.loads(line) for line in response.get_data().splitlines()]
+    for line in lines:
+        line['data'].pop('analysis_date')
+    return response.status_code, lines
+
+
+@pytest.fixture
+def client(monkeypatch):
+    import api_integration
+
+    # Two users per worker task, so five users give three chunks
+    monkeypatch.setattr(api_integration, 'BATCH_CHUNK_USERS', 2)
+    return api_integration.app.test_client()
+
+
+def test_both_formats_stream_one_line_per_user(client):
+    payloads = make_payloads(5)
+    ndjson = '\n'.join(json.dumps(p) for p in payloads)
+    status, by_line = post(client, ndjson, 'application/x-ndjson')
+    assert status == 200
+    assert sorted(line['user_id'] for line in by_line) == [p['user_id'] for p in payloads]
+    assert all(line['status'] == 'success' for line in by_line)
+
+    status, by_column = post(client, json.dumps(columnar(payloads)), 'application/json')
+    assert status == 200
+    assert {line['user_id']: line['data'] for line in by_column} == {line['user_id']: line['data'] for line in by_line}
+    # ?format= overrides the Content-Type
+    status, overridden = post(client, ndjson, 'text/plain', format='ndjson')
+    assert status == 200
+    assert sorted(overridden, key=lambda line: line['user_id']) == sorted(by_line, key=lambda line: line['user_id'])
+
+
+def test_split_users_keeps_rows_of_each_chunk_in_order():
+    from api_integration import frames_from_ndjson, split_users
+
+    user_ids, health_data = frames_from_ndjson('\n'.join(json.dumps(p) for p in make_payloads(5)).encode())
+    chunks = split_users(user_ids, health_data, 2)
+    assert [ids for ids, _ in chunks] == [['u0', 'u1'], ['u2', 'u3'], ['u4']]
+    for ids, frames in chunks:
+        assert list(pd.unique(frames['sleep']['user_id'])) == ids
+    # u4 has no heart rate rows
+    assert 'heart_rate' not in chunks[2][1]
+    sleep = pd.concat([frames['sleep'] for _, frames in chunks])
+    assert sleep.equals(health_data['sleep'])
+
+
+@pytest.mark.parametrize('body, content_type, message', [
+    ('{"user_id": "a", "sleep": 5}', 'application/x-ndjson', "'sleep' must be a list of objects"),
+    ('{"user_id": "a", "sleep": [1, 2]}', 'application/x-ndjson', "'sleep' must be a list of objects"),
+    ('{"user_id": ["a"], "sleep": []}', 'application/x-ndjson', "user_id must be a string or number"),
+    ('{"sleep": []}', 'application/x-ndjson', "Line 1 has no user_id"),
+    ('{"user_id": "a"}\nnot json', 'application/x-ndjson', "Line 2 is not valid JSON"),
+    ('[1, 2]', 'application/json', "Expected an object of columns"),
+    ('{"sleep": {"date": ["2024-03-01"]}}', 'application/json', "needs a user_id column"),
+    ('{"sleep": {"user_id": [{"a": 1}], "date": ["2024-03-01"]}}', 'application/json', "user_id must be a list"),
+    ('{"sleep": {"user_id": ["a", "b"], "date": ["2024-03-01"]}}', 'application/json', "same length"),
+])
+def test_malformed_bodies_are_rejected_with_400(client, body, content_type, message):
+    response = client.post('/analyze/batch', data=body, content_type=content_type)
+    assert response.status_code == 400
+    assert message in response.get_json()['message']
@@ -0,0 +1,134 @@
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+REFERENCE_DATE = datetime(2024, 3, 11, 12)
+
+
+def make_population():
+    rng = np.random.default_rng(7)
+    users = [f"u{i}" for i in range(6)]
+    dates = pd.date_range('2024-03-01', periods=10)
+    timestamps = (dates.values[:, None] + np.array([9, 15, 23], dtype='timedelta64[h]')).ravel()
+
+    sleep = pd.DataFrame({
+        'user_id': np.repeat(users, len(dates)),
+        'date': np.tile(dates, len(users)),
+        'duration_hours': rng.normal(7, 1.5, len(users) * len(dates)).round(1),
+    })
+    heart_rate = pd.DataFrame({
+        'user_id': np.repeat(users, len(timestamps)),
+        'timestamp': np.tile(timestamps, len(users)),
+        'heart_rate': rng.normal(75, 10, len(users) * len(timestamps)).round(),
+    })
+    hydration = pd.DataFrame({
+        'user_id': np.repeat(users, len(dates)),
+        'date': np.tile(dates, len(users)),
+        'water_ml': rng.normal(2000, 400, len(users) * len(dates)).round(),
+    })
+
+    # u1 misses nights, u2 misses readings and has a night spike, u5's water is all missing
+    sleep.loc[(sleep['user_id'] == 'u1') & sleep['date'].isin(dates[[5, 8]]), 'duration_hours'] = np.nan
+    hr_u2 = heart_rate.index[heart_rate['user_id'] == 'u2']
+    heart_rate.loc[hr_u2[[20, 25]], 'heart_rate'] = np.nan
+    heart_rate.loc[hr_u2[23], 'heart_rate'] = 160
+    heart_rate.loc[heart_rate.index[heart_rate['user_id'] == 'u0'][26], 'heart_rate'] = 150
+    hydration.loc[hydration['user_id'] == 'u5', 'water_ml'] = np.nan
+    return {
+        # u4 has only two nights in the window, u3 no sleep data at all
+        'sleep': sleep[(sleep['user_id'] != 'u3') & ~((sleep['user_id'] == 'u4') & (sleep['date'] < dates[8]))],
+        'heart_rate': heart_rate[heart_rate['user_id'] != 'u3'],
+        'hydration': hydration[hydration['user_id'] != 'u4'],
+    }
+
+
+def same_value(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return (math.isnan(a) and math.isnan(b)) or math.isclose(a, b, rel_tol=1e-9)
+    return a == b
+
+
+def test_batch_matches_single_user_analysis_with_missing_values():
+    from ai_reasoning_engine import AIReasoningEngine
+    from batch_engine import BatchReasoningEngine
+
+    population = make_population()
+    batch = BatchReasoningEngine().analyze_by_user(population, REFERENCE_DATE)
+    assert sorted(batch) == [f"u{i}" for i in range(6)]
+
+    engine = AIReasoningEngine()
+    for user_id, result in batch.items():
+        # A data type without rows for the user is an empty frame, as in the batch
+        frames = {
+            data_type: df[df['user_id'] == user_id].reset_index(drop=True)
+            for data_type, df in population.items()
+        }
+        single = engine.analyze_health_data(frames, REFERENCE_DATE)
+        assert sorted(single['recommendations']) == sorted(result['recommendations'])
+        assert [i['id'] for i in single['insights']] == [i['id'] for i in result['insights']], user_id
+        for a, b in zip(single['insights'], result['insights']):
+            assert {k: v for k, v in a.items() if k != 'metadata'} == {k: v for k, v in b.items() if k != 'metadata'}
+            assert a['metadata'].keys() == b['metadata'].keys()
+            assert all(same_value(value, b['metadata'][key]) for key, value in a['metadata'].items()), (user_id, a, b)
+
+    ids = {user_id: [i['id'] for i in result['insights']] for user_id, result in batch.items()}
+    assert ids['u3'][:2] == ['sleep:no_data', 'heart_rate:no_data']
+    assert 'hydration:no_data' in ids['u4']
+    assert 'heart_rate:advanced_anomalies' in ids['u2']
+
+
+def test_user_groups_skip_missing_values_like_pandas():
+    from batch_engine import UserGroups
+
+    frame = pd.DataFrame({
+        'user': [0, 1, 0, 1, 0, 2, 1],
+        'value': [1.0, np.nan, 4.0, 3.0, np.nan, np.nan, 5.0],
+    })
+    groups = UserGroups(frame['user'].to_numpy(), 4)
+    values = frame['value'].to_numpy()
+    grouped = frame.groupby('user')['value']
+    expected = {
+        'mean': grouped.mean().reindex(range(4)).to_numpy(),
+        'var': grouped.var().reindex(range(4)).to_numpy(),
+        'max': grouped.max().reindex(range(4)).to_numpy(),
+        'median': grouped.median().reindex(range(4)).to_numpy(),
+    }
+    stats = groups.series_stats(values)
+    np.testing.assert_allclose(groups.mean(values), expected['mean'])
+    np.testing.assert_allclose([user_stats.var for user_stats in stats], expected['var'])
+    np.testing.assert_allclose(groups.max(values), expected['max'])
+    np.testing.assert_allclose([user_stats.median for user_stats in stats], expected['median'])
+    assert [user_stats.missing for user_stats in stats] == [1, 1, 1, 0]
+    # Each user's values in frame order
+    assert list(stats[1].values) == [3.0, 5.0]
+    # Head and tail means follow np.mean, so a missing value makes them NaN
+    assert np.isnan(groups.tail_mean(values, 2)[0]) and groups.head_mean(values, 2)[0] == 2.5
+
+
+def test_tuned_thresholds_apply_to_batch_and_single_user_alike():
+    from ai_reasoning_engine import AIReasoningEngine
+    from batch_engine import BatchReasoningEngine
+    from pattern_analyzer import load_pattern_thresholds
+
+    thresholds = dict(load_pattern_thresholds())
+    thresholds.update(sleep_min_hours=5, sleep_variance=0.5, hr_spike_threshold=1.1,
+                      hr_moderate_avg=60, hydration_daily_ml=1500, hydration_low_days=2)
+    engine = AIReasoningEngine(thresholds)
+    population = make_population()
+
+    batch = BatchReasoningEngine(engine).analyze_by_user(population, REFERENCE_DATE)
+    default = BatchReasoningEngine().analyze_by_user(population, REFERENCE_DATE)
+    for user_id, result in batch.items():
+        frames = {
+            data_type: df[df['user_id'] == user_id].reset_index(drop=True)
+            for data_type, df in population.items()
+        }
+        single = engine.analyze_health_data(frames, REFERENCE_DATE)
+        assert [(i['id'], i['message']) for i in single['insights']] == \
+            [(i['id'], i['message']) for i in result['insights']], user_id
+    assert any(
+        [i['id'] for i in batch[user_id]['insights']] != [i['id'] for i in default[user_id]['insights']]
+        for user_id in batch
+    )
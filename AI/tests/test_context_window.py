@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+REFERENCE_DATE = datetime(2024, 3, 11, 12)
+
+
+def legacy_weekly_context(data, date_col='date', days=7):
+    start_date = REFERENCE_DATE - timedelta(days=days)
+    data_copy = data.copy()
+    data_copy[date_col] = pd.to_datetime(data_copy[date_col])
+    return data_copy[data_copy[date_col] >= start_date]
+
+
+def test_weekly_context_keeps_input_order():
+    from ai_reasoning_engine import ContextualReasoning
+
+    data = pd.DataFrame({
+        'date': ['2024-03-09', '2024-03-01', '2024-03-05', None, '2024-03-10', '2024-03-04', '2024-03-09'],
+        'duration_hours': [6.5, 7.0, 8.0, 5.0, 7.5, 6.0, 9.0],
+    })
+    window = ContextualReasoning().get_weekly_context(data, reference_date=REFERENCE_DATE)
+    pd.testing.assert_frame_equal(window, legacy_weekly_context(data))
+    assert list(window.index) == [0, 2, 4, 6]
+
+
+def test_weekly_context_follows_changes_of_the_frame():
+    from ai_reasoning_engine import ContextualReasoning
+
+    context = ContextualReasoning()
+    data = pd.DataFrame({'date': pd.date_range('2024-03-01', periods=10), 'steps': range(10)})
+    window = context.get_weekly_context(data, reference_date=REFERENCE_DATE)
+    assert list(window['steps']) == list(range(4, 10))
+
+    # Windows are cut from a copy, so edits of the caller's frame leave them alone
+    data.loc[9, 'steps'] = 100
+    assert window['steps'].iloc[-1] == 9
+
+    # A frame that grew in place is wrapped again
+    data.loc[10] = [pd.Timestamp('2024-03-11'), 11]
+    assert list(context.get_weekly_context(data, reference_date=REFERENCE_DATE)['steps']) == [4, 5, 6, 7, 8, 100, 11]
+
+
+def test_engine_shared_across_threads_matches_serial_analysis():
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+    from ai_reasoning_engine import AIReasoningEngine
+
+    rng = np.random.default_rng(3)
+    dates = pd.date_range('2024-03-01', periods=10)
+    users = [
+        {
+            'sleep': pd.DataFrame({'date': dates, 'duration_hours': rng.normal(7, 1.5, len(dates)).round(1)}),
+            'hydration': pd.DataFrame({'date': dates, 'water_ml': rng.normal(2000, 400, len(dates)).round()}),
+        }
+        for _ in range(40)
+    ]
+    engine = AIReasoningEngine()
+
+    def insights(health_data):
+        return engine.analyze_health_data(health_data, REFERENCE_DATE)['insights']
+
+    expected = [insights(health_data) for health_data in users]
+    # Fresh frames, so the threads fill the shared window cache concurrently
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        concurrent = list(pool.map(insights, [
+            {data_type: df.copy() for data_type, df in health_data.items()} for health_data in users * 5
+        ]))
+    assert concurrent == expected * 5
@@ -0,0 +1,25 @@
+import json
+import os
+
+import numpy as np
+
+
+def test_save_swaps_in_a_new_index_under_open_mappings(tmp_path):
+    from guideline_index import GuidelineIndex, load_passages
+
+    passages = load_passages()
+    corpus = tmp_path / 'guidelines.jsonl'
+    corpus.write_text(''.join(json.dumps(p) + '\n' for p in passages[:10]))
+    directory = str(tmp_path / 'index')
+
+    old = GuidelineIndex.open(str(corpus), directory)
+    reopened = GuidelineIndex.open(str(corpus), directory)
+    weights = np.array(reopened.weights)
+
+    # A changed corpus is rebuilt and saved over the mapped index
+    corpus.write_text(''.join(json.dumps(p) + '\n' for p in passages))
+    new = GuidelineIndex.open(str(corpus), directory)
+    assert len(new) == len(passages) and new.version != old.version
+    assert np.array_equal(reopened.weights, weights)
+    assert GuidelineIndex.load(directory).version == new.version
+    assert sorted(os.listdir(tmp_path)) == ['guidelines.jsonl', 'index']
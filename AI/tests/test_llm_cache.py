@@ -0,0 +1,90 @@
+import pandas as pd
+
+
+def test_quantize_stats_keeps_thresholds_and_exact_counts():
+    from llm_cache import quantize_stats
+
+    sleep = quantize_stats('sleep', {'avg_hours': 6.4, 'min_hours': 5.8, 'max_hours': 7.2, 'variance': 2.01, 'days_analyzed': 7})
+    assert sleep == {'avg_hours': 6.4, 'min_hours': 5.8, 'max_hours': 7.2, 'variance': 2.25, 'days_analyzed': 7}
+    # Thresholds sit on bucket edges and values on them stay there
+    assert quantize_stats('sleep', {'variance': 2.0})['variance'] == 2.0
+    assert quantize_stats('sleep', {'avg_hours': 6.5})['avg_hours'] == 6.5
+
+    hr = quantize_stats('heart_rate', {'avg_hr': 80.0, 'max_hr': 122, 'min_hr': 58, 'spikes': 3, 'readings': 7})
+    assert hr == {'avg_hr': 80.0, 'max_hr': 122, 'min_hr': 58, 'spikes': 3, 'readings': 7}
+    assert quantize_stats('unknown', {'x': 1.234}) == {'x': 1.234}
+
+
+def test_ttl_expiry_lru_eviction_and_metrics(monkeypatch):
+    import llm_cache
+    from llm_cache import LLMResponseCache
+
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now[0])
+    cache = LLMResponseCache(max_entries=2, ttl_seconds=10)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'  # 'a' is now the most recent
+    cache.put('c', 'C')           # evicts 'b'
+    assert cache.get('b') is None and cache.get('c') == 'C' and len(cache) == 2
+
+    now[0] += 11
+    assert cache.get('a') is None
+    metrics = cache.metrics()
+    assert metrics['memory_hits'] == 2 and metrics['misses'] == 2
+    assert metrics['evictions'] == 1 and metrics['expirations'] == 1
+    assert metrics['lookups'] == 4 and metrics['hit_rate'] == 0.5
+
+
+def test_disk_tier_survives_restart_and_promotes(tmp_path):
+    from llm_cache import LLMResponseCache
+
+    path = str(tmp_path / 'llm.db')
+    LLMResponseCache(path=path).put('k', 'response')
+
+    reopened = LLMResponseCache(path=path)
+    assert len(reopened) == 0
+    assert reopened.get('k') == 'response'
+    assert len(reopened) == 1 and reopened.get('k') == 'response'
+    metrics = reopened.metrics()
+    assert metrics['disk_hits'] == 1 and metrics['memory_hits'] == 1
+
+
+def _sleep(hours):
+    return pd.DataFrame({'duration_hours': hours})
+
+
+def _heart_rate(values):
+    return pd.DataFrame({'heart_rate': values})
+
+
+def test_responses_use_exact_statistics_across_thresholds():
+    from llm_insight_generator import LLMInsightGenerator
+
+    generator = LLMInsightGenerator()
+    assert generator.generate_sleep_insight(_sleep([6.4] * 7)).startswith("You're averaging only 6.4 hours")
+    assert generator.generate_sleep_insight(_sleep([6.5] * 7)).startswith("Your sleep duration of 6.5 hours")
+    assert "varies widely" in generator.generate_sleep_insight(_sleep([5.0, 9.0, 5.0, 9.0, 7.5, 7.5, 7.5]))
+
+    spikes = generator.generate_heart_rate_insight(_heart_rate([70] * 16 + [121, 122, 121, 122]))
+    assert spikes.startswith("Heart rate spiked to 122 bpm with 4 elevated readings")
+    assert "80.1 bpm is elevated" in generator.generate_heart_rate_insight(_heart_rate([80.1] * 5))
+    assert "normal with average of 80.0" in generator.generate_heart_rate_insight(_heart_rate([80.0] * 5))
+
+
+def test_cached_response_is_shared_only_within_a_bucket():
+    from llm_insight_generator import LLMInsightGenerator
+
+    generator = LLMInsightGenerator()
+    calls = []
+    simulate = generator._simulate_llm_response
+    generator._simulate_llm_response = lambda prompt, topic, stats: calls.append(prompt) or simulate(prompt, topic, stats)
+
+    week = [70, 72, 68, 74, 71, 69, 73]
+    first = generator.generate_heart_rate_insight(_heart_rate(week))
+    assert generator.generate_heart_rate_insight(_heart_rate(list(reversed(week)))) == first
+    assert len(calls) == 1
+    # The exact reading count reaches the prompt
+    assert '"readings": 7' in calls[0]
+    generator.generate_heart_rate_insight(_heart_rate(week + [71]))
+    assert len(calls) == 2
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('httpx')
+
+
+def run_against_stub(scenario, **server_options):
+    """Runs `scenario(server)` in a fresh event loop with a StubLLMServer up."""
+    from llm_stub_server import StubLLMServer
+
+    async def main():
+        async with StubLLMServer(**server_options) as server:
+            return await scenario(server)
+    return asyncio.run(main())
+
+
+def test_concurrent_prompts_share_requests_and_keep_their_order():
+    from llm_client import AsyncLLMClient
+    from llm_stub_server import stub_completion
+
+    prompts = ['x' * n for n in range(1, 21)]
+
+    async def scenario(server):
+        async with AsyncLLMClient(server.url, batch_size=8, batch_wait=0.05) as client:
+            results = await asyncio.gather(*(client.complete(p) for p in prompts))
+            return results, client.metrics(), server.requests
+
+    results, metrics, requests = run_against_stub(scenario, latency_ms=10)
+    assert results == [stub_completion(p) for p in prompts]
+    # Two full batches of 8, then the rest when batch_wait runs out
+    assert requests == metrics['requests'] == 3
+    assert metrics['prompts'] == metrics['sent'] == 20
+
+
+def test_requests_in_flight_never_exceed_max_concurrency():
+    from llm_client import AsyncLLMClient
+
+    async def scenario(server):
+        async with AsyncLLMClient(server.url, max_concurrency=2, batch_size=1) as client:
+            await asyncio.gather(*(client.complete(f"prompt {i}") for i in range(6)))
+            return server.max_in_flight, client.metrics()['requests']
+
+    max_in_flight, requests = run_against_stub(scenario, latency_ms=50)
+    assert max_in_flight == 2
+    assert requests == 6
+
+
+def test_timeout_raises_client_error():
+    from llm_client import AsyncLLMClient, LLMClientError
+
+    async def scenario(server):
+        async with AsyncLLMClient(server.url, timeout=0.05) as client:
+            with pytest.raises(LLMClientError, match='within'):
+                await client.complete("slow prompt")
+            return client.metrics()
+
+    metrics = run_against_stub(scenario, latency_ms=500)
+    assert metrics['timeouts'] == 1
+
+
+def test_error_status_fails_every_prompt_of_the_batch():
+    from llm_client import AsyncLLMClient, LLMClientError
+
+    async def scenario(server):
+        # The stub answers 404 outside /v1/completions
+        async with AsyncLLMClient(server.url + '/missing', batch_wait=0.05) as client:
+            results = await asyncio.gather(*(client.complete(f"prompt {i}") for i in range(3)),
+                                           return_exceptions=True)
+            return results, client.metrics()
+
+    results, metrics = run_against_stub(scenario, latency_ms=0)
+    assert all(isinstance(result, LLMClientError) for result in results)
+    assert '404' in str(results[0])
+    assert metrics['requests'] == metrics['errors'] == 1
@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+
+def test_stats_skip_missing_values_like_pandas():
+    from series_stats import SeriesStats
+
+    values = np.array([7.5, np.nan, 6.0, 8.25, 5.5])
+    series = pd.Series(values)
+    stats = SeriesStats(values)
+    assert stats.missing == 1 and stats.count == 4
+    assert stats.mean == series.mean() and stats.var == series.var()
+    assert stats.median == series.quantile(0.5)
+
+    complete = SeriesStats(values[~np.isnan(values)])
+    assert complete.missing == 0
+    assert complete.var_population == np.var(values[~np.isnan(values)])
+    assert complete.percentile(75) == np.percentile(values[~np.isnan(values)], 75)
+
+
+def test_pattern_analyzer_keeps_numpy_nan_semantics():
+    from pattern_analyzer import AdvancedPatternAnalyzer
+
+    analyzer = AdvancedPatternAnalyzer()
+    # Very irregular, but np.var over a missing night is NaN: no irregularity pattern
+    sleep = pd.DataFrame({'duration_hours': [4.0, 9.5, np.nan, 4.5, 10.0, 5.0]})
+    result = analyzer.detect_sleep_patterns(sleep)
+    assert "Highly irregular sleep schedule detected" not in result['patterns']
+    assert np.isnan(result['avg_duration']) and result['consistency_score'] == 0
+    assert "Highly irregular sleep schedule detected" in analyzer.detect_sleep_patterns(sleep.dropna())['patterns']
+
+    # np.percentile over a missing reading is NaN: no IQR spike, and the risk stays low
+    hr = pd.DataFrame({'heart_rate': [70.0] * 10 + [160.0, np.nan]})
+    result = analyzer.detect_heart_rate_anomalies(hr)
+    assert result['anomalies'] == [] and result['risk_level'] == 'low'
+    result = analyzer.detect_heart_rate_anomalies(hr.dropna())
+    assert result['anomalies'] == ["Heart rate spike detected: 160.0 bpm"] and result['risk_level'] == 'high'
@@ -0,0 +1,225 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+METHODS = ('zscore', 'mad', 'ewma')
+
+# Scale of the median absolute deviation that matches the std of a normal distribution
+MAD_SCALE = 1.4826
+
+# Elements of the (series x days x window) temporaries per block, 2**22
+# float64 = 32 MB each; the series per block follow from days * window
+BLOCK_ELEMENTS = 1 << 22
+
+
+class SeriesMatrix:
+    """
+    Many daily series packed into one (series x days) float matrix.
+
+    Rows are left-aligned by observation: column j holds the j-th observed
+    day of that series and shorter series are padded with NaN. A rolling
+    window therefore covers the last `window` observations of a series, the
+    same as pandas rolling over each series on its own.
+    """
+
+    def __init__(self, values: np.ndarray, days: np.ndarray, user_ids=None, metrics=None):
+        self.values = values
+        self.days = days
+        self.user_ids = user_ids
+        self.metrics = metrics
+
+    @classmethod
+    def from_daily(cls, daily_df: pd.DataFrame) -> 'SeriesMatrix':
+        """Pack a (user_id, day, metric, value) frame, one row per series."""
+        ordered = daily_df.sort_values(['user_id', 'metric', 'day'], kind='mergesort')
+        grouped = ordered.groupby(['user_id', 'metric'], sort=False)
+        rows = grouped.ngroup().to_numpy()
+        cols = grouped.cumcount().to_numpy()
+
+        n_series = int(rows.max()) + 1 if len(rows) else 0
+        n_days = int(cols.max()) + 1 if len(cols) else 0
+
+        values = np.full((n_series, n_days), np.nan)
+        values[rows, cols] = ordered['value'].to_numpy(dtype=float)
+        days = np.full((n_series, n_days), np.datetime64('NaT'), dtype='datetime64[D]')
+        days[rows, cols] = pd.to_datetime(ordered['day']).to_numpy().astype('datetime64[D]')
+
+        keys = grouped.head(1)
+        return cls(
+            values,
+            days,
+            user_ids=keys['user_id'].astype(str).to_numpy(dtype=object),
+            metrics=keys['metric'].to_numpy(dtype=object),
+        )
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> 'SeriesMatrix':
+        """Wrap a single series; its index labels are used as the days."""
+        return cls(
+            series.to_numpy(dtype=float)[np.newaxis, :],
+            np.asarray(series.index, dtype=object)[np.newaxis, :],
+        )
+
+    def __len__(self):
+        return self.values.shape[0]
+
+
+class AnomalyColumns:
+    """
+    Detected anomalies as parallel arrays, one entry per flagged point.
+
+    Kept columnar until the API edge; `to_records` builds the JSON dicts.
+    """
+
+    def __init__(self, series, day, value, z_score, baseline, user_id=None, metric=None, method='zscore', k=3):
+        self.series = series
+        self.day = day
+        self.value = value
+        self.z_score = z_score
+        self.baseline = baseline
+        self.user_id = user_id
+        self.metric = metric
+        self.method = method
+        self.k = k
+
+    def __len__(self):
+        return len(self.series)
+
+    def reason(self, i: int) -> str:
+        value, baseline, k = self.value[i], self.baseline[i], self.k
+        if self.method == 'mad':
+            return f"Deviation > {k} MAD (val={value:.1f}, median={baseline:.1f})"
+        if self.method == 'ewma':
+            return f"Deviation > {k} sigma from EWMA (val={value:.1f}, ewma={baseline:.1f})"
+        return f"Deviation > {k} sigma (val={value:.1f}, mean={baseline:.1f})"
+
+    def to_records(self) -> list:
+        records = []
+        for i in range(len(self)):
+            record = {}
+            if self.user_id is not None:
+                record["user_id"] = self.user_id[i]
+            record["date"] = str(self.day[i])
+            if self.metric is not None:
+                record["metric"] = self.metric[i]
+            record["value"] = float(self.value[i])
+            record["z_score"] = float(self.z_score[i])
+            record["reason"] = self.reason(i)
+            records.append(record)
+        return records
+
+
+def _windows(values: np.ndarray, window: int) -> np.ndarray:
+    """(series, days, window) view of trailing windows, NaN-padded on the left."""
+    padded = np.pad(values, ((0, 0), (window - 1, 0)), constant_values=np.nan)
+    return sliding_window_view(padded, window, axis=1)
+
+
+def rolling_mean_std(values: np.ndarray, window: int):
+    """Rolling mean and sample std (min_periods=1), std is NaN below 2 points."""
+    w = _windows(values, window)
+    valid = ~np.isnan(w)
+    count = valid.sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, w, 0.0).sum(axis=2) / count
+        sq_dev = np.where(valid, (w - mean[..., np.newaxis]) ** 2, 0.0).sum(axis=2)
+        std = np.sqrt(sq_dev / (count - 1))
+    std[count < 2] = np.nan
+    return mean, std
+
+
+def rolling_median_mad(values: np.ndarray, window: int):
+    """Rolling median and normal-consistent MAD (min_periods=1)."""
+    w = _windows(values, window)
+    with warnings.catch_warnings():
+        # Trailing padding yields all-NaN windows, those stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(w, axis=2)
+        mad = np.nanmedian(np.abs(w - median[..., np.newaxis]), axis=2) * MAD_SCALE
+    return median, mad
+
+
+def rolling_ewma(values: np.ndarray, window: int):
+    """
+    Exponentially weighted mean and std over the trailing window, with
+    alpha = 2 / (window + 1) so `window` plays the role of the EWMA span.
+    """
+    w = _windows(values, window)
+    alpha = 2.0 / (window + 1)
+    weights = (1 - alpha) ** np.arange(window - 1, -1, -1)
+    valid = ~np.isnan(w)
+    wts = np.where(valid, weights, 0.0)
+    total = wts.sum(axis=2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (wts * np.where(valid, w, 0.0)).sum(axis=2) / total
+        var = (wts * np.where(valid, (w - mean[..., np.newaxis]) ** 2, 0.0)).sum(axis=2) / total
+    std = np.sqrt(var)
+    std[valid.sum(axis=2) < 2] = np.nan
+    return mean, std
+
+
+_KERNELS = {
+    'zscore': rolling_mean_std,
+    'mad': rolling_median_mad,
+    'ewma': rolling_ewma,
+}
+
+
+class RollingAnomalyDetector:
+    """
+    Flags points more than `k` deviations from their trailing `window`
+    baseline, for every series of a SeriesMatrix at once.
+
+    method:
+        'zscore' - rolling mean / std (the original detector)
+        'mad'    - rolling median / MAD, robust to earlier outliers
+        'ewma'   - exponentially weighted mean / std over the window
+    """
+
+    def __init__(self, window=7, k=3, method='zscore'):
+        if method not in METHODS:
+            raise ValueError(f"Unknown anomaly method '{method}', expected one of {METHODS}")
+        self.window = window
+        self.k = k
+        self.method = method
+
+    def scores(self, values: np.ndarray):
+        """Returns (z, baseline) matrices with the shape of `values`."""
+        baseline, scale = _KERNELS[self.method](values, self.window)
+        # Avoid division by zero
+        scale = np.where(np.isnan(scale) | (scale == 0), 1e-9, scale)
+        z = np.abs(values - baseline) / scale
+        return z, baseline
+
+    def block_series(self, n_days: int) -> int:
+        """Series per block, so one block's window temporaries stay within BLOCK_ELEMENTS."""
+        return max(1, BLOCK_ELEMENTS // max(n_days * self.window, 1))
+
+    def detect(self, matrix: SeriesMatrix) -> AnomalyColumns:
+        rows, cols, z_hits, base_hits = [], [], [], []
+        block_series = self.block_series(matrix.values.shape[1])
+        for start in range(0, len(matrix), block_series):
+            block = matrix.values[start:start + block_series]
+            z, baseline = self.scores(block)
+            with np.errstate(invalid='ignore'):
+                r, c = np.nonzero(z > self.k)
+            rows.append(r + start)
+            cols.append(c)
+            z_hits.append(z[r, c])
+            base_hits.append(baseline[r, c])
+
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=int)
+        cols = np.concatenate(cols) if cols else np.empty(0, dtype=int)
+        return AnomalyColumns(
+            series=rows,
+            day=matrix.days[rows, cols],
+            value=matrix.values[rows, cols],
+            z_score=np.concatenate(z_hits) if z_hits else np.empty(0),
+            baseline=np.concatenate(base_hits) if base_hits else np.empty(0),
+            user_id=None if matrix.user_ids is None else matrix.user_ids[rows],
+            metric=None if matrix.metrics is None else matrix.metrics[rows],
+            method=self.method,
+            k=self.k,
+        )
@@ -0,0 +1,169 @@
+import os
+from urllib.parse import quote
+
+import pandas as pd
+
+try:
+    from .timeseries import Timeseries, parse_day
+except ImportError:  # imported as a top-level module by integrated_main
+    from timeseries import Timeseries, parse_day
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency, the archive is disabled without it
+    pa = None
+    pq = None
+
+# Directory of the timeseries archive; unset keeps timeseries in DATA_STORE
+ARCHIVE_DIR = os.environ.get('HEALTH_ARCHIVE_DIR')
+
+ARCHIVE_COLUMNS = ['user_id', 'day', 'metric', 'value']
+
+
+def archive_available() -> bool:
+    return pa is not None
+
+
+class TimeseriesArchive:
+    """
+    Columnar Parquet archive of daily values, partitioned by user and month:
+
+        <root>/user_id=<user>/month=<YYYY-MM>/<data_id>.parquet
+
+    Files are sorted by (metric, day), so reads memory-map the file, load
+    only the requested columns and skip row groups outside the date range
+    using the Parquet statistics. write() returns the files of an upload,
+    and reads given those `paths` open them directly instead of listing
+    the partition directories.
+    """
+
+    def __init__(self, root: str, row_group_size=4096):
+        if pa is None:
+            raise ImportError("pyarrow is required for the timeseries archive")
+        self.root = root
+        self.row_group_size = row_group_size
+        os.makedirs(root, exist_ok=True)
+
+    def _partition_dir(self, user_id: str, month: str) -> str:
+        return os.path.join(self.root, f"user_id={quote(str(user_id), safe='')}", f"month={month}")
+
+    def write(self, data_id: str, daily_df) -> list:
+        """Archives a Timeseries or (user_id, day, metric, value) frame; returns the files, relative to root."""
+        if isinstance(daily_df, Timeseries):
+            daily_df = daily_df.to_frame()
+        frame = pd.DataFrame({
+            'user_id': daily_df['user_id'].astype(str),
+            'day': pd.to_datetime(daily_df['day']).dt.date,
+            'metric': daily_df['metric'].astype(str),
+            'value': daily_df['value'].astype(float),
+        })
+        frame['month'] = pd.to_datetime(frame['day']).dt.strftime('%Y-%m')
+
+        written = []
+        for (user_id, month), part in frame.groupby(['user_id', 'month'], sort=False):
+            part = part.sort_values(['metric', 'day'], kind='mergesort')
+            table = pa.Table.from_pandas(part[ARCHIVE_COLUMNS], preserve_index=False).cast(pa.schema([
+                ('user_id', pa.string()),
+                ('day', pa.date32()),
+                ('metric', pa.dictionary(pa.int16(), pa.string())),
+                ('value', pa.float64()),
+            ]))
+            directory = self._partition_dir(user_id, month)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{data_id}.parquet")
+            pq.write_table(table, path, row_group_size=self.row_group_size)
+            written.append(os.path.relpath(path, self.root))
+        return written
+
+    def _files(self, data_id=None, user_id=None, start=None, end=None) -> list:
+        if not os.path.isdir(self.root):
+            return []
+        if user_id is not None:
+            user_dirs = [f"user_id={quote(str(user_id), safe='')}"]
+        else:
+            user_dirs = sorted(os.listdir(self.root))
+
+        start_month = start[:7] if start else None
+        end_month = end[:7] if end else None
+        files = []
+        for user_dir in user_dirs:
+            user_path = os.path.join(self.root, user_dir)
+            if not os.path.isdir(user_path):
+                continue
+            for month_dir in sorted(os.listdir(user_path)):
+                month = month_dir.split('=', 1)[-1]
+                if (start_month and month < start_month) or (end_month and month > end_month):
+                    continue
+                month_path = os.path.join(user_path, month_dir)
+                if data_id is not None:
+                    path = os.path.join(month_path, f"{data_id}.parquet")
+                    if os.path.exists(path):
+                        files.append(path)
+                else:
+                    files.extend(os.path.join(month_path, name) for name in sorted(os.listdir(month_path)))
+        return files
+
+    def _paths(self, paths, start=None, end=None) -> list:
+        """Absolute paths of files returned by write(), without months outside [start, end]."""
+        start_month = start[:7] if start else None
+        end_month = end[:7] if end else None
+        files = []
+        for path in paths:
+            month = os.path.basename(os.path.dirname(path)).split('=', 1)[-1]
+            if (start_month and month < start_month) or (end_month and month > end_month):
+                continue
+            files.append(os.path.join(self.root, path))
+        return files
+
+    def read_table(self, data_id=None, user_id=None, metric=None, start=None, end=None, columns=None, paths=None):
+        """Arrow table of the matching rows, reading only `columns` (of `paths` when given)."""
+        filters = []
+        if metric is not None:
+            filters.append(('metric', '=', metric))
+        if start is not None:
+            filters.append(('day', '>=', parse_day(start).item()))
+        if end is not None:
+            filters.append(('day', '<=', parse_day(end).item()))
+
+        columns = columns or ARCHIVE_COLUMNS
+        tables = [
+            pq.read_table(path, columns=columns, filters=filters or None, memory_map=True)
+            for path in (
+                self._paths(paths, start, end) if paths is not None
+                else self._files(data_id=data_id, user_id=user_id, start=start, end=end)
+            )
+        ]
+        if not tables:
+            return pa.table({name: pa.array([], type=pa.string()) for name in columns})
+        return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+    def _sorted_table(self, data_id, user_id, metric, start, end, paths):
+        table = self.read_table(data_id=data_id, user_id=user_id, metric=metric, start=start, end=end, paths=paths)
+        if table.num_rows == 0:
+            return None
+        table = table.set_column(table.schema.get_field_index('metric'), 'metric', table.column('metric').cast(pa.string()))
+        return table.sort_by([('user_id', 'ascending'), ('day', 'ascending'), ('metric', 'ascending')])
+
+    def read_timeseries(self, data_id=None, user_id=None, metric=None, start=None, end=None, paths=None) -> Timeseries:
+        """Matching rows as a Timeseries, ordered like get_trends_and_insights."""
+        table = self._sorted_table(data_id, user_id, metric, start, end, paths)
+        if table is None:
+            return Timeseries.empty()
+        return Timeseries.from_columns(*(table.column(name).to_numpy() for name in ARCHIVE_COLUMNS))
+
+    def read_records(self, data_id=None, user_id=None, metric=None, start=None, end=None, paths=None) -> list:
+        """Timeseries records in the same shape as get_trends_and_insights."""
+        table = self._sorted_table(data_id, user_id, metric, start, end, paths)
+        if table is None:
+            return []
+        table = table.set_column(table.schema.get_field_index('day'), 'day', table.column('day').cast(pa.string()))
+        return table.to_pylist()
+
+
+def create_archive(root: str = None):
+    """The archive at HEALTH_ARCHIVE_DIR, or None when unset or pyarrow is missing."""
+    root = root or ARCHIVE_DIR
+    if not root or not archive_available():
+        return None
+    return TimeseriesArchive(root)
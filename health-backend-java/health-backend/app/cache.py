@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import OrderedDict
+
+try:
+    from .serialize import encode_json
+except ImportError:  # imported as a top-level module by integrated_main
+    from serialize import encode_json
+
+# Total size of cached response bodies
+RESPONSE_CACHE_BYTES = int(os.environ.get('HEALTH_RESPONSE_CACHE_MB', 64)) * 1024 * 1024
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache with hit/miss counters.
+
+    Bounded by entry count (`maxsize`) and, when `max_bytes` is set, by the
+    total of `sizeof(value)` over the cached values.
+    """
+
+    def __init__(self, maxsize=256, max_bytes=None, sizeof=None):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda value: 0)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.current_bytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._data:
+                self.current_bytes -= self._sizes.pop(key)
+                del self._data[key]
+            self._data[key] = value
+            self._sizes[key] = size
+            self.current_bytes += size
+            while self._data and (
+                len(self._data) > self.maxsize
+                or (self.max_bytes is not None and self.current_bytes > self.max_bytes and len(self._data) > 1)
+            ):
+                old_key, _ = self._data.popitem(last=False)
+                self.current_bytes -= self._sizes.pop(old_key)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self.current_bytes -= self._sizes.pop(key)
+            return self._data.pop(key)
+
+    def pop_matching(self, predicate) -> int:
+        """Removes every key for which predicate(key) is true; returns how many."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                self.current_bytes -= self._sizes.pop(key)
+                del self._data[key]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.current_bytes = 0
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class ResponseCache:
+    """
+    Encoded JSON response bodies keyed by (scope, key), where the scope is
+    usually a data_id. Each body is encoded once and then served as bytes.
+
+    `invalidate(scope)` drops the bodies cached for the scope. A body that
+    was being built while any scope was invalidated is served but not
+    cached, since it may have read the replaced data.
+    """
+
+    def __init__(self, max_bytes=None, maxsize=4096):
+        self.cache = LRUCache(maxsize=maxsize, max_bytes=max_bytes or RESPONSE_CACHE_BYTES, sizeof=len)
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_encode(self, scope, key, build) -> bytes:
+        """Cached body for (scope, key), or encode_json(build()) stored for next time."""
+        cache_key = (scope, key)
+        body = self.cache.get(cache_key)
+        if body is None:
+            generation = self._generation
+            body = encode_json(build())
+            with self._lock:
+                if generation == self._generation:
+                    self.cache.put(cache_key, body)
+        return body
+
+    def invalidate(self, scope):
+        with self._lock:
+            self._generation += 1
+            self.cache.pop_matching(lambda cache_key: cache_key[0] == scope)
+
+    def stats(self) -> dict:
+        return self.cache.stats()
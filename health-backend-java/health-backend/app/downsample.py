@@ -0,0 +1,93 @@
+import numpy as np
+
+METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: keeps the first and last points and,
+    from each of n_out - 2 equal buckets in between, the point forming the
+    largest triangle with the previously kept point and the mean of the
+    next bucket. Returns sorted positions.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    sizes = np.diff(edges)
+    # Mean of every bucket, then of the last point standing in for the one after the last bucket
+    avg_x = np.append(np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes, x[-1])[1:].tolist()
+    avg_y = np.append(np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes, y[-1])[1:].tolist()
+
+    # Buckets are equal-sized; small ones are faster with plain floats than
+    # with a handful of NumPy calls each
+    small = (n - 2) / (n_out - 2) <= 32
+    xs, ys = (x.tolist(), y.tolist()) if small else (x, y)
+    selected = [0]
+    a = 0
+    for i, (lo, hi) in enumerate(zip(edges[:-1].tolist(), edges[1:].tolist())):
+        # |(xa - avg_x) * (y - ya) - (xa - x) * (avg_y - ya)|
+        xa, ya = xs[a], ys[a]
+        dx, dy = xa - avg_x[i], avg_y[i] - ya
+        if small:
+            best = -1.0
+            for j in range(lo, hi):
+                area = abs(dx * (ys[j] - ya) - (xa - xs[j]) * dy)
+                if area > best:
+                    best, a = area, j
+        else:
+            area = np.abs(dx * (y[lo:hi] - ya) - (xa - x[lo:hi]) * dy)
+            a = lo + int(np.argmax(area))
+        selected.append(a)
+    selected.append(n - 1)
+    return np.array(selected)
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Keeps the first and last points plus the minimum and maximum of each
+    of (n_out - 2) // 2 equal buckets, so peaks are never dropped. Returns
+    sorted positions.
+    """
+    n = len(y)
+    n_buckets = (n_out - 2) // 2
+    if n_out >= n or n_buckets < 1:
+        return np.arange(n)
+
+    edges = np.linspace(0, n, n_buckets + 1).astype(int)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    # Sorted by (bucket, value): each bucket's min comes first and its max last
+    order = np.lexsort((np.asarray(y, dtype=float), bucket))
+    keep = np.concatenate(([0, n - 1], order[edges[:-1]], order[edges[1:] - 1]))
+    return np.unique(keep)
+
+
+def downsample_indices(x: np.ndarray, y: np.ndarray, max_points: int, method: str = 'lttb') -> np.ndarray:
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}', expected one of {METHODS}")
+    if method == 'minmax':
+        return minmax_indices(y, max_points)
+    return lttb_indices(x, y, max_points)
+
+
+def downsample_timeseries(timeseries, max_points: int, method: str = 'lttb'):
+    """
+    Reduces a Timeseries to at most `max_points` points per (user_id,
+    metric) series, keeping the row order. Series are assumed to be in day
+    order.
+    """
+    series = timeseries.series_positions()
+    if all(len(positions) <= max_points for positions in series):
+        return timeseries
+
+    days = timeseries.days.astype(np.int64)
+    keep = np.zeros(len(timeseries), dtype=bool)
+    for positions in series:
+        if len(positions) <= max_points:
+            keep[positions] = True
+            continue
+        keep[positions[downsample_indices(days[positions], timeseries.values[positions], max_points, method)]] = True
+    return timeseries.take(keep)
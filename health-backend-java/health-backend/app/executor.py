@@ -0,0 +1,168 @@
+import asyncio
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+MODES = ('inline', 'thread', 'process')
+
+# 'inline' runs analysis on the event loop, 'thread' in a thread pool and
+# 'process' in a process pool (small payloads still go to threads)
+EXECUTOR_MODE = os.environ.get('HEALTH_EXECUTOR', 'thread')
+EXECUTOR_WORKERS = int(os.environ.get('HEALTH_EXECUTOR_WORKERS', min(4, os.cpu_count() or 1)))
+# Tasks allowed to run at once; further requests wait for a slot
+EXECUTOR_MAX_TASKS = int(os.environ.get('HEALTH_EXECUTOR_MAX_TASKS', 2 * EXECUTOR_WORKERS))
+TASK_TIMEOUT = float(os.environ.get('HEALTH_TASK_TIMEOUT', 120))
+# Uploads smaller than this are not worth the copy to a worker process
+PROCESS_MIN_BYTES = int(os.environ.get('HEALTH_PROCESS_MIN_BYTES', 1 << 20))
+
+
+class TaskTimeout(TimeoutError):
+    """An analysis task did not finish within the executor timeout."""
+
+
+def _warm_up() -> int:
+    # Loads pandas/numpy and the pipeline in the worker before the first request
+    try:
+        from . import ingest  # noqa: F401
+    except ImportError:  # imported as a top-level module by integrated_main
+        import ingest  # noqa: F401
+    return os.getpid()
+
+
+def _remaining_bytes(fileobj) -> int:
+    position = fileobj.tell()
+    end = fileobj.seek(0, os.SEEK_END)
+    fileobj.seek(position)
+    return end - position
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _spool(fileobj) -> str:
+    """Copies the rest of fileobj to a temporary file and returns its path."""
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(fileobj, out)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+class AnalysisExecutor:
+    """
+    Runs CPU-bound analysis off the asyncio event loop.
+
+    At most `max_tasks` tasks run at once and each is awaited for at most
+    `timeout` seconds. A task that times out is abandoned, not interrupted:
+    its worker finishes it in the background and the result is dropped.
+    """
+
+    def __init__(self, mode=None, workers=None, max_tasks=None, timeout=None, process_min_bytes=None):
+        self.mode = mode or EXECUTOR_MODE
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown executor mode '{self.mode}', expected one of {MODES}")
+        self.workers = workers or EXECUTOR_WORKERS
+        self.max_tasks = max_tasks or EXECUTOR_MAX_TASKS
+        self.timeout = timeout or TASK_TIMEOUT
+        self.process_min_bytes = PROCESS_MIN_BYTES if process_min_bytes is None else process_min_bytes
+        self._threads = None
+        self._processes = None
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='health-analysis')
+        return self._threads
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._processes is None:
+            self._processes = ProcessPoolExecutor(max_workers=self.workers)
+        return self._processes
+
+    def uses_processes(self, payload_bytes) -> bool:
+        return self.mode == 'process' and payload_bytes is not None and payload_bytes >= self.process_min_bytes
+
+    def _slots(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one event loop
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_tasks)
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    async def run(self, fn, *args, payload_bytes=None):
+        """
+        Returns fn(*args), computed in a worker. Only calls that pass
+        `payload_bytes` may be sent to the process pool, so they must use
+        picklable arguments and no state of this process.
+        """
+        if self.mode == 'inline':
+            return fn(*args)
+        pool = self._process_pool() if self.uses_processes(payload_bytes) else self._thread_pool()
+        return await self._submit(pool, fn, *args)
+
+    async def _submit(self, pool, fn, *args, done=None):
+        """
+        Runs fn(*args) in `pool` within a slot and the timeout. `done` is
+        called once the pool is finished with the task (ran, failed or was
+        cancelled), even if the wait for it timed out, or right away if the
+        task was never submitted.
+        """
+        future = None
+        try:
+            async with self._slots():
+                future = pool.submit(fn, *args)
+                if done is not None:
+                    future.add_done_callback(done)
+                try:
+                    return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+                except asyncio.TimeoutError:
+                    raise TaskTimeout(f"Analysis did not finish within {self.timeout:g}s") from None
+        finally:
+            if future is None and done is not None:
+                done(None)
+
+    async def run_upload(self, fn, fileobj, *args):
+        """
+        Returns fn(source, *args) for an uploaded file. For the process pool
+        the upload is copied to a temporary file and `source` is its path,
+        so fn must accept a path as well as a file object. Sizing and
+        copying the upload (which may be spooled to disk) run in the thread
+        pool, not on the event loop.
+        """
+        if self.mode != 'process':
+            return await self.run(fn, fileobj, *args)
+        loop = asyncio.get_running_loop()
+        size = await loop.run_in_executor(self._thread_pool(), _remaining_bytes, fileobj)
+        if not self.uses_processes(size):
+            return await self.run(fn, fileobj, *args)
+
+        path = await loop.run_in_executor(self._thread_pool(), _spool, fileobj)
+        # Removed when the worker is done with it, not when the wait times out
+        return await self._submit(self._process_pool(), fn, path, *args, done=lambda _: _remove_quietly(path))
+
+    def warm_up(self) -> list:
+        """Starts every worker and loads the pipeline in it; returns the worker pids."""
+        if self.mode == 'inline':
+            return []
+        pools = [self._thread_pool()]
+        if self.mode == 'process':
+            pools.append(self._process_pool())
+        futures = [pool.submit(_warm_up) for pool in pools for _ in range(self.workers)]
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._threads = None
+        self._processes = None
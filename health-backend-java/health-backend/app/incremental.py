@@ -0,0 +1,396 @@
+import json
+import math
+import sqlite3
+import threading
+from collections import deque
+from datetime import date, timedelta
+
+import pandas as pd
+
+try:
+    from .processor import trend_direction
+    from .rules import get_default_rules
+except ImportError:  # imported as a top-level module by integrated_main
+    from processor import trend_direction
+    from rules import get_default_rules
+
+SUMMARY_DAYS = 7
+
+
+class SeriesState:
+    """
+    Incremental state of one (user_id, metric) daily series.
+
+    Keeps a bounded buffer of the last daily values, enough for the rolling
+    anomaly window, the 7-day average and the 3-vs-3 day trend, plus the
+    first value for the first-vs-last trend of short series. Appending a
+    day costs O(window) and gives the same summary, trend and z-score that
+    get_trends_and_insights would compute over the full history.
+    """
+
+    def __init__(self, window=7, k=3):
+        self.window = window
+        self.k = k
+        self.count = 0
+        self.first_value = None
+        self.last_day = None
+        self.recent = deque(maxlen=max(window, SUMMARY_DAYS, 6))
+
+    def append(self, day: date, value: float) -> bool:
+        """
+        Adds one day. Re-sending the latest day replaces its value. Days
+        older than the latest are ignored and return False, since the
+        rolling window has already moved past them.
+        """
+        value = float(value)
+        if self.last_day is not None and day < self.last_day:
+            return False
+
+        if self.last_day is not None and day == self.last_day:
+            self.recent.pop()
+            self.count -= 1
+            if self.count == 0:
+                self.first_value = None
+        if self.first_value is None:
+            self.first_value = value
+
+        self.recent.append(value)
+        self.count += 1
+        self.last_day = day
+        return True
+
+    def avg_7d(self) -> float:
+        last = list(self.recent)[-SUMMARY_DAYS:]
+        return sum(last) / len(last)
+
+    def change_percent(self):
+        """Same rule as compute_series_metrics; None when no trend exists."""
+        values = list(self.recent)
+        if len(values) < 2:
+            return None
+        if len(values) >= 6:
+            recent = sum(values[-3:]) / 3
+            prev = sum(values[-6:-3]) / 3
+        else:
+            recent = values[-1]
+            prev = self.first_value
+        if prev <= 0:
+            return None
+        return (recent - prev) / prev * 100
+
+    def zscore(self):
+        """(z, rolling mean) of the latest value against its trailing window."""
+        window = list(self.recent)[-self.window:]
+        n = len(window)
+        mean = sum(window) / n
+        std = math.sqrt(sum((v - mean) ** 2 for v in window) / (n - 1)) if n > 1 else 0.0
+        # Avoid division by zero
+        std = std or 1e-9
+        return abs(window[-1] - mean) / std, mean
+
+    def to_dict(self) -> dict:
+        return {
+            "window": self.window,
+            "k": self.k,
+            "count": self.count,
+            "first_value": self.first_value,
+            "last_day": self.last_day.isoformat() if self.last_day else None,
+            "recent": list(self.recent),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'SeriesState':
+        state = cls(window=data["window"], k=data["k"])
+        state.count = data["count"]
+        state.first_value = data["first_value"]
+        state.last_day = date.fromisoformat(data["last_day"]) if data["last_day"] else None
+        state.recent.extend(data["recent"])
+        return state
+
+
+STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS series_state (
+    user_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (user_id, metric)
+);
+"""
+
+
+class SeriesStateStore:
+    """
+    SeriesState per (user_id, metric), optionally persisted in a SQLite
+    database at `path` so daily pushes keep their history across restarts.
+    Series are loaded on first use and save() upserts only the series
+    changed since the last save. Safe to share between worker threads.
+    """
+
+    def __init__(self, path=None, window=7, k=3, rules=None):
+        self.path = path
+        self.window = window
+        self.k = k
+        self.rules = rules
+        self.states = {}
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(STATE_SCHEMA)
+
+    def get(self, user_id: str, metric: str) -> SeriesState:
+        key = (str(user_id), metric)
+        with self._lock:
+            if key not in self.states:
+                self.states[key] = self._load(key) or SeriesState(window=self.window, k=self.k)
+            return self.states[key]
+
+    def _load(self, key: tuple):
+        if self._conn is None:
+            return None
+        row = self._conn.execute(
+            "SELECT state FROM series_state WHERE user_id = ? AND metric = ?", key
+        ).fetchone()
+        return SeriesState.from_dict(json.loads(row[0])) if row else None
+
+    def _update(self, user_id: str, day: date, values: dict) -> dict:
+        """Folds one day into the series; summary, trends and z-score anomalies."""
+        summary = {"total_users": 1}
+        trends = []
+        anomalies = []
+
+        with self._lock:
+            for metric, value in values.items():
+                state = self.get(user_id, metric)
+                in_order = state.append(day, value)
+                self._dirty.add((user_id, metric))
+                summary[f"{metric}_avg_7d"] = round(state.avg_7d(), 2)
+
+                change = state.change_percent()
+                if change is not None:
+                    trends.append({
+                        "user_id": user_id,
+                        "metric": metric,
+                        "trend": trend_direction(change),
+                        "change_percent": round(change, 1)
+                    })
+
+                if in_order:
+                    z, mean = state.zscore()
+                    if z > state.k:
+                        anomalies.append({
+                            "user_id": user_id,
+                            "date": str(day),
+                            "metric": metric,
+                            "value": float(value),
+                            "z_score": float(z),
+                            "reason": f"Deviation > {state.k} sigma (val={value:.1f}, mean={mean:.1f})"
+                        })
+
+        return {
+            "summary": summary,
+            "trends": trends,
+            "anomalies": anomalies,
+        }
+
+    def _rules(self):
+        return get_default_rules() if self.rules is None else self.rules
+
+    def append_day(self, user_id: str, day, values: dict) -> dict:
+        """
+        Adds one day of {metric: value} for a user and returns summary,
+        trends and anomalies shaped like get_trends_and_insights.
+        """
+        user_id = str(user_id)
+        day = pd.Timestamp(day).date()
+        result = self._update(user_id, day, values)
+
+        day_df = pd.DataFrame({
+            'user_id': user_id,
+            'day': day,
+            'metric': list(values),
+            'value': [float(v) for v in values.values()],
+        })
+        result["anomalies"].extend(self._rules().apply(day_df))
+        return result
+
+    def append_days(self, daily_df: pd.DataFrame) -> list:
+        """
+        Adds many (user_id, day, metric, value) rows, by user then day, and
+        returns [((user_id, day), result)] with one append_day result per
+        user-day in that order. Domain rules are evaluated once over the
+        whole frame.
+        """
+        daily_df = daily_df.assign(
+            user_id=daily_df['user_id'].astype(str),
+            day=pd.to_datetime(daily_df['day']).dt.date,
+        ).sort_values(['user_id', 'day'], kind='mergesort').reset_index(drop=True)
+
+        rule_anomalies = {}
+        for anomaly in self._rules().apply(daily_df):
+            rule_anomalies.setdefault((anomaly["user_id"], anomaly["date"]), []).append(anomaly)
+
+        day_values = {}
+        for user_id, day, metric, value in zip(daily_df['user_id'], daily_df['day'], daily_df['metric'], daily_df['value']):
+            day_values.setdefault((user_id, day), {})[metric] = float(value)
+
+        results = []
+        for (user_id, day), values in day_values.items():
+            result = self._update(user_id, day, values)
+            result["anomalies"].extend(rule_anomalies.get((user_id, str(day)), []))
+            results.append(((user_id, day), result))
+        return results
+
+    def save(self):
+        """Writes the series changed since the last save, in one transaction."""
+        with self._lock:
+            if self._conn is None or not self._dirty:
+                return
+            rows = [
+                (user_id, metric, json.dumps(self.states[(user_id, metric)].to_dict()))
+                for user_id, metric in self._dirty
+            ]
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO series_state (user_id, metric, state) VALUES (?, ?, ?)", rows
+                )
+            self._dirty.clear()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+
+
+# Metrics of the integrated API's daily entries and the longer trend windows (in calendar days)
+ENTRY_TREND_METRICS = ['steps', 'sleepHours', 'heartRate', 'calories']
+ENTRY_TREND_WINDOWS = {'7d': 7, '30d': 30}
+# Most recent entries replayed by EntryTrends.from_store at startup
+ENTRY_TREND_REBUILD = 10_000
+
+
+def _entry_trend(current, previous) -> dict:
+    change = current - previous
+    percent_change = (change / previous) * 100 if previous != 0 else 0
+    return {
+        "current": current,
+        "previous": previous,
+        "change": change,
+        "percentChange": round(percent_change, 1),
+        "trend": "increasing" if change > 0 else "decreasing" if change < 0 else "stable"
+    }
+
+
+def entry_day(entry: dict) -> date:
+    """Calendar day an entry describes: its raw_data date, else the day it was stored."""
+    for value in ((entry.get('raw_data') or {}).get('date'), entry.get('timestamp')):
+        try:
+            return date.fromisoformat(str(value)[:10])
+        except ValueError:
+            continue
+    return date.today()
+
+
+class EntryTrends:
+    """
+    Trends over the stored daily entries, updated as each entry is inserted.
+
+    Entries are bucketed per user and calendar day (entry_day); a day's
+    value of a metric is the mean of that user's entries for the day, so
+    several records of one day, or a batch of many users, count once per
+    user-day. For each user, `trends` compares the latest day with the
+    previous day that has data, and `windows` compares the mean daily value
+    of the last N calendar days (ending at the user's latest day) with the
+    N days before, once both hold data. Only the last 2 * max(window) days
+    per user are kept, so an insert costs O(window) and reading the trends
+    costs nothing. The top-level trends are those of the user of the most
+    recent entry; every user's are under `users`.
+    """
+
+    def __init__(self, metrics=None, windows=None):
+        self.metrics = metrics or ENTRY_TREND_METRICS
+        self.windows = windows or ENTRY_TREND_WINDOWS
+        self.horizon = 2 * max(self.windows.values())
+        # user_id -> {day: {metric: [sum, count]}}
+        self.days = {}
+        self.count = 0
+        self.start = None
+        self.end = None
+        self.latest_user = None
+        self.user_trends = {}
+
+    def add(self, entry: dict):
+        raw = entry.get('raw_data') or {}
+        timestamp = entry.get('timestamp')
+        self.count += 1
+        if self.start is None:
+            self.start = timestamp
+        self.end = timestamp
+
+        user_id = entry.get('user_id')
+        self.latest_user = user_id
+        days = self.days.setdefault(user_id, {})
+        day = entry_day(entry)
+        if days and day <= max(days) - timedelta(days=self.horizon):
+            return  # older than any window of this user
+        sums = days.setdefault(day, {})
+        for metric in self.metrics:
+            if metric in raw and raw[metric] is not None:
+                total = sums.setdefault(metric, [0, 0])
+                total[0] += raw[metric]
+                total[1] += 1
+
+        last_day = max(days)
+        for old in [d for d in days if d <= last_day - timedelta(days=self.horizon)]:
+            del days[old]
+        self.user_trends[user_id] = self._user_trends(days, last_day)
+
+    def _user_trends(self, days: dict, last_day: date) -> dict:
+        ordered = sorted(days)
+        daily = {
+            metric: {d: days[d][metric][0] / days[d][metric][1] for d in ordered if metric in days[d]}
+            for metric in self.metrics
+        }
+        trends = {}
+        for metric, values in daily.items():
+            recent = list(values.items())[-2:]
+            if len(recent) == 2 and recent[1][0] == ordered[-1]:
+                trends[metric] = _entry_trend(round(recent[1][1], 2), round(recent[0][1], 2))
+
+        windows = {name: {} for name in self.windows}
+        for name, size in self.windows.items():
+            split, first = last_day - timedelta(days=size), last_day - timedelta(days=2 * size)
+            for metric, values in daily.items():
+                current = [v for d, v in values.items() if d > split]
+                prior = [v for d, v in values.items() if first < d <= split]
+                if current and prior:
+                    windows[name][metric] = _entry_trend(
+                        round(sum(current) / len(current), 2), round(sum(prior) / len(prior), 2)
+                    )
+        return {"trends": trends, "windows": windows}
+
+    @classmethod
+    def from_store(cls, store, metrics=None, windows=None, limit=ENTRY_TREND_REBUILD) -> 'EntryTrends':
+        """Rebuilds the state from the `limit` most recent entries of a DataStore."""
+        tracker = cls(metrics=metrics, windows=windows)
+        for entry in store.last_n(limit):
+            tracker.add(entry)
+        if tracker.count:
+            tracker.count = len(store)
+            tracker.start = store.earliest()['timestamp']
+        return tracker
+
+    def snapshot(self) -> dict:
+        latest = self.user_trends.get(self.latest_user, {})
+        return {
+            "trends": latest.get("trends", {}),
+            "windows": latest.get("windows", {name: {} for name in self.windows}),
+            "userId": self.latest_user,
+            "users": {str(user_id): trends for user_id, trends in self.user_trends.items()},
+            "dataPoints": self.count,
+            "dateRange": {
+                "start": self.start,
+                "end": self.end
+            }
+        }
@@ -0,0 +1,200 @@
+import hashlib
+import io
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+try:
+    from .processor import (
+        WIDE_COLUMN_MAP, aggregate_per_day, analyze_daily, get_trends_and_insights, is_wide_format, prepare_long,
+    )
+    from .rules import get_default_rules
+except ImportError:  # imported as a top-level module by integrated_main
+    from processor import (
+        WIDE_COLUMN_MAP, aggregate_per_day, analyze_daily, get_trends_and_insights, is_wide_format, prepare_long,
+    )
+    from rules import get_default_rules
+
+# 'stream' reads uploads in bounded chunks, 'memory' loads the whole file first
+INGEST_MODE = os.environ.get('HEALTH_INGEST_MODE', 'stream')
+INGEST_CHUNK_ROWS = int(os.environ.get('HEALTH_INGEST_CHUNK_ROWS', 100_000))
+
+# Part of every upload digest; bump it when processing output changes so
+# results cached under the old pipeline are not reused
+PROCESSING_VERSION = '1'
+# Number of upload digests remembered for re-upload detection
+UPLOAD_CACHE_SIZE = int(os.environ.get('HEALTH_UPLOAD_CACHE_SIZE', 1024))
+
+DAILY_KEYS = ['user_id', 'day', 'metric']
+
+# Column types for every read of an upload, so each chunk of a stream gets
+# the same types as the whole file instead of its own inferred ones. Dates
+# are kept as text and parsed by normalize.
+CSV_DTYPES = {
+    'user_id': str,
+    'date': str,
+    'metric': str,
+    'value': float,
+    **{col: float for col in WIDE_COLUMN_MAP},
+}
+
+# Undated wide rows are numbered from this day while streaming and shifted
+# to end today once the total row count is known.
+_UNDATED_EPOCH = pd.Timestamp('1970-01-01')
+
+
+class DailyAccumulator:
+    """
+    Folds CSV chunks into running per-(user_id, day, metric) values.
+
+    Memory is bounded by the number of distinct user-days, not by file size.
+    The first non-missing value seen for a key wins, matching
+    aggregate_per_day on the whole file. Dates of every chunk are parsed
+    with the format guessed from the first dated chunk.
+    """
+
+    def __init__(self, compact_every=8):
+        self.compact_every = compact_every
+        self.rows = 0
+        self.users = set()
+        self.first_user_id = None
+        self.last_row = {}
+        self.undated = False
+        self.date_format = None
+        self._daily = None
+        self._pending = []
+
+    def add(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        if self.first_user_id is None and 'user_id' in chunk.columns:
+            self.first_user_id = str(chunk['user_id'].iloc[0])
+        self.last_row = chunk.iloc[-1].to_dict()
+
+        start_date = None
+        if is_wide_format(chunk) and 'date' not in chunk.columns:
+            self.undated = True
+            start_date = _UNDATED_EPOCH + pd.Timedelta(days=self.rows)
+        self.rows += len(chunk)
+
+        if self.date_format is None and 'date' in chunk.columns:
+            dates = chunk['date'].dropna()
+            if not dates.empty:
+                self.date_format = guess_datetime_format(str(dates.iloc[0])) or ''
+        long_df = prepare_long(chunk, start_date=start_date, date_format=self.date_format or None)
+        self.users.update(long_df['user_id'].unique())
+        self._pending.append(aggregate_per_day(long_df))
+        if len(self._pending) >= self.compact_every:
+            self._compact()
+
+    def _compact(self):
+        parts = ([self._daily] if self._daily is not None else []) + self._pending
+        self._pending = []
+        if parts:
+            # Chunks are kept in file order. groupby().first() skips NaN, so
+            # missing values are moved behind the present ones (stably)
+            # before keep='first'; a key stays NaN only if all its values are.
+            combined = pd.concat(parts, ignore_index=True)
+            order = np.argsort(combined['value'].isna().to_numpy(), kind='stable')
+            self._daily = combined.take(order).drop_duplicates(DAILY_KEYS, keep='first')
+
+    def daily(self) -> pd.DataFrame:
+        self._compact()
+        if self._daily is None:
+            raise ValueError("No data rows found")
+        daily_df = self._daily.sort_values(DAILY_KEYS, kind='mergesort').reset_index(drop=True)
+        if self.undated:
+            last_day = (_UNDATED_EPOCH + pd.Timedelta(days=self.rows - 1)).date()
+            shift = pd.Timestamp.today().date() - last_day
+            daily_df['day'] = daily_df['day'] + shift
+        return daily_df
+
+    def meta(self) -> dict:
+        return {
+            "rows": self.rows,
+            "first_user_id": self.first_user_id,
+            "last_row": self.last_row,
+        }
+
+
+class HashingReader(io.RawIOBase):
+    """
+    Binary file wrapper that feeds every block read through it into a
+    sha256 of PROCESSING_VERSION, the active rules and the file bytes, so
+    an upload is hashed by the same read that ingests it.
+    """
+
+    def __init__(self, fileobj, rules=None):
+        super().__init__()
+        rules = get_default_rules() if rules is None else rules
+        self._fileobj = fileobj
+        self._sha256 = hashlib.sha256(f"{PROCESSING_VERSION}:{rules.fingerprint()}\n".encode())
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        block = self._fileobj.read(len(buffer))
+        self._sha256.update(block)
+        buffer[:len(block)] = block
+        return len(block)
+
+    def hexdigest(self) -> str:
+        # Bytes the parser left unread are part of the upload too
+        for block in iter(lambda: self._fileobj.read(1 << 20), b''):
+            self._sha256.update(block)
+        return self._sha256.hexdigest()
+
+
+@contextmanager
+def _hashed(source, rules=None):
+    """A HashingReader over a binary file object, or over the file at a path."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield HashingReader(f, rules)
+    else:
+        yield HashingReader(source, rules)
+
+
+def process_csv_stream(source, chunk_rows=None, rules=None):
+    """
+    Streams a CSV (file object or path) in chunks of `chunk_rows` rows and
+    returns (results, meta); results match get_trends_and_insights on the
+    whole file, meta['digest'] is the upload's HashingReader digest.
+    """
+    accumulator = DailyAccumulator()
+    with _hashed(source, rules) as reader:
+        for chunk in pd.read_csv(io.BufferedReader(reader), chunksize=chunk_rows or INGEST_CHUNK_ROWS, dtype=CSV_DTYPES):
+            accumulator.add(chunk)
+        digest = reader.hexdigest()
+    results = analyze_daily(accumulator.daily(), len(accumulator.users), rules=rules)
+    return results, dict(accumulator.meta(), digest=digest)
+
+
+def process_csv_in_memory(source, rules=None):
+    """Loads the whole CSV at once; same return shape as process_csv_stream."""
+    with _hashed(source, rules) as reader:
+        df = pd.read_csv(io.BufferedReader(reader), dtype=CSV_DTYPES)
+        digest = reader.hexdigest()
+    results = get_trends_and_insights(df, rules=rules)
+    meta = {
+        "digest": digest,
+        "rows": len(df),
+        "first_user_id": str(df['user_id'].iloc[0]) if 'user_id' in df.columns and not df.empty else None,
+        "last_row": df.iloc[-1].to_dict() if not df.empty else {},
+    }
+    return results, meta
+
+
+def ingest_csv(source, mode=None, rules=None):
+    """Processes an uploaded CSV with the configured ingestion mode."""
+    if (mode or INGEST_MODE) == 'memory':
+        return process_csv_in_memory(source, rules=rules)
+    return process_csv_stream(source, rules=rules)
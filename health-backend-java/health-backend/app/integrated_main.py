@@ -1,22 +1,41 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import pandas as pd
+import numpy as np
 import json
 import uuid
 import sys
 import os
+import threading
 from typing import Dict, List, Any, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
+from contextlib import asynccontextmanager
 import requests
 
 # Add AI module to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'AI'))
 
 from ai_reasoning_engine import AIReasoningEngine
-from processor import get_trends_and_insights
+from batch_engine import BatchReasoningEngine
+from processor import DEFAULT_USER_ID
+from ingest import UPLOAD_CACHE_SIZE, ingest_csv
+from incremental import EntryTrends, SeriesStateStore
+from storage import create_store
+from cache import LRUCache, ResponseCache
+from scoring import cohort_distributions, health_score, health_scores
+from executor import AnalysisExecutor, TaskTimeout
 
-app = FastAPI(title="Integrated Health Data Backend", version="2.0")
+# Runs the pandas and AI analysis off the event loop (HEALTH_EXECUTOR)
+EXECUTOR = AnalysisExecutor()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    EXECUTOR.warm_up()
+    yield
+    EXECUTOR.shutdown()
+
+app = FastAPI(title="Integrated Health Data Backend", version="2.0", lifespan=lifespan)
 
 # CORS middleware for frontend integration
 app.add_middleware(
@@ -36,6 +55,9 @@ class HealthDataUpload(BaseModel):
     waterIntake: Optional[float] = 2.0
     date: Optional[str] = None
 
+class HealthDataBatchItem(HealthDataUpload):
+    userId: Optional[str] = None
+
 class HealthSummaryResponse(BaseModel):
     steps: int
     sleepHours: float
@@ -47,24 +69,86 @@ class HealthSummaryResponse(BaseModel):
     trends: Dict[str, Any]
     anomalies: List[Dict[str, Any]]
 
-# In-memory storage
-DATA_STORE: Dict[str, Dict] = {}
+# Storage backend (in-memory dict by default, SQLite with HEALTH_STORE=sqlite)
+DATA_STORE = create_store(default_path='integrated_health_data.db')
 ai_engine = AIReasoningEngine()
+batch_engine = BatchReasoningEngine(ai_engine)
+
+# Per-(user, metric) rolling state, so each pushed day is analyzed against history
+SERIES_STATE = SeriesStateStore(path=os.environ.get('HEALTH_STATE_PATH'))
+
+# Day-over-day and windowed trends, updated on every insert into DATA_STORE
+ENTRY_TRENDS = EntryTrends.from_store(DATA_STORE)
+
+# Upload digest -> data_id of the first upload of those bytes
+UPLOAD_CACHE = LRUCache(maxsize=UPLOAD_CACHE_SIZE)
+
+# Encoded GET responses; all of them read the latest data, so every write invalidates them
+RESPONSE_CACHE = ResponseCache()
+STORE_SCOPE = 'store'
+
+def cached_json(key, build) -> Response:
+    """Serves the body of build() encoded once per key until the next write"""
+    return Response(content=RESPONSE_CACHE.get_or_encode(STORE_SCOPE, key, build), media_type="application/json")
+
+# Writes run in EXECUTOR threads (see store_entry), one at a time
+STORE_LOCK = threading.Lock()
+
+def store_entry(data_id: str, entry: Dict[str, Any], results: Dict[str, Any]):
+    """Stores an entry and folds it into the precomputed trends"""
+    with STORE_LOCK:
+        DATA_STORE.put(data_id, entry, results=results)
+        ENTRY_TRENDS.add(entry)
+        RESPONSE_CACHE.invalidate(STORE_SCOPE)
+
+def store_entries(items: List[tuple]):
+    """Stores (data_id, entry, results) tuples in one bulk write"""
+    with STORE_LOCK:
+        DATA_STORE.put_many(items)
+        for _, entry, _ in items:
+            ENTRY_TRENDS.add(entry)
+        RESPONSE_CACHE.invalidate(STORE_SCOPE)
+
+# Processor metric name -> upload field, in the order days are reported
+DAY_METRICS = {
+    'steps': 'steps',
+    'sleep': 'sleepHours',
+    'heart_rate': 'heartRate',
+    'calories': 'calories',
+    'water': 'waterIntake'
+}
+
+def format_ai_insights(ai_results: Dict[str, Any], summary: Dict[str, Any]) -> List[str]:
+    """Insight lines for the frontend from the AI analysis and the series summary"""
+    ai_insights = []
+    for insight in ai_results['insights']:
+        if insight['severity'] in ['warning', 'caution', 'critical']:
+            ai_insights.append(insight['message'])
+    
+    # Add recommendations
+    ai_insights.extend(ai_results['recommendations'][:3])  # Limit to top 3
+    
+    # Add summary insights from processor
+    if 'heart_rate_avg_7d' in summary:
+        ai_insights.append(f"Average heart rate: {summary['heart_rate_avg_7d']} BPM")
+    if 'sleep_avg_7d' in summary:
+        ai_insights.append(f"Average sleep: {summary['sleep_avg_7d']} hours")
+    if 'steps_avg_7d' in summary:
+        ai_insights.append(f"Average steps: {int(summary['steps_avg_7d'])} per day")
+    return ai_insights
 
 def process_health_data(data: Dict[str, Any]) -> Dict[str, Any]:
     """Process health data and generate AI insights"""
     try:
         # Convert to processor expected format: user_id, date, metric, value
         date_str = data.get('date', datetime.now().strftime('%Y-%m-%d'))
-        records = [
-            {'user_id': 'user1', 'date': date_str, 'metric': 'steps', 'value': data['steps']},
-            {'user_id': 'user1', 'date': date_str, 'metric': 'sleep', 'value': data['sleepHours']},
-            {'user_id': 'user1', 'date': date_str, 'metric': 'heart_rate', 'value': data['heartRate']},
-            {'user_id': 'user1', 'date': date_str, 'metric': 'calories', 'value': data['calories']},
-            {'user_id': 'user1', 'date': date_str, 'metric': 'water', 'value': data.get('waterIntake', 2.0)}
-        ]
-        
-        df = pd.DataFrame(records)
+        day_values = {
+            'steps': data['steps'],
+            'sleep': data['sleepHours'],
+            'heart_rate': data['heartRate'],
+            'calories': data['calories'],
+            'water': data.get('waterIntake', 2.0)
+        }
         
         # Prepare data for AI analysis with correct column names
         health_data = {
@@ -85,29 +169,15 @@ def process_health_data(data: Dict[str, Any]) -> Dict[str, Any]:
         # Get AI analysis
         ai_results = ai_engine.analyze_health_data(health_data)
         
-        # Get trends and anomalies using existing processor
-        trends_results = get_trends_and_insights(df)
+        # Update the user's series state and get trends and anomalies in context of history
+        trends_results = SERIES_STATE.append_day(DEFAULT_USER_ID, date_str, day_values)
+        SERIES_STATE.save()
         
         # Calculate health score
         health_score = calculate_health_score(data)
         
         # Format AI insights for frontend
-        ai_insights = []
-        for insight in ai_results['insights']:
-            if insight['severity'] in ['warning', 'caution', 'critical']:
-                ai_insights.append(insight['message'])
-        
-        # Add recommendations
-        ai_insights.extend(ai_results['recommendations'][:3])  # Limit to top 3
-        
-        # Add summary insights from processor
-        summary = trends_results.get('summary', {})
-        if 'heart_rate_avg_7d' in summary:
-            ai_insights.append(f"Average heart rate: {summary['heart_rate_avg_7d']} BPM")
-        if 'sleep_avg_7d' in summary:
-            ai_insights.append(f"Average sleep: {summary['sleep_avg_7d']} hours")
-        if 'steps_avg_7d' in summary:
-            ai_insights.append(f"Average steps: {int(summary['steps_avg_7d'])} per day")
+        ai_insights = format_ai_insights(ai_results, trends_results.get('summary', {}))
         
         return {
             'processed_data': data,
@@ -115,6 +185,10 @@ def process_health_data(data: Dict[str, Any]) -> Dict[str, Any]:
             'health_score': health_score,
             'trends': trends_results.get('trends', {}),
             'anomalies': trends_results.get('anomalies', []),
+            'timeseries': [
+                {'user_id': DEFAULT_USER_ID, 'day': date_str, 'metric': metric, 'value': float(value)}
+                for metric, value in day_values.items()
+            ],
             'full_ai_analysis': ai_results
         }
         
@@ -128,49 +202,85 @@ def process_health_data(data: Dict[str, Any]) -> Dict[str, Any]:
             'anomalies': []
         }
 
-def calculate_health_score(data: Dict[str, Any]) -> float:
-    """Calculate overall health score based on metrics"""
-    score = 0
+def process_health_data_batch(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Process many days, possibly of several users, in one pass: one frame
+    for the batch, one series state update with a single rule evaluation,
+    and one grouped AI analysis in which every record is its own group, so
+    each day gets the insights /api/uploadHealthData would give it.
+    Returns results in record order. A user may have one record per day.
+    """
+    frame = pd.DataFrame(records)
+    user_ids = frame['userId'].astype(str).to_numpy()
+    dates = frame['date'].astype(str).to_numpy()
+    days = pd.to_datetime(dates).strftime('%Y-%m-%d')
     
-    # Steps scoring (30% weight)
-    steps = data['steps']
-    if steps >= 10000:
-        score += 30
-    elif steps >= 7500:
-        score += 25
-    elif steps >= 5000:
-        score += 20
-    else:
-        score += 10
+    # Series state and rule anomalies are per user-day, so duplicates would share them
+    duplicated = pd.Series(list(zip(user_ids, days))).duplicated().to_numpy()
+    if duplicated.any():
+        i = int(np.argmax(duplicated))
+        raise ValueError(f"More than one record for user {user_ids[i]} on {days[i]}")
+    values = frame[list(DAY_METRICS.values())].to_numpy(dtype=float)
     
-    # Sleep scoring (25% weight)
-    sleep = data['sleepHours']
-    if 7 <= sleep <= 9:
-        score += 25
-    elif 6 <= sleep < 7 or 9 < sleep <= 10:
-        score += 20
-    else:
-        score += 10
+    # Long (user_id, day, metric, value) rows, metrics of a day kept together
+    daily_df = pd.DataFrame({
+        'user_id': np.repeat(user_ids, len(DAY_METRICS)),
+        'day': np.repeat(dates, len(DAY_METRICS)),
+        'metric': np.tile(list(DAY_METRICS), len(frame)),
+        'value': values.ravel()
+    })
+    series_results = {
+        (user_id, str(day)): result
+        for (user_id, day), result in SERIES_STATE.append_days(daily_df)
+    }
+    SERIES_STATE.save()
     
-    # Heart rate scoring (25% weight)
-    hr = data['heartRate']
-    if 60 <= hr <= 100:
-        score += 25
-    elif 50 <= hr < 60 or 100 < hr <= 120:
-        score += 20
-    else:
-        score += 10
+    timestamps = pd.to_datetime(frame['date']).to_numpy()
+    # Grouped by record position rather than by user: a day's insights
+    # come from that day alone, not from the user's other days in the batch
+    record_column = np.arange(len(frame))
+    ai_by_record = batch_engine.analyze_by_user({
+        'sleep': pd.DataFrame({
+            'user_id': record_column,
+            'timestamp': timestamps,
+            'duration_hours': frame['sleepHours'].to_numpy()
+        }),
+        'heart_rate': pd.DataFrame({
+            'user_id': record_column,
+            'timestamp': timestamps,
+            'heart_rate': frame['heartRate'].to_numpy()
+        }),
+        'hydration': pd.DataFrame({
+            'user_id': record_column,
+            'timestamp': timestamps,
+            'water_ml': frame['waterIntake'].to_numpy() * 1000
+        })
+    })
     
-    # Hydration scoring (20% weight)
-    water = data.get('waterIntake', 2.0)
-    if water >= 2.5:
-        score += 20
-    elif water >= 2.0:
-        score += 15
-    else:
-        score += 10
+    scores = health_scores(frame['steps'], frame['sleepHours'], frame['heartRate'], frame['waterIntake'])
     
-    return min(score, 100.0)
+    results = []
+    for i, record in enumerate(records):
+        series = series_results[(user_ids[i], days[i])]
+        ai_results = ai_by_record[i]
+        results.append({
+            'processed_data': record,
+            'ai_insights': format_ai_insights(ai_results, series['summary']),
+            'health_score': float(scores[i]),
+            'trends': series['trends'],
+            'anomalies': series['anomalies'],
+            'timeseries': [
+                {'user_id': user_ids[i], 'day': dates[i], 'metric': metric, 'value': float(value)}
+                for metric, value in zip(DAY_METRICS, values[i])
+            ],
+            'full_ai_analysis': ai_results
+        })
+    return results
+
+def calculate_health_score(data: Dict[str, Any]) -> float:
+    """Calculate overall health score based on metrics"""
+    # Same kernel as the batch path, so the two cannot drift
+    return health_score(data['steps'], data['sleepHours'], data['heartRate'], data.get('waterIntake', 2.0))
 
 @app.post("/api/uploadHealthData")
 async def upload_health_data(data: HealthDataUpload):
@@ -182,15 +292,17 @@ async def upload_health_data(data: HealthDataUpload):
             health_data['date'] = datetime.now().strftime('%Y-%m-%d')
         
         # Process with AI
-        results = process_health_data(health_data)
+        # Uses the shared series state, so it runs in a thread, never a process
+        results = await EXECUTOR.run(process_health_data, health_data)
         
         # Store data
         data_id = str(uuid.uuid4())
-        DATA_STORE[data_id] = {
+        await EXECUTOR.run(store_entry, data_id, {
             'timestamp': datetime.now().isoformat(),
+            'user_id': DEFAULT_USER_ID,
             'raw_data': health_data,
             'results': results
-        }
+        }, results)
         
         return {
             "status": "success",
@@ -207,151 +319,214 @@ async def upload_health_data(data: HealthDataUpload):
             }
         }
         
+    except TaskTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing health data: {str(e)}")
 
-@app.get("/api/healthSummary")
-async def get_health_summary():
-    """Get summary of all health data"""
+@app.post("/api/uploadHealthDataBatch")
+async def upload_health_data_batch(data: List[HealthDataBatchItem]):
+    """Upload and process many days, possibly of several users, in one request"""
     try:
-        if not DATA_STORE:
-            return {
-                "message": "No health data available",
-                "totalRecords": 0
-            }
-        
-        # Get latest entry
-        latest_entry = max(DATA_STORE.values(), key=lambda x: x['timestamp'])
-        results = latest_entry['results']
-        raw_data = latest_entry['raw_data']
+        if not data:
+            raise ValueError("No records in batch")
+        today = datetime.now().strftime('%Y-%m-%d')
+        records = []
+        for item in data:
+            record = item.dict()
+            record['userId'] = record.get('userId') or DEFAULT_USER_ID
+            record['date'] = record.get('date') or today
+            record['waterIntake'] = 2.0 if record.get('waterIntake') is None else record['waterIntake']
+            records.append(record)
+        
+        # Uses the shared series state, so it runs in a thread, never a process
+        results = await EXECUTOR.run(process_health_data_batch, records)
+        
+        # Distinct timestamps keep the records' order in the store
+        now = datetime.now()
+        items = []
+        for i, (record, result) in enumerate(zip(records, results)):
+            items.append((str(uuid.uuid4()), {
+                'timestamp': (now + timedelta(microseconds=i)).isoformat(),
+                'user_id': record['userId'],
+                'raw_data': record,
+                'results': result
+            }, result))
+        await EXECUTOR.run(store_entries, items)
         
-        # Get processor summary for accurate averages
-        trends_results = results.get('trends', {})
-        processor_summary = trends_results.get('summary', {}) if isinstance(trends_results, dict) else {}
+        return {
+            "status": "success",
+            "message": f"Processed {len(records)} days of health data",
+            "count": len(records),
+            "days": [
+                {
+                    "data_id": data_id,
+                    "userId": entry['user_id'],
+                    "date": entry['raw_data']['date'],
+                    "healthScore": result['health_score'],
+                    "aiInsights": result['ai_insights']
+                }
+                for data_id, entry, result in items
+            ]
+        }
         
+    except TaskTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing health data batch: {str(e)}")
+
+def health_summary_payload() -> Dict[str, Any]:
+    """Summary of the latest health data"""
+    if not DATA_STORE:
         return {
-            "steps": raw_data['steps'],
-            "sleepHours": raw_data['sleepHours'],
-            "heartRate": raw_data['heartRate'],
-            "calories": raw_data['calories'],
-            "waterIntake": raw_data.get('waterIntake', 2.0),
-            "aiInsights": results['ai_insights'],
-            "healthScore": results['health_score'],
-            "trends": results['trends'],
-            "anomalies": results['anomalies'],
-            "averages": {
-                "heartRate": processor_summary.get('heart_rate_avg_7d', raw_data['heartRate']),
-                "steps": processor_summary.get('steps_avg_7d', raw_data['steps']),
-                "sleep": processor_summary.get('sleep_avg_7d', raw_data['sleepHours'])
-            },
-            "totalRecords": len(DATA_STORE),
-            "lastUpdated": latest_entry['timestamp']
+            "message": "No health data available",
+            "totalRecords": 0
         }
+    
+    # Get latest entry
+    latest_entry = DATA_STORE.latest()
+    results = latest_entry['results']
+    raw_data = latest_entry['raw_data']
+    
+    # Get processor summary for accurate averages
+    trends_results = results.get('trends', {})
+    processor_summary = trends_results.get('summary', {}) if isinstance(trends_results, dict) else {}
+    
+    return {
+        "steps": raw_data['steps'],
+        "sleepHours": raw_data['sleepHours'],
+        "heartRate": raw_data['heartRate'],
+        "calories": raw_data['calories'],
+        "waterIntake": raw_data.get('waterIntake', 2.0),
+        "aiInsights": results['ai_insights'],
+        "healthScore": results['health_score'],
+        "trends": results['trends'],
+        "anomalies": results['anomalies'],
+        "averages": {
+            "heartRate": processor_summary.get('heart_rate_avg_7d', raw_data['heartRate']),
+            "steps": processor_summary.get('steps_avg_7d', raw_data['steps']),
+            "sleep": processor_summary.get('sleep_avg_7d', raw_data['sleepHours'])
+        },
+        "totalRecords": len(DATA_STORE),
+        "lastUpdated": latest_entry['timestamp']
+    }
+
+@app.get("/api/healthSummary")
+async def get_health_summary():
+    """Get summary of all health data"""
+    try:
+        return cached_json("healthSummary", health_summary_payload)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving health summary: {str(e)}")
 
+def health_insights_payload() -> Dict[str, Any]:
+    """AI insights of the latest health data"""
+    if not DATA_STORE:
+        return {
+            "insights": ["Upload health data to get personalized insights"],
+            "recommendations": []
+        }
+    
+    # Get latest entry
+    latest_entry = DATA_STORE.latest()
+    ai_analysis = latest_entry['results'].get('full_ai_analysis', {})
+    
+    insights = []
+    for insight in ai_analysis.get('insights', []):
+        insights.append({
+            "id": insight['id'],
+            "type": insight['type'],
+            "severity": insight['severity'],
+            "title": insight['title'],
+            "message": insight['message'],
+            "timestamp": latest_entry['timestamp']
+        })
+    
+    return {
+        "insights": insights,
+        "recommendations": ai_analysis.get('recommendations', []),
+        "analysisDate": ai_analysis.get('analysis_date'),
+        "contextPeriod": ai_analysis.get('context_period', "Current data")
+    }
+
 @app.get("/api/healthInsights")
 async def get_health_insights():
     """Get AI-generated health insights"""
     try:
-        if not DATA_STORE:
-            return {
-                "insights": ["Upload health data to get personalized insights"],
-                "recommendations": []
-            }
-        
-        # Get latest entry
-        latest_entry = max(DATA_STORE.values(), key=lambda x: x['timestamp'])
-        ai_analysis = latest_entry['results'].get('full_ai_analysis', {})
-        
-        insights = []
-        for insight in ai_analysis.get('insights', []):
-            insights.append({
-                "id": insight['id'],
-                "type": insight['type'],
-                "severity": insight['severity'],
-                "title": insight['title'],
-                "message": insight['message'],
-                "timestamp": latest_entry['timestamp']
-            })
-        
-        return {
-            "insights": insights,
-            "recommendations": ai_analysis.get('recommendations', []),
-            "analysisDate": ai_analysis.get('analysis_date'),
-            "contextPeriod": ai_analysis.get('context_period', "Current data")
-        }
+        return cached_json("healthInsights", health_insights_payload)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving insights: {str(e)}")
 
+def health_trends_payload() -> Dict[str, Any]:
+    """Precomputed trends of the stored health data"""
+    if not DATA_STORE:
+        return {
+            "trends": {},
+            "message": "No data available for trend analysis"
+        }
+    
+    # Trends are maintained on insert, so this only reads them
+    return ENTRY_TRENDS.snapshot()
+
 @app.get("/api/healthTrends")
 async def get_health_trends():
     """Get health trends analysis"""
     try:
-        if not DATA_STORE:
-            return {
-                "trends": {},
-                "message": "No data available for trend analysis"
-            }
-        
-        # Collect all data for trend analysis
-        all_data = []
-        for entry in DATA_STORE.values():
-            data_point = entry['raw_data'].copy()
-            data_point['timestamp'] = entry['timestamp']
-            all_data.append(data_point)
-        
-        # Sort by timestamp
-        all_data.sort(key=lambda x: x['timestamp'])
-        
-        # Calculate trends
-        trends = {}
-        if len(all_data) >= 2:
-            latest = all_data[-1]
-            previous = all_data[-2]
-            
-            for metric in ['steps', 'sleepHours', 'heartRate', 'calories']:
-                if metric in latest and metric in previous:
-                    change = latest[metric] - previous[metric]
-                    percent_change = (change / previous[metric]) * 100 if previous[metric] != 0 else 0
-                    
-                    trends[metric] = {
-                        "current": latest[metric],
-                        "previous": previous[metric],
-                        "change": change,
-                        "percentChange": round(percent_change, 1),
-                        "trend": "increasing" if change > 0 else "decreasing" if change < 0 else "stable"
-                    }
-        
-        return {
-            "trends": trends,
-            "dataPoints": len(all_data),
-            "dateRange": {
-                "start": all_data[0]['timestamp'] if all_data else None,
-                "end": all_data[-1]['timestamp'] if all_data else None
-            }
-        }
+        return cached_json("healthTrends", health_trends_payload)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error retrieving trends: {str(e)}")
 
+def health_score_distribution_payload(groupBy: str) -> Dict[str, Any]:
+    """Health score distributions over all stored days"""
+    entries = [entry for entry in DATA_STORE.values() if entry.get('raw_data')]
+    if not entries:
+        return {"cohorts": {}, "message": "No data available for scoring"}
+    
+    raw = pd.DataFrame([entry['raw_data'] for entry in entries])
+    scores = health_scores(
+        raw['steps'], raw['sleepHours'], raw['heartRate'],
+        raw['waterIntake'].fillna(2.0) if 'waterIntake' in raw else np.full(len(raw), 2.0)
+    )
+    if groupBy == "user":
+        cohorts = [str(entry.get('user_id') or DEFAULT_USER_ID) for entry in entries]
+    else:
+        cohorts = raw['date'].fillna('').astype(str).str[:7].to_numpy() if 'date' in raw else np.full(len(raw), '')
+    return {"groupBy": groupBy, "cohorts": cohort_distributions(scores, cohorts)}
+
+@app.get("/api/healthScores/distribution")
+async def get_health_score_distribution(groupBy: str = "user"):
+    """Health score distribution per cohort: by user or by month of the record date"""
+    if groupBy not in ("user", "month"):
+        raise HTTPException(status_code=400, detail="groupBy must be 'user' or 'month'")
+    return cached_json(("healthScores", groupBy), lambda: health_score_distribution_payload(groupBy))
+
 @app.post("/api/uploadCSV")
 async def upload_csv_file(file: UploadFile = File(...)):
     """Upload CSV file for batch processing"""
     try:
-        # Read CSV
-        df = pd.read_csv(file.file)
+        # Read and process CSV in bounded chunks, hashing it in the same read
+        results, meta = await EXECUTOR.run_upload(ingest_csv, file.file)
         
-        # Process with existing processor
-        results = get_trends_and_insights(df)
+        # Byte-identical re-uploads return the entry stored the first time
+        cached_id = UPLOAD_CACHE.get(meta['digest'])
+        cached = DATA_STORE.get(cached_id) if cached_id is not None else None
+        if cached is not None:
+            return {
+                "status": "success",
+                "message": f"CSV file processed: {file.filename}",
+                "data_id": cached_id,
+                "summary": cached['results']['trends'].get("summary", {}),
+                "recordsProcessed": cached.get('recordsProcessed', 0)
+            }
         
         # Store results in compatible format
         data_id = str(uuid.uuid4())
         
         # Get latest row for raw_data format
-        latest_row = df.iloc[-1] if not df.empty else {}
+        latest_row = meta['last_row']
         raw_data = {
             'steps': int(latest_row.get('steps', 0)),
             'sleepHours': float(latest_row.get('sleep_hours', 0)),
@@ -361,29 +536,39 @@ async def upload_csv_file(file: UploadFile = File(...)):
             'date': latest_row.get('date', datetime.now().strftime('%Y-%m-%d'))
         }
         
-        DATA_STORE[data_id] = {
+        await EXECUTOR.run(store_entry, data_id, {
             'timestamp': datetime.now().isoformat(),
+            'user_id': meta['first_user_id'] or DEFAULT_USER_ID,
             'raw_data': raw_data,
             'results': {
-                'ai_insights': [f"Processed {len(df)} records from CSV", f"Average heart rate: {results.get('summary', {}).get('heart_rate_avg_7d', 0)} BPM"],
+                'ai_insights': [f"Processed {meta['rows']} records from CSV", f"Average heart rate: {results.get('summary', {}).get('heart_rate_avg_7d', 0)} BPM"],
                 'health_score': 85.0,
                 'trends': results,
                 'anomalies': results.get('anomalies', [])
             },
-            'type': 'csv_upload'
-        }
+            'type': 'csv_upload',
+            'recordsProcessed': meta['rows']
+        }, results)
+        UPLOAD_CACHE.put(meta['digest'], data_id)
         
         return {
             "status": "success",
             "message": f"CSV file processed: {file.filename}",
             "data_id": data_id,
             "summary": results.get("summary", {}),
-            "recordsProcessed": len(df)
+            "recordsProcessed": meta['rows']
         }
         
+    except TaskTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Error processing CSV: {str(e)}")
 
+@app.get("/api/cacheStats")
+async def get_cache_stats():
+    """Hit/miss counters of the re-upload and response caches"""
+    return {"uploads": UPLOAD_CACHE.stats(), "responses": RESPONSE_CACHE.stats()}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -403,10 +588,13 @@ async def root():
         "version": "2.0",
         "endpoints": [
             "/api/uploadHealthData",
+            "/api/uploadHealthDataBatch",
             "/api/healthSummary", 
             "/api/healthInsights",
             "/api/healthTrends",
-            "/api/uploadCSV"
+            "/api/healthScores/distribution",
+            "/api/uploadCSV",
+            "/api/cacheStats"
         ]
     }
 
@@ -1,12 +1,27 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-import pandas as pd
 import uuid
-from typing import Dict
-from .processor import get_trends_and_insights
+from contextlib import asynccontextmanager
+from typing import Optional
+from .archive import create_archive
+from .cache import LRUCache, ResponseCache
+from .downsample import METHODS, downsample_timeseries
+from .executor import AnalysisExecutor, TaskTimeout
+from .ingest import UPLOAD_CACHE_SIZE, ingest_csv
+from .storage import create_store
+from .timeseries import FORMATS, Timeseries, parse_day
 from .models import UploadResponse, SummaryResponse
 
-app = FastAPI(title="Health Data Backend", version="1.0")
+# Runs uploads' CPU-bound processing off the event loop (HEALTH_EXECUTOR)
+EXECUTOR = AnalysisExecutor()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    EXECUTOR.warm_up()
+    yield
+    EXECUTOR.shutdown()
+
+app = FastAPI(title="Health Data Backend", version="1.0", lifespan=lifespan)
 
 # Allow CORS for frontend
 app.add_middleware(
@@ -17,32 +32,95 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# In-memory storage
-DATA_STORE: Dict[str, Dict] = {}
+# Storage backend (in-memory dict by default, SQLite with HEALTH_STORE=sqlite)
+DATA_STORE = create_store()
+
+def get_entry(data_id: str):
+    entry = DATA_STORE.get(data_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Data ID not found")
+    return entry
+
+# Encoded GET responses per data_id; every upload gets a new data_id, so
+# cached bodies never go stale (a replaced entry would need invalidate())
+RESPONSE_CACHE = ResponseCache()
+
+def cached_json(data_id: str, key: tuple, build) -> Response:
+    """Serves the body of build() encoded once per (data_id, key)"""
+    return Response(content=RESPONSE_CACHE.get_or_encode(data_id, key, build), media_type="application/json")
+
+# Optional Parquet archive for timeseries (HEALTH_ARCHIVE_DIR, needs pyarrow)
+ARCHIVE = create_archive()
+
+def read_timeseries(data_id: str, entry: dict, metric: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None):
+    """Timeseries of an upload, from the archive when it was archived"""
+    if entry.get("archived"):
+        # Entries archived before the file list was recorded are found by name
+        return ARCHIVE.read_timeseries(data_id=data_id, metric=metric, start=start, end=end,
+                                       paths=entry.get("archive_files"))
+    return Timeseries.coerce(entry["processed"]["timeseries"]).filter(metric=metric, start=start, end=end)
+
+# Upload digest -> data_id, so byte-identical re-uploads reuse the stored result
+UPLOAD_CACHE = LRUCache(maxsize=UPLOAD_CACHE_SIZE)
+
+def check_chart_params(method: str, fmt: str):
+    if method not in METHODS:
+        raise HTTPException(status_code=400, detail=f"method must be one of {list(METHODS)}")
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {list(FORMATS)}")
+
+def check_dates(start: Optional[str], end: Optional[str]):
+    for name, value in (("start", start), ("end", end)):
+        if value is None:
+            continue
+        try:
+            parse_day(value)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"{name} must be a date (YYYY-MM-DD)")
+
+def chart_timeseries(data_id: str, entry: dict, metric, start, end, max_points, method, fmt="records"):
+    """Timeseries for charts: filtered, downsampled to max_points per series, as records or columns"""
+    timeseries = read_timeseries(data_id, entry, metric=metric, start=start, end=end)
+    if max_points is not None:
+        timeseries = downsample_timeseries(timeseries, max_points, method=method)
+    return timeseries.to_json(fmt)
 
 @app.post("/upload", response_model=UploadResponse)
 async def upload_csv(file: UploadFile = File(...)):
     try:
-        # Read CSV
-        df = pd.read_csv(file.file)
+        # Read and process CSV in bounded chunks, hashing it in the same read
+        results, meta = await EXECUTOR.run_upload(ingest_csv, file.file)
         
-        # Process
-        results = get_trends_and_insights(df)
+        # Byte-identical re-uploads return the entry stored the first time
+        cached_id = UPLOAD_CACHE.get(meta["digest"])
+        cached = DATA_STORE.get(cached_id) if cached_id is not None else None
+        if cached is not None:
+            return {
+                "status": "ok",
+                "data_id": cached_id,
+                "summary": cached["processed"]["summary"]
+            }
         
         # Generate ID and store
         data_id = str(uuid.uuid4())
         
         # Extract user_id if possible, else default
-        user_id = "unknown"
-        if 'user_id' in df.columns:
-            user_id = str(df['user_id'].iloc[0])
+        user_id = meta["first_user_id"] or "unknown"
             
         stored_data = {
             "user_id": user_id,
             "raw_filename": file.filename,
             "processed": results
         }
-        DATA_STORE[data_id] = stored_data
+        if ARCHIVE is not None:
+            # Keep the timeseries in the columnar archive instead of the entry
+            # (and out of the store's daily rows, see get_user_metrics)
+            stored_data["archive_files"] = await EXECUTOR.run(ARCHIVE.write, data_id, results["timeseries"])
+            stored_data["processed"] = {key: value for key, value in results.items() if key != "timeseries"}
+            stored_data["archived"] = True
+        # Writes run in the thread pool too, so a large upload never blocks the event loop
+        await EXECUTOR.run(DATA_STORE.put, data_id, stored_data, stored_data["processed"])
+        UPLOAD_CACHE.put(meta["digest"], data_id)
         
         return {
             "status": "ok",
@@ -50,39 +128,72 @@ async def upload_csv(file: UploadFile = File(...)):
             "summary": results["summary"]
         }
         
+    except TaskTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/data/{data_id}/summary")
-async def get_summary(data_id: str):
-    if data_id not in DATA_STORE:
-        raise HTTPException(status_code=404, detail="Data ID not found")
-    
-    data = DATA_STORE[data_id]
-    processed = data["processed"]
+async def get_summary(data_id: str, metric: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                      max_points: Optional[int] = Query(None, ge=3), method: str = "lttb",
+                      fmt: str = Query("records", alias="format")):
+    check_chart_params(method, fmt)
+    check_dates(start, end)
+
+    def build():
+        data = get_entry(data_id)
+        processed = data["processed"]
+        return {
+            "user_id": data["user_id"],
+            "summary": processed["summary"],
+            "trends": processed["trends"],
+            "anomalies": processed["anomalies"],
+            "timeseries": chart_timeseries(data_id, data, metric, start, end, max_points, method, fmt),
+            "data_id": data_id
+        }
     
-    return {
-        "user_id": data["user_id"],
-        "summary": processed["summary"],
-        "trends": processed["trends"],
-        "anomalies": processed["anomalies"],
-        "timeseries": processed["timeseries"],
-        "data_id": data_id
-    }
+    return cached_json(data_id, ("summary", metric, start, end, max_points, method, fmt), build)
 
 @app.get("/data/{data_id}/trends")
-async def get_trends(data_id: str):
-    if data_id not in DATA_STORE:
-        raise HTTPException(status_code=404, detail="Data ID not found")
-        
-    return DATA_STORE[data_id]["processed"]["timeseries"]
+async def get_trends(data_id: str, metric: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+                     max_points: Optional[int] = Query(None, ge=3), method: str = "lttb",
+                     fmt: str = Query("records", alias="format")):
+    """
+    Daily values, optionally downsampled to max_points per series ('lttb' or
+    'minmax'). format=columnar returns {"user_id", "day", "metric", "value"}
+    arrays instead of one record per point.
+    """
+    check_chart_params(method, fmt)
+    check_dates(start, end)
+    return cached_json(
+        data_id, ("trends", metric, start, end, max_points, method, fmt),
+        lambda: chart_timeseries(data_id, get_entry(data_id), metric, start, end, max_points, method, fmt)
+    )
 
 @app.get("/data/{data_id}/anomalies")
 async def get_anomalies(data_id: str):
-    if data_id not in DATA_STORE:
-        raise HTTPException(status_code=404, detail="Data ID not found")
-        
-    return DATA_STORE[data_id]["processed"]["anomalies"]
+    return cached_json(data_id, ("anomalies",), lambda: get_entry(data_id)["processed"]["anomalies"])
+
+@app.get("/users/{user_id}/metrics")
+async def get_user_metrics(user_id: str, metric: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None):
+    """Daily values for a user across all uploads, optionally by metric and date range"""
+    check_dates(start, end)
+    rows = DATA_STORE.query_daily(user_id, metric=metric, start=start, end=end)
+    if ARCHIVE is not None:
+        # Archived uploads keep their daily values only in the archive
+        rows.extend(ARCHIVE.read_records(user_id=user_id, metric=metric, start=start, end=end))
+    return rows
+
+@app.get("/users/{user_id}/anomalies")
+async def get_user_anomalies(user_id: str, metric: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None):
+    """Anomalies for a user across all uploads, optionally by metric and date range"""
+    check_dates(start, end)
+    return DATA_STORE.query_anomalies(user_id, metric=metric, start=start, end=end)
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters of the re-upload and response caches"""
+    return {"uploads": UPLOAD_CACHE.stats(), "responses": RESPONSE_CACHE.stats()}
 
 @app.get("/health")
 async def health_check():
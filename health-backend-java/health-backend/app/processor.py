@@ -1,6 +1,15 @@
 import pandas as pd
 import numpy as np
 
+try:
+    from .anomaly import AnomalyColumns, RollingAnomalyDetector, SeriesMatrix
+    from .rules import RuleSet, get_default_rules
+    from .timeseries import Timeseries
+except ImportError:  # imported as a top-level module by integrated_main
+    from anomaly import AnomalyColumns, RollingAnomalyDetector, SeriesMatrix
+    from rules import RuleSet, get_default_rules
+    from timeseries import Timeseries
+
 REQUIRED_COLUMNS = {'user_id', 'date', 'metric', 'value'}
 
 def validate_schema(df: pd.DataFrame):
@@ -18,17 +27,17 @@ def validate_schema(df: pd.DataFrame):
         if df['value'].isna().any():
              raise ValueError("Column 'value' contains non-numeric data")
 
-def normalize(df: pd.DataFrame) -> pd.DataFrame:
+def normalize(df: pd.DataFrame, date_format=None) -> pd.DataFrame:
     """
     Normalizes the dataframe:
-    - Converts date to datetime
+    - Converts date to datetime (with `date_format` when given)
     - Standardizes metric names
     """
     df = df.copy()
     
     # Parse dates
     # Try to infer format, handle errors
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+    df['date'] = pd.to_datetime(df['date'], format=date_format, errors='coerce')
     df = df.dropna(subset=['date'])
     
     # Normalize metric names (lowercase, strip)
@@ -44,152 +53,214 @@ def normalize(df: pd.DataFrame) -> pd.DataFrame:
 
 def aggregate_per_day(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Aggregates data per day and metric.
+    Aggregates data per user, day and metric.
     """
     # First, ensure we are working with just dates for grouping
     df['day'] = df['date'].dt.date
     
     # Since we're converting from wide format, we already have one value per day per metric
-    # Just group by day and metric and take the first value (should be only one anyway)
-    result = df.groupby(['day', 'metric'])['value'].first().reset_index()
+    # Just group by user, day and metric and take the first value (should be only one anyway)
+    result = df.groupby(['user_id', 'day', 'metric'])['value'].first().reset_index()
     
     return result
 
-def detect_anomalies(series: pd.Series, window=7, k=3):
+SERIES_KEYS = ['user_id', 'metric']
+
+def compute_series_metrics(daily_df: pd.DataFrame, summary_days=7) -> pd.DataFrame:
     """
-    Detects anomalies using rolling mean and std.
+    Computes the summary average and trend inputs for every (user_id, metric)
+    series in a single grouped pass.
+
+    Returns a frame indexed by (user_id, metric) with columns count, avg_7d,
+    recent, prev and change_percent (NaN where no trend can be computed).
     """
-    rolling_mean = series.rolling(window, min_periods=1).mean()
-    rolling_std = series.rolling(window, min_periods=1).std().fillna(0.0)
-    
-    # Avoid division by zero
-    rolling_std = rolling_std.replace(0, 1e-9)
-    
-    z = (series - rolling_mean).abs() / rolling_std
-    
-    anomalies = z[z > k]
-    
-    results = []
-    for idx in anomalies.index:
-        results.append({
-            "date": str(idx),
-            "value": float(series.loc[idx]),
-            "z_score": float(z.loc[idx]),
-            "reason": f"Deviation > {k} sigma (val={series.loc[idx]:.1f}, mean={rolling_mean.loc[idx]:.1f})"
-        })
-        
-    # Domain specific rules fallback
-    # e.g. if sample size is small, or just absolute thresholds
-    # We can add those here if needed, but z-score is good for now.
-    
-    return results
+    ordered = daily_df.sort_values(SERIES_KEYS + ['day'], kind='mergesort')
+    values = ordered['value']
+
+    # Position of each day counted from the end of its series: 0 is the latest day
+    pos = ordered.groupby(SERIES_KEYS, sort=False).cumcount(ascending=False)
+    ordered = ordered.assign(
+        last_n=values.where(pos < summary_days),
+        recent=values.where(pos < 3),
+        prev=values.where((pos >= 3) & (pos < 6)),
+    )
+
+    stats = ordered.groupby(SERIES_KEYS, sort=True).agg(
+        count=('value', 'size'),
+        first=('value', 'first'),
+        last=('value', 'last'),
+        avg_7d=('last_n', 'mean'),
+        recent_3=('recent', 'mean'),
+        prev_3=('prev', 'mean'),
+    )
+
+    # Longer series compare the last 3 days with the 3 before; shorter
+    # series compare the last day with the first.
+    long_series = stats['count'] >= 6
+    stats['recent'] = stats['recent_3'].where(long_series, stats['last'])
+    stats['prev'] = stats['prev_3'].where(long_series, stats['first'])
 
-def convert_wide_to_long(df: pd.DataFrame) -> pd.DataFrame:
+    has_trend = (stats['count'] >= 2) & (stats['prev'] > 0)
+    change = (stats['recent'] - stats['prev']) / stats['prev'] * 100
+    stats['change_percent'] = change.where(has_trend)
+
+    return stats[['count', 'avg_7d', 'recent', 'prev', 'change_percent']]
+
+def detect_series_anomalies(daily_df: pd.DataFrame, window=7, k=3, method='zscore') -> AnomalyColumns:
     """
-    Convert wide format CSV to long format expected by processor
+    Rolling anomalies for every (user_id, metric) series at once, returned
+    as columnar arrays.
     """
-    records = []
-    for _, row in df.iterrows():
-        date = row['date']
-        records.extend([
-            {'user_id': 'user1', 'date': date, 'metric': 'heart_rate', 'value': float(row['heart_rate'])},
-            {'user_id': 'user1', 'date': date, 'metric': 'steps', 'value': float(row['steps'])},
-            {'user_id': 'user1', 'date': date, 'metric': 'sleep', 'value': float(row['sleep_hours'])},
-            {'user_id': 'user1', 'date': date, 'metric': 'water', 'value': float(row['water_liters'])},
-            {'user_id': 'user1', 'date': date, 'metric': 'calories', 'value': float(row['calories_burned'])}
-        ])
-    return pd.DataFrame(records)
+    detector = RollingAnomalyDetector(window=window, k=k, method=method)
+    return detector.detect(SeriesMatrix.from_daily(daily_df))
+
+def trend_direction(change: float) -> str:
+    return "up" if change > 5 else "down" if change < -5 else "stable"
 
-def get_trends_and_insights(df: pd.DataFrame):
+def detect_anomalies(series: pd.Series, window=7, k=3, method='zscore'):
     """
-    Main processing function to generate summary, trends, and anomalies.
+    Detects anomalies in a single series using rolling mean and std
+    (or rolling median/MAD, EWMA - see RollingAnomalyDetector).
+    """
+    detector = RollingAnomalyDetector(window=window, k=k, method=method)
+    return detector.detect(SeriesMatrix.from_series(series)).to_records()
+
+# Wide-format column -> long-format metric name. Device exports name the same
+# metric differently, so several columns may map onto one metric.
+WIDE_COLUMN_MAP = {
+    'heart_rate': 'heart_rate',
+    'heart_rate_bpm': 'heart_rate',
+    'steps': 'steps',
+    'sleep_hours': 'sleep',
+    'water_liters': 'water',
+    'hydration_liters': 'water',
+    'calories_burned': 'calories',
+}
+
+DEFAULT_USER_ID = 'user1'
+
+def is_wide_format(df: pd.DataFrame, column_map=None) -> bool:
+    """
+    True if the dataframe has one column per metric instead of a 'metric' column.
+    """
+    column_map = WIDE_COLUMN_MAP if column_map is None else column_map
+    return 'metric' not in df.columns and any(col in df.columns for col in column_map)
+
+def convert_wide_to_long(df: pd.DataFrame, column_map=None, default_user_id=DEFAULT_USER_ID, start_date=None) -> pd.DataFrame:
+    """
+    Convert wide format CSV to long format expected by processor.
+
+    Every column of `column_map` present in the frame becomes one metric, so
+    files may carry any subset of metrics. The real user_id is kept when the
+    column exists. Files without a date column are read as consecutive days
+    starting at `start_date` (default: ending today). Empty cells are dropped.
+    """
+    column_map = WIDE_COLUMN_MAP if column_map is None else column_map
+    value_cols = [col for col in column_map if col in df.columns]
+    if not value_cols:
+        raise ValueError(f"No metric columns found, expected any of: {sorted(column_map)}")
+
+    n_rows = len(df)
+    n_metrics = len(value_cols)
+
+    if 'user_id' in df.columns:
+        user_ids = df['user_id'].to_numpy()
+    else:
+        user_ids = np.full(n_rows, default_user_id, dtype=object)
+
+    if 'date' in df.columns:
+        dates = df['date'].to_numpy()
+    else:
+        if start_date is None:
+            start_date = pd.Timestamp.today().normalize() - pd.Timedelta(days=max(n_rows - 1, 0))
+        dates = pd.date_range(start_date, periods=n_rows, freq='D').to_numpy()
+
+    # Row-major stacking of the (rows x metrics) block: same order as the old
+    # per-row loop, one record per (row, metric).
+    values = df[value_cols].to_numpy(dtype=float).ravel()
+    metrics = np.array([column_map[col] for col in value_cols], dtype=object)
+
+    long_df = pd.DataFrame({
+        'user_id': np.repeat(user_ids, n_metrics),
+        'date': np.repeat(dates, n_metrics),
+        'metric': np.tile(metrics, n_rows),
+        'value': values,
+    })
+    return long_df[~np.isnan(values)].reset_index(drop=True)
+
+def prepare_long(df: pd.DataFrame, start_date=None, date_format=None) -> pd.DataFrame:
+    """
+    Brings a raw upload (wide or long) into the validated, normalized long format.
     """
     # Handle wide format CSV
-    if 'heart_rate' in df.columns and 'steps' in df.columns:
-        df = convert_wide_to_long(df)
+    if is_wide_format(df):
+        df = convert_wide_to_long(df, start_date=start_date)
     
     validate_schema(df)
-    df = normalize(df)
+    return normalize(df, date_format=date_format)
+
+def get_trends_and_insights(df: pd.DataFrame, rules: RuleSet = None):
+    """
+    Main processing function to generate summary, trends, and anomalies.
+    `rules` defaults to the domain rule table (see rules.get_default_rules).
+    """
+    df = prepare_long(df)
     
     # Calculate user count before aggregation
     unique_users = df['user_id'].nunique()
     
     daily_df = aggregate_per_day(df)
     
+    return analyze_daily(daily_df, unique_users, rules=rules)
+
+def analyze_daily(daily_df: pd.DataFrame, unique_users: int, rules: RuleSet = None):
+    """
+    Summary, trends, anomalies and timeseries from the per-day frame
+    (user_id, day, metric, value) produced by aggregate_per_day.
+    """
+    # One grouped pass over every (user_id, metric) series
+    series_stats = compute_series_metrics(daily_df)
+    
     summary = {
         "total_users": unique_users
     }
+    users = {}
     trends = []
-    anomalies = []
     
-    # Process each metric
-    for metric in daily_df['metric'].unique():
-        metric_data = daily_df[daily_df['metric'] == metric].set_index('day')['value'].sort_index()
-        
-        # 1. Summary (Last 7 days avg)
-        last_7 = metric_data.tail(7)
-        if not last_7.empty:
-            avg_7d = last_7.mean()
-            summary[f"{metric}_avg_7d"] = round(avg_7d, 2)
+    # 1. Summary (Last 7 days avg), averaged across users for the top-level view
+    for metric, avg_7d in series_stats.groupby(level='metric')['avg_7d'].mean().items():
+        summary[f"{metric}_avg_7d"] = round(float(avg_7d), 2)
+    
+    for (user_id, metric), row in series_stats.iterrows():
+        user = users.setdefault(str(user_id), {"summary": {}, "trends": [], "anomalies": []})
+        user["summary"][f"{metric}_avg_7d"] = round(float(row['avg_7d']), 2)
         
-        # 2. Anomalies
-        metric_anomalies = detect_anomalies(metric_data)
-        for a in metric_anomalies:
-            a['metric'] = metric
-            anomalies.append(a)
-            
-        # 3. Trends (Compare first vs last day, or recent vs previous)
-        if len(metric_data) >= 2:
-            if len(metric_data) >= 6:
-                # Use original logic for longer datasets
-                recent = metric_data.iloc[-3:].mean()
-                prev = metric_data.iloc[-6:-3].mean()
-            else:
-                # For shorter datasets, compare last vs first
-                recent = metric_data.iloc[-1]
-                prev = metric_data.iloc[0]
-            
-            if prev > 0:
-                change = ((recent - prev) / prev) * 100
-                direction = "up" if change > 5 else "down" if change < -5 else "stable"
-                trends.append({
-                    "metric": metric,
-                    "trend": direction,
-                    "change_percent": round(change, 1)
-                })
-    
-    # Domain specific checks (as requested)
-    # Resting HR > 100
-    hr_data = daily_df[daily_df['metric'] == 'heart_rate']
-    for _, row in hr_data.iterrows():
-        if row['value'] > 100:
-            anomalies.append({
-                "date": str(row['day']),
-                "metric": "heart_rate",
-                "value": row['value'],
-                "reason": "Urgent: Resting HR > 100"
-            })
-            
-    # Sleep < 4 hours
-    sleep_data = daily_df[daily_df['metric'] == 'sleep']
-    for _, row in sleep_data.iterrows():
-        if row['value'] < 4:
-             anomalies.append({
-                "date": str(row['day']),
-                "metric": "sleep",
-                "value": row['value'],
-                "reason": "Fatigue warning: Sleep < 4h"
-            })
-
-    # Ensure all values are properly converted to standard Python types
-    timeseries_data = daily_df.to_dict(orient='records')
-    for record in timeseries_data:
-        record['value'] = float(record['value'])
-        record['day'] = str(record['day'])
+        # 2. Trends (recent vs previous days)
+        if not np.isnan(row['change_percent']):
+            trend = {
+                "user_id": str(user_id),
+                "metric": metric,
+                "trend": trend_direction(row['change_percent']),
+                "change_percent": round(float(row['change_percent']), 1)
+            }
+            trends.append(trend)
+            user["trends"].append(trend)
+    
+    # 3. Anomalies
+    anomalies = detect_series_anomalies(daily_df).to_records()
+    
+    # Domain specific checks (Resting HR > 100, Sleep < 4h, ...) from the rule table
+    rules = get_default_rules() if rules is None else rules
+    anomalies.extend(rules.apply(daily_df))
+
+    # Each anomaly is also listed under its user
+    for anomaly in anomalies:
+        users[anomaly['user_id']]["anomalies"].append(anomaly)
     
     return {
         "summary": summary,
         "trends": trends,
         "anomalies": anomalies,
-        "timeseries": timeseries_data # For frontend graphs
+        "timeseries": Timeseries.from_daily(daily_df), # For frontend graphs, columnar
+        "users": users # Per-user summary, trends and anomalies
     }
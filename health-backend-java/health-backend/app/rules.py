@@ -0,0 +1,162 @@
+import csv
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+COMPARATORS = ('>', '>=', '<', '<=')
+RULE_FIELDS = ('metric', 'comparator', 'threshold', 'severity', 'message')
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'domain_rules.json')
+
+
+def _validate_rule(rule: dict) -> dict:
+    missing = [field for field in RULE_FIELDS if rule.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f"Rule {rule} is missing fields: {missing}")
+    if rule['comparator'] not in COMPARATORS:
+        raise ValueError(f"Rule {rule} has unknown comparator, expected one of {COMPARATORS}")
+    return {
+        'metric': str(rule['metric']).lower().strip(),
+        'comparator': rule['comparator'],
+        'threshold': float(rule['threshold']),
+        'severity': str(rule['severity']),
+        'message': str(rule['message']),
+    }
+
+
+class RuleSet:
+    """
+    Table of (metric, comparator, threshold, severity, message) domain rules,
+    evaluated as vectorized masks over a daily (user_id, day, metric, value)
+    frame.
+
+    Rules sharing a metric and comparator are compiled into one sorted
+    threshold array, so each value is matched against all of them with a
+    single binary search. Evaluation cost grows with rows and matches, not
+    with the number of rules.
+
+    Message templates may use {metric}, {value}, {threshold} and {user_id}.
+    """
+
+    def __init__(self, rules: list):
+        self.rules = [_validate_rule(rule) for rule in rules]
+        self._compiled = self._compile()
+
+    @classmethod
+    def from_file(cls, path: str) -> 'RuleSet':
+        """Load rules from a JSON list of objects or a CSV with RULE_FIELDS columns."""
+        if path.endswith('.csv'):
+            with open(path, newline='') as f:
+                return cls(list(csv.DictReader(f)))
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def __len__(self):
+        return len(self.rules)
+
+    def fingerprint(self) -> str:
+        """Short hash of the rule definitions, for cache keys."""
+        return hashlib.sha256(json.dumps(self.rules, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _compile(self) -> dict:
+        """metric -> [(comparator, sorted thresholds, rule ids in that order)]"""
+        grouped = {}
+        for rule_id, rule in enumerate(self.rules):
+            grouped.setdefault((rule['metric'], rule['comparator']), []).append(rule_id)
+
+        compiled = {}
+        for (metric, comparator), rule_ids in grouped.items():
+            rule_ids = np.array(rule_ids)
+            thresholds = np.array([self.rules[i]['threshold'] for i in rule_ids])
+            order = np.argsort(thresholds, kind='stable')
+            compiled.setdefault(metric, []).append((comparator, thresholds[order], rule_ids[order]))
+        return compiled
+
+    def evaluate(self, daily_df: pd.DataFrame):
+        """
+        Returns (row_positions, rule_ids): one entry per (row, rule) match,
+        ordered by rule then by row.
+        """
+        values = daily_df['value'].to_numpy(dtype=float)
+        row_parts, rule_parts = [], []
+
+        for metric, positions in daily_df.groupby('metric', sort=False).indices.items():
+            groups = self._compiled.get(metric)
+            if not groups:
+                continue
+            metric_values = values[positions]
+            valid = ~np.isnan(metric_values)
+
+            for comparator, thresholds, rule_ids in groups:
+                # Matching rules form a contiguous [start, stop) range of the
+                # sorted thresholds
+                if comparator == '>':
+                    start = np.zeros(len(metric_values), dtype=int)
+                    stop = np.searchsorted(thresholds, metric_values, side='left')
+                elif comparator == '>=':
+                    start = np.zeros(len(metric_values), dtype=int)
+                    stop = np.searchsorted(thresholds, metric_values, side='right')
+                elif comparator == '<':
+                    start = np.searchsorted(thresholds, metric_values, side='right')
+                    stop = np.full(len(metric_values), len(thresholds))
+                else:
+                    start = np.searchsorted(thresholds, metric_values, side='left')
+                    stop = np.full(len(metric_values), len(thresholds))
+
+                counts = np.where(valid, stop - start, 0)
+                total = int(counts.sum())
+                if total == 0:
+                    continue
+                offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+                row_parts.append(np.repeat(positions, counts))
+                rule_parts.append(rule_ids[np.repeat(start, counts) + offsets])
+
+        if not row_parts:
+            return np.empty(0, dtype=int), np.empty(0, dtype=int)
+
+        rows = np.concatenate(row_parts)
+        rule_ids = np.concatenate(rule_parts)
+        order = np.lexsort((rows, rule_ids))
+        return rows[order], rule_ids[order]
+
+    def to_records(self, daily_df: pd.DataFrame, rows: np.ndarray, rule_ids: np.ndarray) -> list:
+        """Build anomaly dicts for the matches returned by `evaluate`."""
+        users = daily_df['user_id'].to_numpy()[rows]
+        days = daily_df['day'].to_numpy()[rows]
+        values = daily_df['value'].to_numpy(dtype=float)[rows]
+
+        records = []
+        for user_id, day, value, rule_id in zip(users, days, values, rule_ids):
+            rule = self.rules[rule_id]
+            records.append({
+                "user_id": str(user_id),
+                "date": str(day),
+                "metric": rule['metric'],
+                "value": float(value),
+                "severity": rule['severity'],
+                "reason": rule['message'].format(
+                    metric=rule['metric'],
+                    value=value,
+                    threshold=rule['threshold'],
+                    user_id=user_id,
+                ),
+            })
+        return records
+
+    def apply(self, daily_df: pd.DataFrame) -> list:
+        rows, rule_ids = self.evaluate(daily_df)
+        return self.to_records(daily_df, rows, rule_ids)
+
+
+_default_rules = None
+
+
+def get_default_rules() -> RuleSet:
+    """Rules from $HEALTH_RULES_FILE (or the bundled domain_rules.json), loaded once."""
+    global _default_rules
+    if _default_rules is None:
+        _default_rules = RuleSet.from_file(os.environ.get('HEALTH_RULES_FILE', DEFAULT_RULES_PATH))
+    return _default_rules
@@ -0,0 +1,51 @@
+import json
+import math
+from datetime import date, datetime
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # optional dependency, the standard library encoder is used without it
+    orjson = None
+
+try:
+    from .timeseries import Timeseries
+except ImportError:  # imported as a top-level module by integrated_main
+    from timeseries import Timeseries
+
+
+def json_default(value):
+    if isinstance(value, Timeseries):
+        # Responses keep the record format unless an endpoint asks for columns
+        return value.to_records()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _finite(value):
+    """value with NaN and infinite floats replaced by None, as orjson writes them."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: _finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(item) for item in value]
+    return value
+
+
+def encode_json(value) -> bytes:
+    """
+    Compact JSON bytes; NumPy arrays and scalars are encoded natively by
+    orjson. NaN and infinities become null with either encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(value, default=json_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        _finite(value), default=lambda item: _finite(json_default(item)), separators=(',', ':'), allow_nan=False
+    ).encode()
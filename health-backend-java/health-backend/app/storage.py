@@ -0,0 +1,490 @@
+import bisect
+from abc import ABC, abstractmethod
+import itertools
+import json
+import os
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from datetime import datetime
+
+try:
+    from .cache import LRUCache
+    from .serialize import json_default
+    from .timeseries import STORED_KEY, Timeseries
+except ImportError:  # imported as a top-level module by integrated_main
+    from cache import LRUCache
+    from serialize import json_default
+    from timeseries import STORED_KEY, Timeseries
+
+# 'memory' keeps entries in a process-local dict, 'sqlite' persists them
+STORE_BACKEND = os.environ.get('HEALTH_STORE', 'memory')
+STORE_DB_PATH = os.environ.get('HEALTH_DB_PATH')
+STORE_CACHE_SIZE = int(os.environ.get('HEALTH_STORE_CACHE_SIZE', 256))
+
+
+def _store_default(value):
+    if isinstance(value, Timeseries):
+        return value.to_dict()
+    return json_default(value)
+
+
+def _store_object_hook(value: dict):
+    return Timeseries.from_dict(value) if STORED_KEY in value else value
+
+
+def dumps(value) -> str:
+    """Entry payload JSON; timeseries keep their columnar buffers."""
+    return json.dumps(value, default=_store_default)
+
+
+def loads(payload: str):
+    return json.loads(payload, object_hook=_store_object_hook)
+
+
+def result_rows(results: dict) -> dict:
+    """
+    Flattens processor results into (user_id, metric, day) keyed rows:
+    {'daily': [...], 'anomalies': [...], 'trends': [...]}. Trends are dated
+    with the last day of their series.
+    """
+    timeseries = Timeseries.coerce(results.get('timeseries'))
+    daily = list(zip(
+        timeseries.user_ids().tolist(), timeseries.metric_names().tolist(),
+        timeseries.day_strings().tolist(), timeseries.float_values().tolist(),
+    ))
+    last_day = {}
+    for user_id, metric, day, _ in daily:
+        if day > last_day.get((user_id, metric), ''):
+            last_day[(user_id, metric)] = day
+
+    anomalies = [
+        (str(a.get('user_id', '')), a['metric'], str(a['date']), float(a['value']),
+         a.get('z_score'), a.get('severity'), a.get('reason'))
+        for a in results.get('anomalies', [])
+    ]
+    trends = [
+        (str(t.get('user_id', '')), t['metric'], last_day.get((str(t.get('user_id', '')), t['metric'])),
+         t['trend'], float(t['change_percent']))
+        for t in results.get('trends', [])
+    ]
+    return {'daily': daily, 'anomalies': anomalies, 'trends': trends}
+
+
+def entry_timestamp(entry: dict) -> str:
+    return entry.get('timestamp') or datetime.now().isoformat()
+
+
+class DataStore(MutableMapping, ABC):
+    """
+    Storage for processed uploads, keyed by data_id.
+
+    Behaves like the dict it replaces; `put` additionally indexes the
+    daily metrics, anomalies and trends of an upload so they can be queried
+    by user, metric and date range. Entries are also kept ordered by their
+    ISO `timestamp`, globally and per `user_id`, so the latest entries and
+    time ranges are found without scanning the store. Backends implement
+    the abstract methods below plus the mapping's __getitem__,
+    __delitem__, __iter__ and __len__.
+
+    Entries handed out are the stored (or cached) dicts themselves and are
+    read-only: replace an entry with `put` instead of mutating it.
+    """
+
+    @abstractmethod
+    def put(self, data_id: str, entry: dict, results: dict = None):
+        """Stores an entry and indexes the rows of its processor results."""
+
+    def put_many(self, items):
+        """Stores (data_id, entry, results) tuples; backends may write them in one transaction."""
+        for data_id, entry, results in items:
+            self.put(data_id, entry, results=results)
+
+    def latest(self, user_id: str = None):
+        """Most recent entry (optionally of one user), or None."""
+        entries = self.last_n(1, user_id=user_id)
+        return entries[0] if entries else None
+
+    @abstractmethod
+    def earliest_id(self, user_id: str = None):
+        """data_id of the oldest entry (optionally of one user), or None."""
+
+    @abstractmethod
+    def last_n_ids(self, n: int, user_id: str = None) -> list:
+        """data_ids of the `n` most recent entries, oldest first."""
+
+    @abstractmethod
+    def between_ids(self, start: str = None, end: str = None, user_id: str = None) -> list:
+        """data_ids of the entries with start <= timestamp <= end, oldest first."""
+
+    def earliest(self, user_id: str = None):
+        """Oldest entry (optionally of one user), or None."""
+        data_id = self.earliest_id(user_id)
+        return self[data_id] if data_id is not None else None
+
+    def last_n(self, n: int, user_id: str = None) -> list:
+        """The `n` most recent entries, oldest first."""
+        return [self[data_id] for data_id in self.last_n_ids(n, user_id)]
+
+    def between(self, start: str = None, end: str = None, user_id: str = None) -> list:
+        """Entries with start <= timestamp <= end, oldest first."""
+        return [self[data_id] for data_id in self.between_ids(start, end, user_id)]
+
+    def __setitem__(self, data_id, entry):
+        self.put(data_id, entry)
+
+    @abstractmethod
+    def query_daily(self, user_id: str, metric: str = None, start: str = None, end: str = None) -> list:
+        """Daily (user_id, metric, day, value) rows of a user."""
+
+    @abstractmethod
+    def query_anomalies(self, user_id: str, metric: str = None, start: str = None, end: str = None) -> list:
+        """Anomalies of a user."""
+
+
+def _in_range(row: dict, user_id, metric, start, end, day_key) -> bool:
+    day = str(row[day_key])
+    return (
+        str(row.get('user_id', '')) == str(user_id)
+        and (metric is None or row['metric'] == metric)
+        and (start is None or day >= start)
+        and (end is None or day <= end)
+    )
+
+
+class MemoryStore(DataStore):
+    """The original process-local dict; lost on restart."""
+
+    def __init__(self):
+        # Uploads are stored from executor threads
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._results = {}
+        # Sorted (timestamp, seq, data_id) keys, globally and per user
+        self._timeline = []
+        self._user_timelines = {}
+        self._keys = {}
+        self._seq = itertools.count()
+
+    def put(self, data_id, entry, results=None):
+        with self._lock:
+            if data_id in self._entries:
+                self._unindex(data_id)
+            self._entries[data_id] = entry
+            self._results[data_id] = results or {}
+
+            user_id = entry.get('user_id')
+            key = (entry_timestamp(entry), next(self._seq), data_id)
+            self._keys[data_id] = (key, user_id)
+            # Timestamps normally arrive in order, making this an append
+            bisect.insort(self._timeline, key)
+            bisect.insort(self._user_timelines.setdefault(user_id, []), key)
+
+    def _unindex(self, data_id):
+        key, user_id = self._keys.pop(data_id)
+        for timeline in (self._timeline, self._user_timelines[user_id]):
+            del timeline[bisect.bisect_left(timeline, key)]
+
+    def __getitem__(self, data_id):
+        return self._entries[data_id]
+
+    def __delitem__(self, data_id):
+        with self._lock:
+            del self._entries[data_id]
+            self._results.pop(data_id, None)
+            self._unindex(data_id)
+
+    def _timeline_for(self, user_id):
+        return self._timeline if user_id is None else self._user_timelines.get(user_id, [])
+
+    def earliest_id(self, user_id=None):
+        with self._lock:
+            timeline = self._timeline_for(user_id)
+            return timeline[0][2] if timeline else None
+
+    def last_n_ids(self, n, user_id=None):
+        with self._lock:
+            timeline = self._timeline_for(user_id)
+            return [key[2] for key in timeline[max(len(timeline) - n, 0):]]
+
+    def between_ids(self, start=None, end=None, user_id=None):
+        with self._lock:
+            timeline = self._timeline_for(user_id)
+            lo = bisect.bisect_left(timeline, (start,)) if start is not None else 0
+            # '\uffff' sorts after any (timestamp, ...) key that starts with `end`
+            hi = bisect.bisect_right(timeline, (end + '\uffff',)) if end is not None else len(timeline)
+            return [key[2] for key in timeline[lo:hi]]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def query_daily(self, user_id, metric=None, start=None, end=None):
+        return [
+            {"user_id": r['user_id'], "metric": r['metric'], "day": r['day'], "value": r['value']}
+            for results in self._results.values()
+            for r in Timeseries.coerce(results.get('timeseries')).filter(user_id, metric, start, end).to_records()
+        ]
+
+    def query_anomalies(self, user_id, metric=None, start=None, end=None):
+        return [
+            a
+            for results in self._results.values()
+            for a in results.get('anomalies', [])
+            if _in_range(a, user_id, metric, start, end, 'date')
+        ]
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    data_id TEXT PRIMARY KEY,
+    user_id TEXT,
+    timestamp TEXT,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries (timestamp);
+CREATE INDEX IF NOT EXISTS idx_entries_user_timestamp ON entries (user_id, timestamp);
+CREATE TABLE IF NOT EXISTS daily_metrics (
+    data_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    day TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_daily_user_metric_day ON daily_metrics (user_id, metric, day);
+CREATE INDEX IF NOT EXISTS idx_daily_data_id ON daily_metrics (data_id);
+CREATE TABLE IF NOT EXISTS anomalies (
+    data_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    day TEXT NOT NULL,
+    value REAL NOT NULL,
+    z_score REAL,
+    severity TEXT,
+    reason TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_anomalies_user_metric_day ON anomalies (user_id, metric, day);
+CREATE INDEX IF NOT EXISTS idx_anomalies_data_id ON anomalies (data_id);
+CREATE TABLE IF NOT EXISTS trends (
+    data_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    day TEXT,
+    trend TEXT NOT NULL,
+    change_percent REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_trends_user_metric_day ON trends (user_id, metric, day);
+CREATE INDEX IF NOT EXISTS idx_trends_data_id ON trends (data_id);
+"""
+
+
+class SQLiteStore(DataStore):
+    """
+    SQLite-backed store in WAL mode. Entries are kept as JSON payloads;
+    daily metrics, anomalies and trends go to indexed tables keyed by
+    (user_id, metric, day) and are written with bulk executemany inserts.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def put(self, data_id, entry, results=None):
+        self.put_many([(data_id, entry, results)])
+
+    def put_many(self, items):
+        items = list(items)
+        entries, daily, anomalies, trends = [], [], [], []
+        for data_id, entry, results in items:
+            rows = result_rows(results or {})
+            entries.append((data_id, entry.get('user_id'), entry_timestamp(entry), dumps(entry)))
+            daily.extend((data_id,) + row for row in rows['daily'])
+            anomalies.extend((data_id,) + row for row in rows['anomalies'])
+            trends.extend((data_id,) + row for row in rows['trends'])
+        data_ids = list({data_id for data_id, _, _ in items})
+
+        with self._lock, self._conn:
+            existing = 0
+            for start in range(0, len(data_ids), 500):
+                chunk = data_ids[start:start + 500]
+                existing += self._conn.execute(
+                    f"SELECT COUNT(*) FROM entries WHERE data_id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchone()[0]
+            self._count += len(data_ids) - existing
+            for table in ('daily_metrics', 'anomalies', 'trends'):
+                self._conn.executemany(f"DELETE FROM {table} WHERE data_id = ?", [(data_id,) for data_id in data_ids])
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (data_id, user_id, timestamp, payload) VALUES (?, ?, ?, ?)",
+                entries,
+            )
+            self._conn.executemany(
+                "INSERT INTO daily_metrics (data_id, user_id, metric, day, value) VALUES (?, ?, ?, ?, ?)",
+                daily,
+            )
+            self._conn.executemany(
+                "INSERT INTO anomalies (data_id, user_id, metric, day, value, z_score, severity, reason) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                anomalies,
+            )
+            self._conn.executemany(
+                "INSERT INTO trends (data_id, user_id, metric, day, trend, change_percent) VALUES (?, ?, ?, ?, ?, ?)",
+                trends,
+            )
+
+    def __getitem__(self, data_id):
+        with self._lock:
+            row = self._conn.execute("SELECT payload FROM entries WHERE data_id = ?", (data_id,)).fetchone()
+        if row is None:
+            raise KeyError(data_id)
+        return loads(row[0])
+
+    def __contains__(self, data_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM entries WHERE data_id = ?", (data_id,)).fetchone() is not None
+
+    def __delitem__(self, data_id):
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM entries WHERE data_id = ?", (data_id,)).rowcount
+            for table in ('daily_metrics', 'anomalies', 'trends'):
+                self._conn.execute(f"DELETE FROM {table} WHERE data_id = ?", (data_id,))
+            self._count -= deleted
+        if not deleted:
+            raise KeyError(data_id)
+
+    def __iter__(self):
+        with self._lock:
+            data_ids = [row[0] for row in self._conn.execute("SELECT data_id FROM entries ORDER BY timestamp")]
+        return iter(data_ids)
+
+    def __len__(self):
+        return self._count
+
+    def _ordered_ids(self, sql: str, params: list, user_id) -> list:
+        if user_id is not None:
+            sql = sql.replace("WHERE 1", "WHERE user_id = ?")
+            params = [user_id] + params
+        with self._lock:
+            return [row[0] for row in self._conn.execute(sql, params)]
+
+    def last_n_ids(self, n, user_id=None):
+        ids = self._ordered_ids("SELECT data_id FROM entries WHERE 1 ORDER BY timestamp DESC LIMIT ?", [n], user_id)
+        return ids[::-1]
+
+    def earliest_id(self, user_id=None):
+        ids = self._ordered_ids("SELECT data_id FROM entries WHERE 1 ORDER BY timestamp LIMIT 1", [], user_id)
+        return ids[0] if ids else None
+
+    def between_ids(self, start=None, end=None, user_id=None):
+        sql, params = "SELECT data_id FROM entries WHERE 1", []
+        if start is not None:
+            sql += " AND timestamp >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND timestamp <= ?"
+            params.append(end + '\uffff')
+        return self._ordered_ids(sql + " ORDER BY timestamp", params, user_id)
+
+    def _query(self, sql: str, user_id, metric, start, end) -> list:
+        params = [str(user_id)]
+        if metric is not None:
+            sql += " AND metric = ?"
+            params.append(metric)
+        if start is not None:
+            sql += " AND day >= ?"
+            params.append(start)
+        if end is not None:
+            sql += " AND day <= ?"
+            params.append(end)
+        with self._lock:
+            cursor = self._conn.execute(sql + " ORDER BY metric, day", params)
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def query_daily(self, user_id, metric=None, start=None, end=None):
+        return self._query(
+            "SELECT user_id, metric, day, value FROM daily_metrics WHERE user_id = ?",
+            user_id, metric, start, end,
+        )
+
+    def query_anomalies(self, user_id, metric=None, start=None, end=None):
+        return self._query(
+            "SELECT user_id, metric, day AS date, value, z_score, severity, reason FROM anomalies WHERE user_id = ?",
+            user_id, metric, start, end,
+        )
+
+    def close(self):
+        self._conn.close()
+
+
+class CachedStore(DataStore):
+    """
+    Read-through LRU cache of decoded entries in front of another store.
+    Cached entries are shared between callers, so they must not be mutated.
+    """
+
+    def __init__(self, backend: DataStore, maxsize=STORE_CACHE_SIZE):
+        self.backend = backend
+        self.cache = LRUCache(maxsize=maxsize)
+
+    def put(self, data_id, entry, results=None):
+        self.backend.put(data_id, entry, results=results)
+        self.cache.put(data_id, entry)
+
+    def put_many(self, items):
+        items = list(items)
+        self.backend.put_many(items)
+        for data_id, entry, _ in items:
+            self.cache.put(data_id, entry)
+
+    def __getitem__(self, data_id):
+        entry = self.cache.get(data_id)
+        if entry is None:
+            entry = self.backend[data_id]
+            self.cache.put(data_id, entry)
+        return entry
+
+    def __contains__(self, data_id):
+        return data_id in self.cache or data_id in self.backend
+
+    def __delitem__(self, data_id):
+        self.cache.pop(data_id)
+        del self.backend[data_id]
+
+    def __iter__(self):
+        return iter(self.backend)
+
+    def __len__(self):
+        return len(self.backend)
+
+    # Only the ids come from the backend's index, entries are read through the cache
+    def earliest_id(self, user_id=None):
+        return self.backend.earliest_id(user_id)
+
+    def last_n_ids(self, n, user_id=None):
+        return self.backend.last_n_ids(n, user_id)
+
+    def between_ids(self, start=None, end=None, user_id=None):
+        return self.backend.between_ids(start, end, user_id)
+
+    def query_daily(self, user_id, metric=None, start=None, end=None):
+        return self.backend.query_daily(user_id, metric, start, end)
+
+    def query_anomalies(self, user_id, metric=None, start=None, end=None):
+        return self.backend.query_anomalies(user_id, metric, start, end)
+
+
+def create_store(backend: str = None, path: str = None, default_path: str = 'health_data.db') -> DataStore:
+    """Builds the store selected by HEALTH_STORE / HEALTH_DB_PATH."""
+    backend = backend or STORE_BACKEND
+    if backend == 'memory':
+        return MemoryStore()
+    if backend == 'sqlite':
+        return CachedStore(SQLiteStore(path or STORE_DB_PATH or default_path))
+    raise ValueError(f"Unknown store backend '{backend}', expected 'memory' or 'sqlite'")
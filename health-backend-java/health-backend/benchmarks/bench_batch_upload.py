@@ -0,0 +1,81 @@
+"""
+Benchmark syncing many days through /api/uploadHealthDataBatch against one
+/api/uploadHealthData call per day.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_batch_upload.py
+    python benchmarks/bench_batch_upload.py --days 30 --users 1 10 100 --store sqlite
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from fastapi.testclient import TestClient
+
+import integrated_main
+from incremental import EntryTrends, SeriesStateStore
+from storage import create_store
+
+
+def make_days(n_users: int, n_days: int) -> list:
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(end=pd.Timestamp.today(), periods=n_days).strftime('%Y-%m-%d')
+    return [
+        {
+            'userId': f"u{user}",
+            'steps': int(rng.integers(3000, 14000)),
+            'sleepHours': round(float(rng.normal(7, 1)), 1),
+            'heartRate': int(rng.integers(55, 110)),
+            'calories': int(rng.integers(1600, 2800)),
+            'waterIntake': round(float(rng.normal(2.2, 0.4)), 2),
+            'date': date,
+        }
+        for user in range(n_users)
+        for date in dates
+    ]
+
+
+def reset_state(store_backend: str, directory: str):
+    path = os.path.join(directory, f"bench-{time.perf_counter_ns()}.db")
+    integrated_main.DATA_STORE = create_store(store_backend, path=path)
+    integrated_main.ENTRY_TRENDS = EntryTrends()
+    integrated_main.SERIES_STATE = SeriesStateStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--users', type=int, nargs='+', default=[1, 10, 50])
+    parser.add_argument('--store', choices=['memory', 'sqlite'], default='memory')
+    args = parser.parse_args()
+
+    client = TestClient(integrated_main.app)
+    print(f"{'users':>6} {'days':>6} {'single s':>9} {'batch s':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n_users in args.users:
+            days = make_days(n_users, args.days)
+
+            reset_state(args.store, directory)
+            start = time.perf_counter()
+            for day in days:
+                # The single endpoint has no user field and stores every day for the default user
+                assert client.post('/api/uploadHealthData', json=day).status_code == 200
+            single = time.perf_counter() - start
+
+            reset_state(args.store, directory)
+            start = time.perf_counter()
+            assert client.post('/api/uploadHealthDataBatch', json=days).status_code == 200
+            batch = time.perf_counter() - start
+
+            print(f"{n_users:6d} {len(days):6d} {single:9.3f} {batch:8.3f} {single / batch:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
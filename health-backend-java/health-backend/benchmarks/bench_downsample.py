@@ -0,0 +1,65 @@
+"""
+Benchmark /data/{data_id}/trends response size and latency for a long,
+multi-metric upload: the full timeseries against downsampled responses.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_downsample.py
+    python benchmarks/bench_downsample.py --years 10 --max-points 300 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+METRICS = ['heart_rate', 'steps', 'sleep', 'water', 'calories']
+
+
+def make_csv(years: int) -> bytes:
+    days = pd.date_range('2015-01-01', periods=365 * years).strftime('%Y-%m-%d')
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'user_id': 'u1',
+        'date': np.tile(days, len(METRICS)),
+        'metric': np.repeat(METRICS, len(days)),
+        'value': rng.normal(100, 15, len(days) * len(METRICS)).round(1),
+    }).to_csv(index=False).encode()
+
+
+def timed_get(client, url: str, params: dict, calls: int):
+    start = time.perf_counter()
+    for _ in range(calls):
+        response = client.get(url, params=params)
+    return (time.perf_counter() - start) / calls * 1000, len(response.content), len(response.json())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--max-points', type=int, nargs='+', default=[200, 500, 1000])
+    parser.add_argument('--calls', type=int, default=10)
+    args = parser.parse_args()
+
+    client = TestClient(app)
+    data_id = client.post('/upload', files={'file': ('long.csv', make_csv(args.years), 'text/csv')}).json()['data_id']
+    url = f'/data/{data_id}/trends'
+
+    print(f"{'request':>22} {'points':>8} {'KB':>9} {'ms':>8}")
+    ms, size, points = timed_get(client, url, {}, args.calls)
+    print(f"{'full':>22} {points:8d} {size / 1024:9.1f} {ms:8.1f}")
+    for method in ['lttb', 'minmax']:
+        for max_points in args.max_points:
+            ms, size, points = timed_get(client, url, {'max_points': max_points, 'method': method}, args.calls)
+            print(f"{f'{method} max_points={max_points}':>22} {points:8d} {size / 1024:9.1f} {ms:8.1f}")
+
+
+if __name__ == '__main__':
+    main()
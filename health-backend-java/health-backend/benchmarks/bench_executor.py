@@ -0,0 +1,84 @@
+"""
+Benchmark /health latency while a large CSV upload is processed, for each
+executor mode. With 'inline' the upload blocks the event loop and the
+health checks queue behind it.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_executor.py
+    python benchmarks/bench_executor.py --rows 500000 --modes inline thread process
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import main
+from app.executor import AnalysisExecutor
+
+
+def make_csv(n_rows: int) -> bytes:
+    rng = np.random.default_rng(0)
+    days = pd.date_range('2020-01-01', periods=n_rows // 50).strftime('%Y-%m-%d')
+    df = pd.DataFrame({
+        'user_id': np.repeat([f"u{i}" for i in range(50)], len(days)),
+        'date': np.tile(days, 50),
+        'metric': 'heart_rate',
+        'value': rng.normal(70, 5, 50 * len(days)).round(1),
+    })
+    return df.to_csv(index=False).encode()
+
+
+async def run_mode(mode: str, raw: bytes, interval: float) -> dict:
+    main.EXECUTOR = AnalysisExecutor(mode=mode, process_min_bytes=0)
+    main.EXECUTOR.warm_up()
+    main.UPLOAD_CACHE.clear()
+    latencies = []
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url='http://bench') as client:
+        upload = asyncio.create_task(client.post('/upload', files={'file': ('big.csv', raw, 'text/csv')}))
+        start = time.perf_counter()
+        while not upload.done():
+            due = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            await client.get('/health')
+            # Measured from when the check was due, so time spent waiting
+            # for a blocked event loop counts
+            latencies.append((time.perf_counter() - due) * 1000)
+        upload_seconds = time.perf_counter() - start
+        assert (await upload).status_code == 200
+
+    main.EXECUTOR.shutdown()
+    latencies = np.array(latencies)
+    return {
+        'upload_s': upload_seconds,
+        'checks': len(latencies),
+        'p50_ms': np.percentile(latencies, 50),
+        'p99_ms': np.percentile(latencies, 99),
+        'max_ms': latencies.max(),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--interval', type=float, default=0.005, help='seconds between health checks')
+    parser.add_argument('--modes', nargs='+', default=['inline', 'thread', 'process'])
+    args = parser.parse_args()
+
+    raw = make_csv(args.rows)
+    print(f"upload: {args.rows:,} rows, {len(raw) / 1e6:.1f} MB")
+    print(f"{'mode':>8} {'upload s':>9} {'checks':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode in args.modes:
+        r = asyncio.run(run_mode(mode, raw, args.interval))
+        print(f"{mode:>8} {r['upload_s']:9.2f} {r['checks']:7d} {r['p50_ms']:8.2f} {r['p99_ms']:8.2f} {r['max_ms']:8.1f}")
+
+
+if __name__ == '__main__':
+    main_cli()
@@ -0,0 +1,75 @@
+"""
+Benchmark /api/healthSummary and /api/healthInsights with many stored
+entries, against the previous full scan for the latest entry.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_latest_entry.py
+    python benchmarks/bench_latest_entry.py --entries 100000 --store sqlite
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import integrated_main
+from storage import create_store
+
+
+def fill_store(store, n_entries: int):
+    """Entries share one results dict to keep the benchmark's memory small."""
+    results = integrated_main.process_health_data({
+        'steps': 8000, 'sleepHours': 7.0, 'heartRate': 70, 'calories': 2100, 'waterIntake': 2.0, 'date': '2025-01-01',
+    })
+    start = datetime(2024, 1, 1)
+    for i in range(n_entries):
+        store.put(f"id-{i}", {
+            'timestamp': (start + timedelta(seconds=i)).isoformat(),
+            'user_id': f"u{i % 1000}",
+            'raw_data': {'steps': 8000 + i % 500, 'sleepHours': 7.0, 'heartRate': 70, 'calories': 2100, 'waterIntake': 2.0},
+            'results': results,
+        })
+
+
+def time_calls(fn, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--entries', type=int, default=1_000_000)
+    parser.add_argument('--calls', type=int, default=200)
+    parser.add_argument('--store', choices=['memory', 'sqlite'], default='memory')
+    args = parser.parse_args()
+
+    tmp_dir = tempfile.mkdtemp()
+    store = create_store(args.store, path=os.path.join(tmp_dir, 'bench.db'))
+    integrated_main.DATA_STORE = store
+
+    start = time.perf_counter()
+    fill_store(store, args.entries)
+    print(f"stored {args.entries} entries ({args.store}) in {time.perf_counter() - start:.1f}s")
+
+    loop = asyncio.new_event_loop()
+    summary_ms = time_calls(lambda: loop.run_until_complete(integrated_main.get_health_summary()), args.calls)
+    insights_ms = time_calls(lambda: loop.run_until_complete(integrated_main.get_health_insights()), args.calls)
+    index_ms = time_calls(lambda: store.latest(), args.calls)
+    scan_calls = max(1, min(args.calls, 5))
+    scan_ms = time_calls(lambda: max(store.values(), key=lambda x: x['timestamp']), scan_calls)
+
+    print(f"{'operation':<34} {'ms/call':>10}")
+    print(f"{'GET /api/healthSummary':<34} {summary_ms:>10.3f}")
+    print(f"{'GET /api/healthInsights':<34} {insights_ms:>10.3f}")
+    print(f"{'latest() via index':<34} {index_ms:>10.4f}")
+    print(f"{'latest via max() scan (previous)':<34} {scan_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark GET throughput with the pre-serialized response cache against
+FastAPI's default encoding of the same payloads on every request.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_response_cache.py
+    python benchmarks/bench_response_cache.py --days 3650 --requests 500
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import main
+from app.serialize import orjson
+
+METRICS = ['heart_rate', 'steps', 'sleep', 'water']
+
+
+def make_csv(days: int) -> bytes:
+    dates = pd.date_range('2016-01-01', periods=days).strftime('%Y-%m-%d')
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'user_id': 'u1',
+        'date': np.tile(dates, len(METRICS)),
+        'metric': np.repeat(METRICS, days),
+        'value': rng.normal(100, 20, days * len(METRICS)).round(1),
+    }).to_csv(index=False).encode()
+
+
+async def throughput(client, url: str, n_requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n_requests):
+        response = await client.get(url)
+        assert response.status_code == 200
+    return n_requests / (time.perf_counter() - start)
+
+
+async def run(days: int, n_requests: int):
+    cached_json = main.cached_json
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url='http://bench') as client:
+        upload = await client.post('/upload', files={'file': ('bench.csv', make_csv(days), 'text/csv')})
+        data_id = upload.json()['data_id']
+        print(f"encoder: {'orjson' if orjson else 'json'}, {days * len(METRICS):,} timeseries points")
+        print(f"{'endpoint':>28} {'default req/s':>14} {'cached req/s':>13} {'speedup':>8}")
+        for path in ['summary', 'trends', 'anomalies', 'trends?max_points=300']:
+            url = f'/data/{data_id}/{path}'
+            # Default path: return the payload and let FastAPI encode it
+            main.cached_json = lambda data_id, key, build: build()
+            default = await throughput(client, url, n_requests)
+            main.cached_json = cached_json
+            cached = await throughput(client, url, n_requests)
+            print(f"{path:>28} {default:14.1f} {cached:13.1f} {cached / default:7.1f}x")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=730)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.days, args.requests))
+
+
+if __name__ == '__main__':
+    main_cli()
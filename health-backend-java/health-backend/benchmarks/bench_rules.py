@@ -0,0 +1,106 @@
+"""
+Benchmark domain-rule evaluation as the rule table grows.
+
+Compares RuleSet (sorted thresholds + binary search per metric) with a
+naive loop that builds one boolean mask per rule.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_rules.py
+    python benchmarks/bench_rules.py --rows 1000000 --rule-counts 2 50 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.rules import RuleSet
+
+METRICS = {
+    'heart_rate': (72, 10),
+    'steps': (8000, 2500),
+    'sleep': (7, 1),
+    'water': (2200, 400),
+    'calories': (2200, 300),
+}
+
+
+def make_daily_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    names = list(METRICS)
+    metric = rng.choice(names, n_rows)
+    means = np.array([METRICS[m][0] for m in names])[pd.Categorical(metric, names).codes]
+    stds = np.array([METRICS[m][1] for m in names])[pd.Categorical(metric, names).codes]
+    return pd.DataFrame({
+        'user_id': rng.integers(0, n_rows // 30 + 1, n_rows).astype(str),
+        'day': pd.Timestamp('2024-01-01').date(),
+        'metric': metric,
+        'value': rng.normal(means, stds),
+    })
+
+
+def make_rules(n_rules: int, seed: int = 1) -> list:
+    """Rules spread over all metrics with thresholds in the far tails."""
+    rng = np.random.default_rng(seed)
+    rules = []
+    for i in range(n_rules):
+        metric = list(METRICS)[i % len(METRICS)]
+        mean, std = METRICS[metric]
+        if i % 2:
+            comparator, threshold = '>', mean + std * rng.uniform(3.5, 6)
+        else:
+            comparator, threshold = '<', mean - std * rng.uniform(3.5, 6)
+        rules.append({
+            'metric': metric,
+            'comparator': comparator,
+            'threshold': threshold,
+            'severity': 'warning',
+            'message': f'{metric} {comparator} {threshold:.1f}',
+        })
+    return rules
+
+
+def naive_apply(daily_df: pd.DataFrame, rules: list) -> int:
+    matches = 0
+    for rule in rules:
+        subset = daily_df[daily_df['metric'] == rule['metric']]
+        if rule['comparator'] == '>':
+            matches += int((subset['value'] > rule['threshold']).sum())
+        else:
+            matches += int((subset['value'] < rule['threshold']).sum())
+    return matches
+
+
+def best_of(fn, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--rule-counts', type=int, nargs='+', default=[2, 10, 50, 100, 250, 500])
+    args = parser.parse_args()
+
+    daily_df = make_daily_frame(args.rows)
+    print(f"daily rows: {args.rows}")
+    print(f"{'rules':>6} {'matches':>8} {'RuleSet (ms)':>13} {'mask loop (ms)':>15}")
+    for n_rules in args.rule_counts:
+        rules = make_rules(n_rules)
+        ruleset = RuleSet(rules)
+        (rows, _), fast_s = best_of(lambda: ruleset.evaluate(daily_df))
+        slow_matches, slow_s = best_of(lambda: naive_apply(daily_df, rules), repeat=1)
+        assert slow_matches == len(rows)
+        print(f"{n_rules:>6} {len(rows):>8} {fast_s * 1000:>13.1f} {slow_s * 1000:>15.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark health scoring of many user-days: the scalar per-record ladder
+against the vectorized kernel in app/scoring.py.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_scoring.py
+    python benchmarks/bench_scoring.py --rows 100000 1000000 10000000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.scoring import cohort_distributions, health_score, health_scores
+
+
+def scalar_score(steps, sleep, hr, water):
+    """calculate_health_score before the kernel."""
+    score = 0
+    score += 30 if steps >= 10000 else 25 if steps >= 7500 else 20 if steps >= 5000 else 10
+    score += 25 if 7 <= sleep <= 9 else 20 if 6 <= sleep < 7 or 9 < sleep <= 10 else 10
+    score += 25 if 60 <= hr <= 100 else 20 if 50 <= hr < 60 or 100 < hr <= 120 else 10
+    score += 20 if water >= 2.5 else 15 if water >= 2.0 else 10
+    return min(score, 100.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--scalar-limit', type=int, default=1_000_000, help='skip the scalar loop above this size')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>10} {'scalar s':>9} {'kernel s':>9} {'speedup':>8} {'cohorts s':>10}")
+    for n in args.rows:
+        steps = rng.integers(1000, 15000, n)
+        sleep = rng.normal(7, 1.5, n).round(1)
+        hr = rng.integers(45, 130, n)
+        water = rng.normal(2.2, 0.5, n).round(2)
+        cohorts = rng.integers(0, 1000, n)
+
+        start = time.perf_counter()
+        scores = health_scores(steps, sleep, hr, water)
+        kernel = time.perf_counter() - start
+
+        start = time.perf_counter()
+        cohort_distributions(scores, cohorts)
+        grouped = time.perf_counter() - start
+
+        if n <= args.scalar_limit:
+            start = time.perf_counter()
+            expected = [scalar_score(*row) for row in zip(steps.tolist(), sleep.tolist(), hr.tolist(), water.tolist())]
+            scalar = time.perf_counter() - start
+            assert np.array_equal(scores, expected)
+            print(f"{n:10,d} {scalar:9.3f} {kernel:9.4f} {scalar / kernel:7.0f}x {grouped:10.4f}")
+        else:
+            print(f"{n:10,d} {'-':>9} {kernel:9.4f} {'-':>8} {grouped:10.4f}")
+
+    start = time.perf_counter()
+    for _ in range(1000):
+        health_score(8000, 7.5, 72, 2.0)
+    print(f"single-record path: {(time.perf_counter() - start) * 1000:.1f} us per call")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark memory and encoding time of the columnar timeseries against the
+list of per-point dicts it replaced.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_timeseries.py
+    python benchmarks/bench_timeseries.py --users 10 100 --days 365
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.serialize import encode_json
+from app.storage import dumps
+from app.timeseries import Timeseries
+
+METRICS = ['steps', 'sleep', 'heart_rate', 'calories', 'water']
+
+
+def make_daily(n_users: int, n_days: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    days = pd.date_range('2023-01-01', periods=n_days).date
+    n = n_users * n_days * len(METRICS)
+    return pd.DataFrame({
+        'user_id': np.repeat([f"u{i:05d}" for i in range(n_users)], n_days * len(METRICS)),
+        'day': np.tile(np.repeat(days, len(METRICS)), n_users),
+        'metric': np.tile(METRICS, n_users * n_days),
+        'value': rng.normal(70, 5, n).round(1),
+    })
+
+
+def legacy_records(daily_df: pd.DataFrame) -> list:
+    records = daily_df.to_dict(orient='records')
+    for record in records:
+        record['value'] = float(record['value'])
+        record['day'] = str(record['day'])
+    return records
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    value = build()
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, seconds, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, nargs='+', default=[10, 100])
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    print(f"{'points':>9} {'layout':>8} {'build s':>8} {'memory MB':>10} {'stored MB':>10} {'encode ms':>10}")
+    for n_users in args.users:
+        daily = make_daily(n_users, args.days)
+        for layout, build in [('records', lambda: legacy_records(daily)), ('columnar', lambda: Timeseries.from_daily(daily))]:
+            value, seconds, size = measure(build)
+            stored = len(dumps(value))
+            start = time.perf_counter()
+            encode_json(value.to_columns() if layout == 'columnar' else value)
+            encode_ms = (time.perf_counter() - start) * 1000
+            print(f"{len(daily):9,d} {layout:>8} {seconds:8.3f} {size / 1e6:10.1f} {stored / 1e6:10.1f} {encode_ms:10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark the vectorized convert_wide_to_long against the original
+iterrows loop on synthetic wide exports.
+
+Usage (from the health-backend directory):
+    python benchmarks/bench_wide_to_long.py
+    python benchmarks/bench_wide_to_long.py --sizes 10000 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.processor import convert_wide_to_long
+
+
+def legacy_convert_wide_to_long(df: pd.DataFrame) -> pd.DataFrame:
+    """The original per-row implementation, kept here for comparison."""
+    records = []
+    for _, row in df.iterrows():
+        date = row['date']
+        records.extend([
+            {'user_id': 'user1', 'date': date, 'metric': 'heart_rate', 'value': float(row['heart_rate'])},
+            {'user_id': 'user1', 'date': date, 'metric': 'steps', 'value': float(row['steps'])},
+            {'user_id': 'user1', 'date': date, 'metric': 'sleep', 'value': float(row['sleep_hours'])},
+            {'user_id': 'user1', 'date': date, 'metric': 'water', 'value': float(row['water_liters'])},
+            {'user_id': 'user1', 'date': date, 'metric': 'calories', 'value': float(row['calories_burned'])}
+        ])
+    return pd.DataFrame(records)
+
+
+def make_wide_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2020-01-01', periods=n_rows, freq='D').strftime('%Y-%m-%d')
+    return pd.DataFrame({
+        'date': dates,
+        'heart_rate': rng.normal(72, 8, n_rows).round(),
+        'steps': rng.integers(500, 15000, n_rows),
+        'sleep_hours': rng.normal(7, 1, n_rows).round(1),
+        'water_liters': rng.normal(2.2, 0.4, n_rows).round(2),
+        'calories_burned': rng.integers(1500, 3000, n_rows),
+    })
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--skip-legacy-above', type=int, default=None,
+                        help='Skip the slow loop for sizes above this many rows')
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy (s)':>12} {'vectorized (s)':>16} {'speedup':>9}")
+    for n_rows in args.sizes:
+        df = make_wide_frame(n_rows)
+        fast, fast_s = timed(convert_wide_to_long, df)
+
+        if args.skip_legacy_above is not None and n_rows > args.skip_legacy_above:
+            print(f"{n_rows:>10} {'skipped':>12} {fast_s:>16.3f} {'-':>9}")
+            continue
+
+        slow, slow_s = timed(legacy_convert_wide_to_long, df)
+        assert len(slow) == len(fast)
+        assert np.allclose(slow['value'].to_numpy(), fast['value'].to_numpy())
+        print(f"{n_rows:>10} {slow_s:>12.3f} {fast_s:>16.3f} {slow_s / fast_s:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+
+
+def test_matrix_rolling_matches_pandas():
+    from app.anomaly import rolling_mean_std
+
+    rng = np.random.default_rng(0)
+    values = rng.normal(70, 8, (3, 30))
+    values[1, 20:] = np.nan  # shorter series, padded at the end
+
+    mean, std = rolling_mean_std(values, 7)
+    for i in range(3):
+        series = pd.Series(values[i]).dropna()
+        n = len(series)
+        assert np.allclose(mean[i, :n], series.rolling(7, min_periods=1).mean())
+        assert np.allclose(std[i, :n], series.rolling(7, min_periods=1).std(), equal_nan=True)
+
+
+def test_detector_flags_every_series_at_once():
+    from app.anomaly import RollingAnomalyDetector, SeriesMatrix
+
+    days = pd.date_range('2025-11-01', periods=10).date
+    steady = [60, 61, 59, 60, 62, 61, 60, 59, 61, 60]
+    spiky = [60, 61, 59, 60, 62, 61, 60, 59, 61, 140]
+    daily_df = pd.DataFrame({
+        'user_id': ['a'] * 10 + ['b'] * 10,
+        'day': list(days) * 2,
+        'metric': 'heart_rate',
+        'value': steady + spiky,
+    })
+    matrix = SeriesMatrix.from_daily(daily_df)
+    assert matrix.values.shape == (2, 10)
+
+    # A point inside its own 7-day window cannot exceed ~2.3 sigma, so use k=2
+    found = RollingAnomalyDetector(window=7, k=2).detect(matrix).to_records()
+    assert [(a['user_id'], a['date']) for a in found] == [('b', '2025-11-10')]
+
+    robust = RollingAnomalyDetector(window=7, k=3, method='mad').detect(matrix)
+    assert list(robust.user_id) == ['b']
+    assert robust.to_records()[0]['reason'].startswith('Deviation > 3 MAD')
+
+
+def test_blocks_are_sized_by_element_budget(monkeypatch):
+    from app import anomaly
+    from app.anomaly import RollingAnomalyDetector, SeriesMatrix
+
+    rng = np.random.default_rng(1)
+    values = rng.normal(70, 8, (50, 40))
+    values[::7, 35] = 200
+    matrix = SeriesMatrix(values, np.tile(np.arange(40), (50, 1)))
+    detector = RollingAnomalyDetector(window=7, k=2)
+    expected = detector.detect(matrix)
+
+    # 40 days x 7 window: three series per block
+    monkeypatch.setattr(anomaly, 'BLOCK_ELEMENTS', 3 * 40 * 7)
+    assert detector.block_series(40) == 3
+    blocked = detector.detect(matrix)
+    assert np.array_equal(blocked.series, expected.series)
+    assert np.array_equal(blocked.z_score, expected.z_score)
+    assert len(expected)
@@ -0,0 +1,67 @@
+import io
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('pyarrow')
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..')
+
+
+def test_archive_round_trip_with_filters(tmp_path):
+    from app.archive import TimeseriesArchive
+    from app.processor import get_trends_and_insights
+
+    df = pd.read_csv(os.path.join(DATA_DIR, 'extended_health_data.csv'))
+    columns = get_trends_and_insights(df)['timeseries']
+    timeseries = columns.to_records()
+
+    archive = TimeseriesArchive(str(tmp_path))
+    paths = archive.write('upload-1', columns)
+    assert os.path.join('user_id=u003', 'month=2024-01', 'upload-1.parquet') in paths
+    assert all(os.path.isfile(tmp_path / path) for path in paths)
+
+    assert archive.read_records(data_id='upload-1') == timeseries
+    assert archive.read_records(data_id='other') == []
+    assert archive.read_timeseries(data_id='upload-1') == columns
+    assert archive.read_timeseries(paths=paths) == columns
+    assert archive.read_records(paths=paths, metric='sleep', start='2024-01-21') == archive.read_records(
+        data_id='upload-1', metric='sleep', start='2024-01-21')
+
+    hr = archive.read_records(data_id='upload-1', user_id='u004', metric='heart_rate', start='2024-01-21')
+    expected = [
+        r for r in timeseries
+        if r['user_id'] == 'u004' and r['metric'] == 'heart_rate' and r['day'] >= '2024-01-21'
+    ]
+    assert hr == expected and hr
+
+    values = archive.read_table(user_id='u005', columns=['value'])
+    assert values.column_names == ['value']
+
+
+def test_upload_serves_archived_timeseries(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import main
+    from app.archive import TimeseriesArchive
+
+    monkeypatch.setattr(main, 'ARCHIVE', TimeseriesArchive(str(tmp_path)))
+    client = TestClient(main.app)
+    with open(os.path.join(DATA_DIR, 'positive_trend_data.csv'), 'rb') as f:
+        data_id = client.post('/upload', files={'file': ('p.csv', f.read(), 'text/csv')}).json()['data_id']
+
+    entry = main.DATA_STORE[data_id]
+    assert entry['archived'] and entry['archive_files']
+    assert 'timeseries' not in entry['processed']
+    # The store keeps no daily rows of archived uploads; they are read from the archive
+    user_id = entry['user_id']
+    archived = main.ARCHIVE.read_records(data_id=data_id, user_id=user_id, metric='sleep')
+    assert archived and not any(r in main.DATA_STORE.query_daily(user_id) for r in archived)
+    metrics = client.get(f'/users/{user_id}/metrics', params={'metric': 'sleep'}).json()
+    assert all(r in metrics for r in archived)
+
+    full = client.get(f'/data/{data_id}/trends').json()
+    sleep = client.get(f'/data/{data_id}/trends', params={'metric': 'sleep', 'end': '2024-01-16'}).json()
+    assert len(full) == 23
+    assert sleep and all(r['metric'] == 'sleep' and r['day'] <= '2024-01-16' for r in sleep)
+    assert client.get(f'/data/{data_id}/summary').json()['timeseries'] == full
@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+
+def reference_lttb(x, y, n_out):
+    """Textbook LTTB with float bucket boundaries, for comparison."""
+    n = len(x)
+    every = (n - 2) / (n_out - 2)
+    selected = [0]
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = int(i * every) + 1, int((i + 1) * every) + 1
+        next_lo, next_hi = hi, min(int((i + 2) * every) + 1, n)
+        avg_x, avg_y = np.mean(x[next_lo:next_hi]), np.mean(y[next_lo:next_hi])
+        areas = [abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a])) for j in range(lo, hi)]
+        a = lo + int(np.argmax(areas))
+        selected.append(a)
+    return selected + [n - 1]
+
+
+def test_lttb_matches_reference_and_keeps_spikes():
+    from app.downsample import lttb_indices
+
+    rng = np.random.default_rng(2)
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50) + rng.normal(0, 0.05, 1000)
+    y[500] = 10
+
+    indices = lttb_indices(x, y, 100)
+    assert len(indices) == 100 and indices[0] == 0 and indices[-1] == 999
+    assert list(indices) == reference_lttb(x, y, 100)
+    assert 500 in indices
+    assert list(lttb_indices(x[:50], y[:50], 100)) == list(range(50))
+
+
+def test_minmax_keeps_bucket_extremes():
+    from app.downsample import minmax_indices
+
+    rng = np.random.default_rng(3)
+    y = rng.normal(0, 1, 1001)
+    indices = minmax_indices(y, 52)
+    assert len(indices) <= 52 and indices[0] == 0 and indices[-1] == 1000
+    assert np.argmax(y) in indices and np.argmin(y) in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_trends_endpoint_bounds_points_per_series():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    days = pd.date_range('2020-01-01', periods=1500).strftime('%Y-%m-%d')
+    rng = np.random.default_rng(4)
+    df = pd.DataFrame({
+        'user_id': 'u1',
+        'date': np.tile(days, 2),
+        'metric': np.repeat(['heart_rate', 'steps'], len(days)),
+        'value': np.concatenate([rng.normal(70, 5, len(days)), rng.normal(8000, 900, len(days))]).round(1),
+    })
+    client = TestClient(app)
+    data_id = client.post('/upload', files={'file': ('long.csv', df.to_csv(index=False).encode(), 'text/csv')}).json()['data_id']
+
+    full = client.get(f'/data/{data_id}/trends').json()
+    assert len(full) == 3000
+    for method in ['lttb', 'minmax']:
+        points = client.get(f'/data/{data_id}/trends', params={'max_points': 200, 'method': method}).json()
+        for metric in ['heart_rate', 'steps']:
+            series = [p for p in points if p['metric'] == metric]
+            assert 3 <= len(series) <= 200
+            assert series[0]['day'] == '2020-01-01' and series[-1]['day'] == days[-1]
+
+    summary = client.get(f'/data/{data_id}/summary', params={'metric': 'steps', 'max_points': 50}).json()
+    assert len(summary['timeseries']) == 50
+    assert client.get(f'/data/{data_id}/trends', params={'max_points': 2}).status_code == 422
+    assert client.get(f'/data/{data_id}/trends', params={'method': 'mean'}).status_code == 400
@@ -0,0 +1,127 @@
+import asyncio
+import io
+import os
+import time
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def read_bytes(name):
+    with open(os.path.join(ROOT, name), 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('mode', ['inline', 'thread', 'process'])
+def test_executor_modes_match_inline_ingestion(mode):
+    from app.executor import AnalysisExecutor
+    from app.ingest import ingest_csv
+
+    raw = read_bytes('extended_health_data.csv')
+    expected, expected_meta = ingest_csv(io.BytesIO(raw))
+
+    # process_min_bytes=0 sends the upload through a temp file to a worker process
+    executor = AnalysisExecutor(mode=mode, workers=2, process_min_bytes=0)
+    try:
+        executor.warm_up()
+        results, meta = asyncio.run(executor.run_upload(ingest_csv, io.BytesIO(raw)))
+    finally:
+        executor.shutdown()
+    assert results == expected
+    assert meta['rows'] == expected_meta['rows']
+    # Hashed by the ingest read, from the upload or its spooled copy
+    assert meta['digest'] == expected_meta['digest']
+
+
+def test_executor_timeout_and_concurrency_limit():
+    from app.executor import AnalysisExecutor, TaskTimeout
+
+    executor = AnalysisExecutor(mode='thread', workers=4, max_tasks=1, timeout=0.2)
+
+    async def scenario():
+        with pytest.raises(TaskTimeout):
+            await executor.run(time.sleep, 1)
+        # One slot: two 0.1s tasks run one after the other
+        start = time.perf_counter()
+        await asyncio.gather(executor.run(time.sleep, 0.1), executor.run(time.sleep, 0.1))
+        return time.perf_counter() - start
+
+    try:
+        assert asyncio.run(scenario()) >= 0.2
+    finally:
+        executor.shutdown()
+
+
+def test_process_upload_is_spooled_off_the_event_loop(monkeypatch):
+    import threading
+    from app import executor as executor_module
+    from app.ingest import ingest_csv
+
+    spooled = []
+    original = executor_module._spool
+
+    def spool(fileobj):
+        path = original(fileobj)
+        spooled.append((threading.current_thread().name, path))
+        return path
+
+    monkeypatch.setattr(executor_module, '_spool', spool)
+    raw = read_bytes('extended_health_data.csv')
+    executor = executor_module.AnalysisExecutor(mode='process', workers=1, process_min_bytes=0)
+    try:
+        results, _ = asyncio.run(executor.run_upload(ingest_csv, io.BytesIO(raw)))
+    finally:
+        executor.shutdown()
+    assert results == ingest_csv(io.BytesIO(raw))[0]
+    (thread_name, path), = spooled
+    assert thread_name.startswith('health-analysis')
+    assert not os.path.exists(path)
+
+
+def test_upload_store_write_runs_off_the_event_loop(monkeypatch):
+    import threading
+    from fastapi.testclient import TestClient
+    from app import main
+
+    writers = []
+    original = main.DATA_STORE.put
+
+    def put(*args, **kwargs):
+        writers.append(threading.current_thread().name)
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(main.DATA_STORE, 'put', put)
+    main.UPLOAD_CACHE.clear()
+    with TestClient(main.app) as client:
+        raw = read_bytes('sample_health_data.csv')
+        assert client.post('/upload', files={'file': ('s.csv', raw, 'text/csv')}).status_code == 200
+    assert len(writers) == 1 and writers[0].startswith('health-analysis')
+
+
+def _read_later(path, delay=0.5):
+    time.sleep(delay)
+    with open(path, 'rb') as f:
+        return len(f.read())
+
+
+def test_spooled_upload_outlives_a_timed_out_wait(monkeypatch):
+    from app import executor as executor_module
+    from app.executor import AnalysisExecutor, TaskTimeout
+
+    paths = []
+    original = executor_module._spool
+    monkeypatch.setattr(executor_module, '_spool', lambda fileobj: paths.append(original(fileobj)) or paths[-1])
+    executor = AnalysisExecutor(mode='process', workers=1, timeout=0.1, process_min_bytes=0)
+    try:
+        with pytest.raises(TaskTimeout):
+            asyncio.run(executor.run_upload(_read_later, io.BytesIO(b'a,b\n1,2\n')))
+        # The worker is still reading the file, it is removed once it is done
+        path, = paths
+        assert os.path.exists(path)
+        deadline = time.monotonic() + 10
+        while os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert not os.path.exists(path)
+    finally:
+        executor.shutdown()
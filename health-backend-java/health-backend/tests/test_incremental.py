@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+
+def test_appending_days_matches_full_recompute(tmp_path):
+    from app.incremental import SeriesStateStore
+    from app.processor import aggregate_per_day, detect_series_anomalies, get_trends_and_insights, normalize
+
+    rng = np.random.default_rng(3)
+    days = pd.date_range('2025-10-01', periods=20).strftime('%Y-%m-%d')
+    heart_rate = rng.normal(70, 4, 20).round(1)
+    heart_rate[12] = 130  # spike that also trips the HR > 100 rule
+    sleep = rng.normal(7, 0.5, 20).round(2)
+
+    path = str(tmp_path / 'state.db')
+    store = SeriesStateStore(path=path, k=2)
+    for i, day in enumerate(days):
+        result = store.append_day('u1', day, {'heart_rate': heart_rate[i], 'sleep': sleep[i]})
+        store.save()
+
+        history = pd.DataFrame({
+            'user_id': 'u1',
+            'date': list(days[:i + 1]) * 2,
+            'metric': ['heart_rate'] * (i + 1) + ['sleep'] * (i + 1),
+            'value': list(heart_rate[:i + 1]) + list(sleep[:i + 1]),
+        })
+        full = get_trends_and_insights(history)
+
+        assert result['summary'] == full['summary']
+        assert result['trends'] == full['trends']
+        # The incremental verdict covers the newest day only
+        z_today = [a for a in result['anomalies'] if 'z_score' in a]
+        if i == 12:
+            assert [a['reason'] for a in result['anomalies'] if 'z_score' not in a] == ['Urgent: Resting HR > 100']
+        assert all(a['date'] == day for a in result['anomalies'])
+        expected = [
+            a for a in detect_series_anomalies(aggregate_per_day(normalize(history)), k=2).to_records()
+            if a['date'] == day
+        ]
+        assert [(a['metric'], round(a['z_score'], 9)) for a in z_today] == \
+            [(a['metric'], round(a['z_score'], 9)) for a in expected]
+
+    # State survives a restart
+    reloaded = SeriesStateStore(path=path, k=2)
+    state = reloaded.get('u1', 'heart_rate')
+    assert state.count == 20
+    assert state.last_day.isoformat() == days[-1]
+    assert list(state.recent) == list(heart_rate[-7:])
+    assert reloaded.get('u1', 'sleep').first_value == sleep[0]
+
+    # Only the series touched since the last save are written
+    reloaded.append_day('u2', days[0], {'steps': 9000})
+    changes = reloaded._conn.total_changes
+    reloaded.save()
+    assert reloaded._conn.total_changes - changes == 1
+    reloaded.save()
+    assert reloaded._conn.total_changes - changes == 1
+
+
+def full_scan_trends(entries, user_id):
+    """Per-day means of one user's entries and their trends, recomputed from scratch"""
+    rows = pd.DataFrame([dict(e['raw_data'], user_id=e['user_id']) for e in entries])
+    daily = rows[rows['user_id'] == user_id].assign(day=lambda df: pd.to_datetime(df['date'])).groupby('day').mean(numeric_only=True)
+    last_day = daily.index[-1]
+    windows = {}
+    for name, size in [('7d', 7), ('30d', 30)]:
+        current = daily[daily.index > last_day - pd.Timedelta(days=size)]
+        prior = daily[(daily.index > last_day - pd.Timedelta(days=2 * size)) & (daily.index <= last_day - pd.Timedelta(days=size))]
+        windows[name] = (current, prior)
+    return daily, windows
+
+
+def test_entry_trends_match_full_scan():
+    from app.incremental import EntryTrends
+    from app.storage import MemoryStore
+
+    rng = np.random.default_rng(5)
+    store = MemoryStore()
+    tracker = EntryTrends()
+    # Batches of two users, several records per day, days sent in order
+    i = 0
+    for day in pd.date_range('2025-09-01', periods=70).strftime('%Y-%m-%d'):
+        for user_id in ['u1', 'u2']:
+            for _ in range(int(rng.integers(1, 4))):
+                raw = {'date': day, 'steps': int(rng.integers(3000, 12000)), 'sleepHours': round(float(rng.normal(7, 1)), 1),
+                       'heartRate': int(rng.integers(60, 90)), 'calories': int(rng.integers(1500, 2800))}
+                entry = {'timestamp': f'2025-11-01T00:{i // 60:02d}:{i % 60:02d}', 'user_id': user_id, 'raw_data': raw}
+                store.put(f'd{i}', entry)
+                tracker.add(entry)
+                i += 1
+
+    snapshot = tracker.snapshot()
+    entries = store.last_n(len(store))
+    assert snapshot['dataPoints'] == len(entries)
+    assert snapshot['dateRange'] == {'start': entries[0]['timestamp'], 'end': entries[-1]['timestamp']}
+    assert snapshot['userId'] == 'u2' and snapshot['trends'] == snapshot['users']['u2']['trends']
+
+    for user_id in ['u1', 'u2']:
+        trends = snapshot['users'][user_id]
+        daily, windows = full_scan_trends(entries, user_id)
+        for metric in ['steps', 'sleepHours']:
+            # Day over day compares the user's last two days, not the last two records
+            assert trends['trends'][metric]['current'] == round(daily[metric].iloc[-1], 2)
+            assert trends['trends'][metric]['previous'] == round(daily[metric].iloc[-2], 2)
+            for name, (current, prior) in windows.items():
+                assert trends['windows'][name][metric]['current'] == round(current[metric].mean(), 2)
+                assert trends['windows'][name][metric]['previous'] == round(prior[metric].mean(), 2)
+
+    # Rebuilding from the store gives the same state
+    assert EntryTrends.from_store(store).snapshot() == snapshot
+
+
+def test_entry_trends_need_two_windows_of_days():
+    from app.incremental import EntryTrends
+
+    tracker = EntryTrends()
+    # 40 records of a single day fill no window
+    for i in range(40):
+        tracker.add({'timestamp': f'2025-11-01T00:00:{i:02d}', 'user_id': 'u1',
+                     'raw_data': {'date': '2025-11-01', 'steps': 1000 * i}})
+    snapshot = tracker.snapshot()
+    assert snapshot['trends'] == {} and snapshot['windows'] == {'7d': {}, '30d': {}}
+
+    tracker.add({'timestamp': '2025-11-01T00:01:00', 'user_id': 'u1', 'raw_data': {'date': '2025-11-08', 'steps': 5000}})
+    steps = tracker.snapshot()['windows']['7d']['steps']
+    assert steps['current'] == 5000 and steps['previous'] == 19500
+    assert tracker.snapshot()['windows']['30d'] == {}
+
+
+def test_append_days_matches_append_day():
+    from app.incremental import SeriesStateStore
+
+    rng = np.random.default_rng(11)
+    days = pd.date_range('2025-10-01', periods=15).strftime('%Y-%m-%d')
+    rows = []
+    for user_id in ['u2', 'u1']:
+        for day in days:
+            rows.append((user_id, day, 'heart_rate', round(float(rng.normal(75, 12)), 1)))
+            rows.append((user_id, day, 'sleep', round(float(rng.normal(6, 1.5)), 1)))
+    daily_df = pd.DataFrame(rows, columns=['user_id', 'day', 'metric', 'value'])
+
+    single = SeriesStateStore(k=2)
+    expected = []
+    for (user_id, day), group in daily_df.sort_values(['user_id', 'day'], kind='mergesort').groupby(['user_id', 'day']):
+        expected.append(single.append_day(user_id, day, dict(zip(group['metric'], group['value']))))
+
+    batch = SeriesStateStore(k=2).append_days(daily_df)
+    assert [result for _, result in batch] == expected
+    assert any(result['anomalies'] for result in expected)
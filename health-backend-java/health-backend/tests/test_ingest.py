@@ -0,0 +1,107 @@
+import io
+import os
+
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..')
+
+
+def read_bytes(name):
+    with open(os.path.join(DATA_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def test_streaming_matches_in_memory():
+    from app.ingest import process_csv_in_memory, process_csv_stream
+
+    for name in ['extended_health_data.csv', 'positive_trend_data.csv', 'sample_health_data.csv']:
+        raw = read_bytes(name)
+        expected, expected_meta = process_csv_in_memory(io.BytesIO(raw))
+        # Tiny chunks force many folds and compactions
+        streamed, meta = process_csv_stream(io.BytesIO(raw), chunk_rows=5)
+
+        assert streamed == expected, name
+        assert meta['rows'] == expected_meta['rows']
+        assert meta['first_user_id'] == expected_meta['first_user_id']
+        assert meta['digest'] == expected_meta['digest']
+        # Same types per chunk as for the whole file (NaN cells never compare equal)
+        assert pd.Series(meta['last_row']).equals(pd.Series(expected_meta['last_row']))
+
+
+def test_streaming_skips_missing_first_values():
+    from app.ingest import process_csv_in_memory, process_csv_stream
+
+    rows = ['user_id,date,metric,value']
+    for day in range(1, 11):
+        rows.append(f"001,2024-01-{day:02d},steps,{'' if day == 3 else 4000 + 100 * day}")
+    # The missing 2024-01-03 value is given again in a later chunk
+    rows.append('001,2024-01-03,steps,9000')
+    raw = '\n'.join(rows).encode()
+
+    expected, _ = process_csv_in_memory(io.BytesIO(raw))
+    streamed, _ = process_csv_stream(io.BytesIO(raw), chunk_rows=2)
+    assert streamed == expected
+    assert expected['summary']['total_users'] == 1
+
+
+def test_streaming_pins_types_and_date_format():
+    from app.ingest import process_csv_in_memory, process_csv_stream
+
+    # Chunks on their own would read 001 as a number and 13/01 as day first
+    rows = ['user_id,date,metric,value', '001,01/02/2024,steps,4000', '001,01/03/2024,steps,4100',
+            '001,13/01/2024,steps,4200', 'u2,01/04/2024,steps,4300']
+    raw = '\n'.join(rows).encode()
+
+    expected, _ = process_csv_in_memory(io.BytesIO(raw))
+    streamed, meta = process_csv_stream(io.BytesIO(raw), chunk_rows=2)
+    assert streamed == expected
+    assert meta['first_user_id'] == '001'
+
+
+def test_upload_endpoint_streams():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    raw = read_bytes('extended_health_data.csv')
+    response = client.post('/upload', files={'file': ('extended.csv', raw, 'text/csv')})
+    assert response.status_code == 200
+    body = response.json()
+    assert body['summary']['total_users'] == 3
+
+    summary = client.get(f"/data/{body['data_id']}/summary").json()
+    assert summary['user_id'] == 'u003'
+
+
+def test_reupload_returns_cached_data_id():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    client = TestClient(app)
+    before = client.get('/cache/stats').json()['uploads']
+    raw = read_bytes('extended_health_data.csv')
+    first = client.post('/upload', files={'file': ('a.csv', raw, 'text/csv')}).json()
+    again = client.post('/upload', files={'file': ('b.csv', raw, 'text/csv')}).json()
+    assert again == first
+
+    changed = client.post('/upload', files={'file': ('c.csv', raw + b'\n', 'text/csv')}).json()
+    assert changed['data_id'] != first['data_id']
+
+    stats = client.get('/cache/stats').json()['uploads']
+    assert stats['hits'] - before['hits'] >= 1
+    assert stats['entries'] >= 2
+
+
+def test_digest_is_computed_by_the_ingest_read():
+    import hashlib
+    from app.ingest import PROCESSING_VERSION, process_csv_stream
+    from app.rules import get_default_rules
+
+    raw = read_bytes('sample_health_data.csv')
+    source = io.BytesIO(raw)
+    _, meta = process_csv_stream(source, chunk_rows=5)
+
+    prefix = f"{PROCESSING_VERSION}:{get_default_rules().fingerprint()}\n".encode()
+    assert meta['digest'] == hashlib.sha256(prefix + raw).hexdigest()
+    # The upload was read once, to its end
+    assert source.tell() == len(raw)
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+
+def day(user_id, date, steps=8000):
+    return {'userId': user_id, 'date': date, 'steps': steps, 'sleepHours': 7.0, 'heartRate': 70,
+            'calories': 2000, 'waterIntake': 2.0}
+
+
+def test_batch_rejects_duplicate_user_days():
+    from fastapi.testclient import TestClient
+    import integrated_main
+
+    client = TestClient(integrated_main.app)
+    stored = len(integrated_main.DATA_STORE)
+    days = [day('dup1', '2025-11-01'), day('dup2', '2025-11-01'), day('dup1', '2025-11-01', 9000)]
+    response = client.post('/api/uploadHealthDataBatch', json=days)
+    assert response.status_code == 400
+    assert 'dup1 on 2025-11-01' in response.json()['detail']
+    assert len(integrated_main.DATA_STORE) == stored
+
+    response = client.post('/api/uploadHealthDataBatch', json=days[:2] + [day('dup1', '2025-11-02')])
+    assert response.status_code == 200
+    assert [d['userId'] for d in response.json()['days']] == ['dup1', 'dup2', 'dup1']
+
+
+def test_root_lists_every_api_route():
+    from fastapi.testclient import TestClient
+    import integrated_main
+
+    listed = TestClient(integrated_main.app).get('/').json()['endpoints']
+    routes = {route.path for route in integrated_main.app.routes if route.path.startswith('/api/')}
+    assert set(listed) == routes
@@ -35,5 +35,50 @@ def test_processing():
     assert hr_anomaly is not None, "Should detect heart rate anomaly > 100"
     print("Test Passed: Heart rate anomaly detected.")
 
+
+def test_wide_format_conversion():
+    from app.processor import convert_wide_to_long, get_trends_and_insights
+
+    wide = pd.DataFrame({
+        'user_id': ['u7', 'u7', 'u7'],
+        'date': ['2025-11-01', '2025-11-02', '2025-11-03'],
+        'steps': [8500, 9200, None],
+        'heart_rate': [72, 75, 70],
+        'hydration_liters': [2.2, 1.9, 2.5],
+    })
+    long_df = convert_wide_to_long(wide)
+
+    assert set(long_df['user_id']) == {'u7'}
+    assert set(long_df['metric']) == {'steps', 'heart_rate', 'water'}
+    # The empty steps cell is dropped rather than stored as NaN
+    assert len(long_df) == 8
+    assert long_df.iloc[:3]['metric'].tolist() == ['heart_rate', 'steps', 'water']
+
+    results = get_trends_and_insights(wide)
+    assert results['summary']['water_avg_7d'] == 2.2
+
+def test_multi_user_series_are_kept_apart():
+    from app.processor import get_trends_and_insights
+
+    days = ['2025-11-01', '2025-11-02', '2025-11-03']
+    df = pd.DataFrame({
+        'user_id': ['a'] * 3 + ['b'] * 3,
+        'date': days * 2,
+        'metric': ['steps'] * 6,
+        'value': [1000, 2000, 3000, 9000, 9000, 4500],
+    })
+    results = get_trends_and_insights(df)
+    users = results['users']
+
+    assert results['summary']['total_users'] == 2
+    assert users['a']['summary']['steps_avg_7d'] == 2000.0
+    assert users['b']['summary']['steps_avg_7d'] == 7500.0
+    assert users['a']['trends'][0]['trend'] == 'up'
+    assert users['b']['trends'][0]['trend'] == 'down'
+    # Population summary averages the per-user values
+    assert results['summary']['steps_avg_7d'] == 4750.0
+
 if __name__ == "__main__":
     test_processing()
+    test_wide_format_conversion()
+    test_multi_user_series_are_kept_apart()
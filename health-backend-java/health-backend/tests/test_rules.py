@@ -0,0 +1,45 @@
+import pandas as pd
+
+
+def make_daily():
+    return pd.DataFrame({
+        'user_id': ['u1', 'u1', 'u2', 'u2'],
+        'day': ['2025-11-01', '2025-11-01', '2025-11-01', '2025-11-02'],
+        'metric': ['heart_rate', 'sleep', 'heart_rate', 'heart_rate'],
+        'value': [130.0, 3.5, 95.0, 105.0],
+    })
+
+
+def test_rules_match_all_thresholds():
+    from app.rules import RuleSet
+
+    rules = RuleSet([
+        {'metric': 'heart_rate', 'comparator': '>', 'threshold': 100, 'severity': 'urgent', 'message': 'HR > 100'},
+        {'metric': 'heart_rate', 'comparator': '>', 'threshold': 120, 'severity': 'critical', 'message': 'HR {value:.0f} > {threshold:.0f}'},
+        {'metric': 'heart_rate', 'comparator': '<=', 'threshold': 95, 'severity': 'info', 'message': 'HR ok'},
+        {'metric': 'sleep', 'comparator': '<', 'threshold': 4, 'severity': 'warning', 'message': 'Sleep < 4h'},
+        {'metric': 'steps', 'comparator': '<', 'threshold': 1000, 'severity': 'info', 'message': 'Unused'},
+    ])
+    found = rules.apply(make_daily())
+
+    assert [(a['user_id'], a['date'], a['reason']) for a in found] == [
+        ('u1', '2025-11-01', 'HR > 100'),
+        ('u2', '2025-11-02', 'HR > 100'),
+        ('u1', '2025-11-01', 'HR 130 > 120'),
+        ('u2', '2025-11-01', 'HR ok'),
+        ('u1', '2025-11-01', 'Sleep < 4h'),
+    ]
+    assert found[2]['severity'] == 'critical'
+
+
+def test_rules_load_from_csv(tmp_path):
+    from app.rules import RuleSet
+
+    path = tmp_path / 'rules.csv'
+    path.write_text(
+        "metric,comparator,threshold,severity,message\n"
+        "sleep,<,4,warning,Fatigue warning: Sleep < 4h\n"
+    )
+    rules = RuleSet.from_file(str(path))
+    assert len(rules) == 1
+    assert [a['metric'] for a in rules.apply(make_daily())] == ['sleep']
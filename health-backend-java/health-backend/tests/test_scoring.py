@@ -0,0 +1,89 @@
+import itertools
+
+import numpy as np
+
+
+def reference_score(steps, sleep, hr, water):
+    """The scalar ladder calculate_health_score used before the kernel."""
+    score = 0
+    if steps >= 10000:
+        score += 30
+    elif steps >= 7500:
+        score += 25
+    elif steps >= 5000:
+        score += 20
+    else:
+        score += 10
+    if 7 <= sleep <= 9:
+        score += 25
+    elif 6 <= sleep < 7 or 9 < sleep <= 10:
+        score += 20
+    else:
+        score += 10
+    if 60 <= hr <= 100:
+        score += 25
+    elif 50 <= hr < 60 or 100 < hr <= 120:
+        score += 20
+    else:
+        score += 10
+    if water >= 2.5:
+        score += 20
+    elif water >= 2.0:
+        score += 15
+    else:
+        score += 10
+    return min(score, 100.0)
+
+
+def test_vectorized_scores_match_scalar_ladder_at_band_edges():
+    from app.scoring import health_score, health_scores
+
+    steps = [0, 4999, 5000, 7499, 7500, 9999, 10000, 25000]
+    sleep = [0, 5.99, 6, 6.99, 7, 9, 9.01, 10, 10.01, 14]
+    hr = [30, 49, 50, 59, 60, 100, 101, 120, 121, 200]
+    water = [0, 1.99, 2.0, 2.49, 2.5, 5]
+    grid = np.array(list(itertools.product(steps, sleep, hr, water)))
+
+    scores = health_scores(grid[:, 0], grid[:, 1], grid[:, 2], grid[:, 3])
+    expected = [reference_score(*row) for row in grid]
+    np.testing.assert_array_equal(scores, expected)
+    assert health_score(8000, 7.5, 72, 2.0) == reference_score(8000, 7.5, 72, 2.0) == 90
+
+
+def test_cohort_distributions():
+    from app.scoring import cohort_distributions, health_scores
+
+    rng = np.random.default_rng(4)
+    n = 5000
+    scores = health_scores(rng.integers(2000, 14000, n), rng.normal(7, 1.5, n), rng.integers(45, 130, n), rng.normal(2.2, 0.5, n))
+    cohorts = rng.choice(['a', 'b', 'c'], n)
+
+    distributions = cohort_distributions(scores, cohorts)
+    assert sorted(distributions) == ['a', 'b', 'c']
+    for cohort, stats in distributions.items():
+        values = scores[cohorts == cohort]
+        assert stats['count'] == len(values)
+        assert stats['mean'] == round(values.mean(), 2)
+        assert stats['percentiles']['p50'] == np.percentile(values, 50, method='inverted_cdf')
+        assert stats['percentiles']['p90'] == np.percentile(values, 90, method='inverted_cdf')
+        assert sum(stats['histogram'].values()) == len(values)
+
+
+def test_score_bands_are_loaded_from_file(tmp_path):
+    import json
+
+    import pytest
+    from app.scoring import BASE_SCORE, SCORE_BANDS, load_score_bands
+
+    assert BASE_SCORE == 40
+    assert SCORE_BANDS['steps'] == [(5000, np.inf, 10), (7500, np.inf, 5), (10000, np.inf, 5)]
+    assert SCORE_BANDS['sleep'] == [(6, 10, 10), (7, 9, 5)]
+
+    path = tmp_path / 'bands.json'
+    path.write_text(json.dumps({'base_score': 40, 'bands': {'steps': [[8000, None, 15]]}}))
+    base, bands = load_score_bands(str(path))
+    assert base == 40 and bands['steps'] == [(8000, np.inf, 15)] and bands['water'] == []
+
+    path.write_text(json.dumps({'base_score': 40, 'bands': {'steps': [[8000, None, 7]]}}))
+    with pytest.raises(ValueError):
+        load_score_bands(str(path))
@@ -0,0 +1,85 @@
+import json
+from datetime import date
+
+import numpy as np
+import pytest
+
+
+def test_encode_json_handles_numpy_with_and_without_orjson(monkeypatch):
+    from app import serialize
+
+    value = {
+        'summary': {'avg': np.float64(71.5), 'count': np.int64(3)},
+        'values': np.array([1.5, 2.0]),
+        'day': date(2025, 11, 1),
+        'trend': [{'metric': 'steps', 'change_percent': 4.2}],
+    }
+    expected = {'summary': {'avg': 71.5, 'count': 3}, 'values': [1.5, 2.0], 'day': '2025-11-01',
+                'trend': [{'metric': 'steps', 'change_percent': 4.2}]}
+    assert json.loads(serialize.encode_json(value)) == expected
+    monkeypatch.setattr(serialize, 'orjson', None)
+    assert json.loads(serialize.encode_json(value)) == expected
+
+
+def test_encode_json_writes_nan_as_null_and_rejects_unknown_types(monkeypatch):
+    from app import serialize
+
+    value = {'avg': float('nan'), 'values': np.array([1.0, np.nan]), 'z': np.float64('inf'), 'ok': [1.5, None]}
+    expected = b'{"avg":null,"values":[1.0,null],"z":null,"ok":[1.5,null]}'
+    for encoder in [serialize.orjson, None]:
+        monkeypatch.setattr(serialize, 'orjson', encoder)
+        assert serialize.encode_json(value) == expected
+        with pytest.raises(TypeError):
+            serialize.encode_json({'unexpected': object()})
+
+
+def test_response_cache_encodes_once_until_invalidated():
+    from app.cache import ResponseCache
+
+    cache = ResponseCache(max_bytes=1024)
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {'n': len(calls)}
+
+    assert cache.get_or_encode('a', 'summary', build) == b'{"n":1}'
+    assert cache.get_or_encode('a', 'summary', build) == b'{"n":1}'
+    cache.get_or_encode('b', 'summary', build)
+    cache.invalidate('a')
+    # Only the invalidated scope's bodies are dropped, nothing is kept for it
+    assert cache.stats()['entries'] == 1
+    assert cache.get_or_encode('a', 'summary', build) == b'{"n":3}'
+    assert len(calls) == 3 and cache.stats()['hits'] == 1
+
+
+def test_response_cache_skips_bodies_built_across_an_invalidation():
+    from app.cache import ResponseCache
+
+    cache = ResponseCache(max_bytes=1024)
+
+    def build():
+        # The data is replaced while this body is being built
+        cache.invalidate('a')
+        return {'stale': True}
+
+    assert cache.get_or_encode('a', 'summary', build) == b'{"stale":true}'
+    assert cache.stats()['entries'] == 0
+
+
+def test_summary_served_from_response_cache():
+    from fastapi.testclient import TestClient
+    from app.main import app, DATA_STORE
+
+    client = TestClient(app)
+    raw = b"user_id,date,metric,value\nu9,2025-11-01,heart_rate,70\nu9,2025-11-02,heart_rate,140\n"
+    data_id = client.post('/upload', files={'file': ('u9.csv', raw, 'text/csv')}).json()['data_id']
+
+    first = client.get(f'/data/{data_id}/summary')
+    before = client.get('/cache/stats').json()['responses']['hits']
+    second = client.get(f'/data/{data_id}/summary')
+    assert first.headers['content-type'] == 'application/json'
+    assert second.content == first.content
+    assert first.json()['user_id'] == 'u9'
+    assert client.get('/cache/stats').json()['responses']['hits'] == before + 1
+    assert client.get('/data/missing/summary').status_code == 404
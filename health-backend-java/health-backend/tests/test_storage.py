@@ -0,0 +1,101 @@
+import pandas as pd
+
+
+def make_results(user_id, days, values):
+    from app.processor import get_trends_and_insights
+
+    df = pd.DataFrame({
+        'user_id': user_id,
+        'date': days * 2,
+        'metric': ['heart_rate'] * len(days) + ['sleep'] * len(days),
+        'value': values,
+    })
+    return get_trends_and_insights(df)
+
+
+def test_sqlite_store_round_trip_and_queries(tmp_path):
+    from app.storage import create_store
+
+    store = create_store('sqlite', path=str(tmp_path / 'health.db'))
+    days = ['2025-11-01', '2025-11-02', '2025-11-03']
+    first = make_results('u1', days, [70, 72, 110, 7, 3.5, 8])
+    second = make_results('u2', days, [60, 61, 62, 8, 8, 8])
+    store.put('a', {'user_id': 'u1', 'processed': first}, results=first)
+    store.put('b', {'user_id': 'u2', 'processed': second}, results=second)
+
+    assert len(store) == 2 and 'a' in store and 'missing' not in store
+    assert store.get('missing') is None
+    assert store['a']['processed']['summary'] == first['summary']
+
+    hr = store.query_daily('u1', metric='heart_rate', start='2025-11-02')
+    assert [(r['day'], r['value']) for r in hr] == [('2025-11-02', 72.0), ('2025-11-03', 110.0)]
+    reasons = [a['reason'] for a in store.query_anomalies('u1')]
+    assert reasons == ['Urgent: Resting HR > 100', 'Fatigue warning: Sleep < 4h']
+
+    # Replacing an upload replaces its indexed rows
+    store.put('a', {'user_id': 'u1', 'processed': second}, results=second)
+    assert store.query_anomalies('u1') == []
+
+    # A fresh process sees the persisted data (bypassing the LRU cache)
+    reopened = create_store('sqlite', path=str(tmp_path / 'health.db'))
+    assert reopened['b']['user_id'] == 'u2'
+    # 'a' now holds u2's data too, so u2 has two uploads of 6 daily values
+    assert len(reopened.query_daily('u2')) == 12
+
+
+def test_memory_store_queries():
+    from app.storage import create_store
+
+    store = create_store('memory')
+    days = ['2025-11-01', '2025-11-02']
+    results = make_results('u1', days, [70, 72, 7, 3.5])
+    store['a'] = {'user_id': 'u1'}
+    store.put('a', {'user_id': 'u1'}, results=results)
+
+    assert [r['value'] for r in store.query_daily('u1', metric='sleep')] == [7.0, 3.5]
+    assert [a['metric'] for a in store.query_anomalies('u1', end='2025-11-02')] == ['sleep']
+
+
+def test_latest_and_range_index():
+    from app.storage import CachedStore, MemoryStore, create_store
+
+    # Any store can sit behind the cache, not only SQLite
+    for store in [create_store('memory'), create_store('sqlite', path=':memory:'), CachedStore(MemoryStore())]:
+        # Inserted out of order on purpose
+        for i, hour in enumerate([3, 1, 4, 2]):
+            store.put(f"id{hour}", {'timestamp': f'2025-11-01T0{hour}:00:00', 'user_id': 'u1' if i % 2 else 'u2', 'n': hour})
+
+        assert store.latest()['n'] == 4
+        assert store.latest(user_id='u1')['n'] == 2
+        assert [e['n'] for e in store.last_n(3)] == [2, 3, 4]
+        assert [e['n'] for e in store.between('2025-11-01T02', '2025-11-01T03')] == [2, 3]
+        assert store.earliest_id() == 'id1' and store.last_n_ids(2) == ['id3', 'id4']
+
+        store.put('id4', {'timestamp': '2025-11-01T00:30:00', 'user_id': 'u2', 'n': 0})
+        assert store.latest()['n'] == 3
+        del store['id3']
+        assert store.latest()['n'] == 2 and len(store) == 3
+        assert store.latest(user_id='nobody') is None
+
+
+def test_put_many_matches_put(tmp_path):
+    from app.storage import create_store
+
+    days = ['2025-11-01', '2025-11-02', '2025-11-03']
+    items = [
+        ('a', {'user_id': 'u1', 'timestamp': '2025-11-03T01'}, make_results('u1', days, [70, 72, 110, 7, 3.5, 8])),
+        ('b', {'user_id': 'u2', 'timestamp': '2025-11-03T02'}, make_results('u2', days, [60, 61, 62, 8, 8, 8])),
+    ]
+    for backend in ['memory', 'sqlite']:
+        single = create_store(backend, path=str(tmp_path / 'single.db'))
+        bulk = create_store(backend, path=str(tmp_path / 'bulk.db'))
+        for data_id, entry, results in items:
+            single.put(data_id, entry, results=results)
+        bulk.put_many(items)
+        bulk.put_many(items[:1])  # replacing keeps the count and rows
+
+        assert len(bulk) == len(single) == 2
+        assert bulk.latest() == single.latest()
+        for user_id in ['u1', 'u2']:
+            assert bulk.query_daily(user_id) == single.query_daily(user_id)
+            assert bulk.query_anomalies(user_id) == single.query_anomalies(user_id)
@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..')
+
+
+def test_columns_match_legacy_records():
+    from app.processor import aggregate_per_day, get_trends_and_insights, normalize
+    from app.timeseries import Timeseries
+
+    df = pd.read_csv(os.path.join(DATA_DIR, 'extended_health_data.csv'))
+    timeseries = get_trends_and_insights(df)['timeseries']
+    assert isinstance(timeseries, Timeseries)
+    assert timeseries.values.dtype == np.float32 and timeseries.metric_codes.dtype == np.int16
+
+    # The record format is the one built with to_dict(orient='records') before
+    legacy = aggregate_per_day(normalize(df)).to_dict(orient='records')
+    for record in legacy:
+        record['value'] = float(record['value'])
+        record['day'] = str(record['day'])
+    assert timeseries.to_records() == legacy
+
+    columns = timeseries.to_columns()
+    assert list(columns) == ['user_id', 'day', 'metric', 'value']
+    assert [dict(zip(columns, row)) for row in zip(*columns.values())] == legacy
+    assert Timeseries.from_records(legacy) == timeseries
+    assert Timeseries.from_dict(timeseries.to_dict()) == timeseries
+
+    sleep = timeseries.filter(user_id='u002', metric='sleep', start='2024-01-10', end='2024-01-12').to_records()
+    assert sleep == [r for r in legacy if r['user_id'] == 'u002' and r['metric'] == 'sleep' and '2024-01-10' <= r['day'] <= '2024-01-12']
+
+
+def test_sqlite_entries_keep_columnar_buffers(tmp_path):
+    from app.processor import get_trends_and_insights
+    from app.storage import create_store
+    from app.timeseries import Timeseries
+
+    results = get_trends_and_insights(pd.read_csv(os.path.join(DATA_DIR, 'extended_health_data.csv')))
+    store = create_store('sqlite', path=str(tmp_path / 'health.db'))
+    store.put('a', {'user_id': 'u001', 'processed': results}, results=results)
+
+    reopened = create_store('sqlite', path=str(tmp_path / 'health.db'))
+    timeseries = reopened['a']['processed']['timeseries']
+    assert isinstance(timeseries, Timeseries) and timeseries == results['timeseries']
+    assert reopened.query_daily('u003', metric='steps') == results['timeseries'].filter('u003', 'steps').to_records()
+
+
+def test_trends_endpoint_columnar_format():
+    from fastapi.testclient import TestClient
+    from app import main
+
+    # A re-upload of the same bytes would reuse an entry stored by another test
+    main.UPLOAD_CACHE.clear()
+    client = TestClient(main.app)
+    with open(os.path.join(DATA_DIR, 'positive_trend_data.csv'), 'rb') as f:
+        data_id = client.post('/upload', files={'file': ('p.csv', f.read(), 'text/csv')}).json()['data_id']
+
+    records = client.get(f'/data/{data_id}/trends', params={'metric': 'sleep'}).json()
+    columns = client.get(f'/data/{data_id}/trends', params={'metric': 'sleep', 'format': 'columnar'}).json()
+    assert columns['day'] == [r['day'] for r in records]
+    assert columns['value'] == [r['value'] for r in records]
+    assert set(columns['metric']) == {'sleep'}
+
+    summary = client.get(f'/data/{data_id}/summary', params={'format': 'columnar'}).json()
+    assert len(summary['timeseries']['value']) == 23
+    assert client.get(f'/data/{data_id}/trends', params={'format': 'csv'}).status_code == 400
+    # Malformed dates are a client error, not a 500
+    assert client.get(f'/data/{data_id}/trends', params={'start': 'garbage'}).status_code == 400
+    assert client.get(f'/data/{data_id}/summary', params={'end': '2024-02-30'}).status_code == 400
+    assert client.get('/users/u001/metrics', params={'start': '20240101'}).status_code == 400
+    assert client.get(f'/data/{data_id}/trends', params={'start': '2024-01-16T00:00:00'}).status_code == 200